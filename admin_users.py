@@ -0,0 +1,82 @@
+"""Admin user directory: search, sort and paginate accounts.
+
+Per-user screening counts and last activity come from the `user_stats`
+summary, joined once per page, so listing cost does not depend on how many
+screenings users have.
+"""
+
+import sys
+
+from sqlalchemy import select, func, or_
+
+from models import User, UserStats
+from pagination import numbered_page
+
+PER_PAGE = 25
+
+SORTS = {
+    'username': func.lower(User.username),
+    'email': func.lower(User.email),
+    'joined': User.created_at,
+    'screenings': func.coalesce(UserStats.screening_count, 0),
+    'last_active': UserStats.last_screening_at,
+}
+DEFAULT_SORT = 'joined'
+
+
+def _prefix(column, term):
+    """Case-insensitive prefix match written as a range on lower(column).
+
+    Unlike LIKE, the range can use the expression indexes on users. The
+    upper bound is the term with its last code point incremented, so names
+    continuing with any character (including ones above U+FFFF) fall inside.
+    """
+    lowered = func.lower(column)
+    upper = _successor(term)
+    if upper is None:
+        return lowered >= term
+    return (lowered >= term) & (lowered < upper)
+
+
+def _successor(term):
+    """The smallest string greater than every string starting with `term`, or None."""
+    while term and ord(term[-1]) == sys.maxunicode:
+        term = term[:-1]
+    if not term:
+        return None
+    following = ord(term[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000  # surrogates can't be encoded; nothing sorts between
+    return term[:-1] + chr(following)
+
+
+def user_directory(session, search='', sort=DEFAULT_SORT, direction='desc', page=1, per_page=PER_PAGE):
+    """Return a NumberedPage of (User, screening_count, last_activity) rows."""
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    key = SORTS[sort]
+    descending = direction == 'desc'
+
+    stmt = (
+        select(
+            User,
+            func.coalesce(UserStats.screening_count, 0).label('screening_count'),
+            UserStats.last_screening_at.label('last_activity'),
+        )
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .order_by(key.desc() if descending else key.asc(),
+                  User.id.desc() if descending else User.id.asc())
+    )
+    term = (search or '').strip().lower()
+    if term:
+        stmt = stmt.where(or_(_prefix(User.username, term), _prefix(User.email, term)))
+    return numbered_page(session, stmt, page, per_page)
+
+
+def directory_totals(session):
+    """Return (total users, total screenings) without scanning screenings."""
+    row = session.execute(select(
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.coalesce(func.sum(UserStats.screening_count), 0)).scalar_subquery(),
+    )).one()
+    return row[0], row[1]
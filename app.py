@@ -1,43 +1,95 @@
-from flask import Flask, render_template, redirect, flash, url_for, request, jsonify, send_file
+from flask import Flask, Blueprint, current_app, render_template, redirect, flash, url_for, request, jsonify, send_file, Response, stream_with_context, abort
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from models import User, Screening, CopingLog, Recommendation, SessionLocal, init_db
-from forms import LoginForm, RegisterForm, ScreeningForm, ExtendedScreeningForm, ProfileForm, ChangePasswordForm, CopingLogForm
+from sqlalchemy import func, or_, and_
+from models import User, Screening, CopingLog, ExportJob
+from database import get_db
+import database
+from forms import LoginForm, RegisterForm, ScreeningForm, ExtendedScreeningForm, ProfileForm, ChangePasswordForm, CopingLogForm, ImportForm, ExportForm
+from extensions import migrate
+from stats import record_screening, get_user_stats, rebuild_user_stats, check_user_stats, analytics_summary
+from pagination import keyset_page
+import exports
+from identity import identity_cache
+from recommendations import recommend, recommendations_for
+from scoring import score_quick, score_extended
+from questionnaires import QUICK, EXTENDED, REGISTRY
+import admin_users
+import sync
+import imports
+import rescoring
+import rollups
+import jobs
+import export_jobs
+import metrics
+import query_budgets
+from query_budgets import query_budget
+import replicas
+from replicas import read_from_replica
+from etags import data_version, make_etag, conditional_json
+from page_cache import render_public_page
+import series
+import trends
+from series import series_cache
+import click
 from datetime import datetime, timedelta
 import os
+import io
 import json
 from functools import wraps
-import csv
-from io import StringIO, BytesIO
 
-# Basic app setup
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'mindcare_secret')
+# Every page, API route and CLI command; registered on each app by create_app().
+# CLI commands are top-level (`flask rebuild-stats`, not `flask main ...`).
+main = Blueprint('main', __name__, cli_group=None)
 
-# Ensure tables exist (Flask 3 + pytest safe)
-from models import create_tables
-create_tables()
 
-# Flask-Login setup
-login_manager = LoginManager()
-login_manager.login_view = 'login'
-login_manager.init_app(app)
+def create_app(config=None):
+    """Build the application: configuration, then extensions and request hooks.
+
+    Nothing here touches the database, so importing the app (once in the
+    gunicorn master with --preload, or in each worker) is cheap. The schema is
+    brought up to date once per deploy, before the server starts, with
+    `flask --app app db upgrade`. Per-process resources are created after the
+    fork: database connections on first use, the job worker by gunicorn's
+    post_fork hook (see gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'mindcare_secret')
+    app.config.update(config or {})
+
+    # Alembic migrations (`flask --app app db upgrade`) for upgrading existing databases in place
+    migrate.init_app(app, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+
+    # One SQLAlchemy session per request, committed/rolled back on teardown.
+    # DATABASE_URL in `config` gives this app its own database.
+    database.init_app(app)
+
+    # Request, latency and SQL metrics for /metrics (see metrics.py)
+    metrics.init_app(app, database.engine_for(app))
+
+    # Per-route SQL statement budgets, checked on the same counts (see query_budgets.py)
+    query_budgets.init_app(app)
+
+    # Background job worker, started on the first request only if JOB_WORKER_AUTOSTART (see jobs.py)
+    jobs.init_app(app)
+
+    login_manager = LoginManager()
+    login_manager.login_view = 'main.login'
+    login_manager.user_loader(load_user)
+    login_manager.init_app(app)
+
+    app.register_blueprint(main)
+    return app
 
 
-@login_manager.user_loader
 def load_user(user_id):
-    session = SessionLocal()
     try:
-        user = session.query(User).filter(User.id == int(user_id)).first()
-        return user
+        return identity_cache.get(int(user_id), get_db)
     except:
         return None
-    finally:
-        session.close()
 
 
-@app.context_processor
+@main.app_context_processor
 def inject_user():
     return dict(current_user=current_user)
 
@@ -52,67 +104,67 @@ def get_user_id():
         except:
             return None
 
+def is_verified_admin():
+    """Whether the current user is an admin, confirmed against the database."""
+    if not current_user.is_authenticated or not current_user.is_admin():
+        return False
+    # The cached identity may be stale if another worker changed the role;
+    # confirm against the database before allowing admin actions.
+    identity = identity_cache.load(int(current_user.get_id()), get_db())
+    if identity is None or not identity.is_admin():
+        identity_cache.invalidate(int(current_user.get_id()))
+        return False
+    return True
+
 # Admin decorator
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin():
+        if not is_verified_admin():
             flash('Admin access required.', 'danger')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         return f(*args, **kwargs)
     return decorated_function
 
+def find_login_user(session, identifier):
+    """Resolve a login name or email, ignoring case, in one indexed query.
+
+    Both branches are served by the lower(username) / lower(email) indexes.
+    An exact username match wins over a case-folded one, and usernames win
+    over emails.
+    """
+    key = (identifier or '').strip().lower()
+    if not key:
+        return None
+    return (session.query(User)
+            .filter(or_(func.lower(User.username) == key, func.lower(User.email) == key))
+            .order_by((User.username == identifier).desc(), (func.lower(User.username) == key).desc(), User.id)
+            .first())
+
 # Helper function to get recommendations
 def get_recommendations(score, level, screening_id):
-    recommendations = []
-    
-    if level == 'High':
-        recommendations = [
-            {'category': 'professional', 'title': 'Consider Professional Help', 'description': 'Your assessment suggests you may benefit from speaking with a mental health professional.'},
-            {'category': 'coping', 'title': 'Grounding Technique', 'description': 'Try the 5-4-3-2-1 technique: Notice 5 things you see, 4 you touch, 3 you hear, 2 you smell, 1 you taste.'},
-            {'category': 'resource', 'title': 'Mental Health Hotline', 'description': 'Call 988 (Suicide & Crisis Lifeline) for immediate support anytime.'},
-        ]
-    elif level == 'Moderate':
-        recommendations = [
-            {'category': 'coping', 'title': 'Deep Breathing Exercise', 'description': 'Try Box Breathing: Breathe in for 4 counts, hold for 4, out for 4, hold for 4.'},
-            {'category': 'coping', 'title': 'Physical Activity', 'description': 'Regular exercise can improve mental health. Aim for 30 minutes daily.'},
-            {'category': 'resource', 'title': 'Meditation Apps', 'description': 'Try apps like Headspace or Calm for guided meditation and mindfulness.'},
-        ]
-    else:  # Low
-        recommendations = [
-            {'category': 'coping', 'title': 'Maintain Healthy Habits', 'description': 'Keep up with exercise, sleep, and social connections.'},
-            {'category': 'resource', 'title': 'Wellness Tips', 'description': 'Continue with self-care practices and stress management techniques.'},
-        ]
-    
-    session = SessionLocal()
-    try:
-        for rec in recommendations:
-            r = Recommendation(screening_id=screening_id, **rec)
-            session.add(r)
-        session.commit()
-    finally:
-        session.close()
-    
-    return recommendations
+    # Catalog entries come from memory; only (screening, template) ids are stored
+    return recommend(get_db(), screening_id, level)
 
 
-@app.route('/')
+# Public pages are rendered once per auth state and served from memory
+@main.route('/')
 def index():
-    return render_template('index.html')
+    return render_public_page('index.html')
 
 
-@app.route('/awareness')
+@main.route('/awareness')
 def awareness():
-    return render_template('awareness.html')
+    return render_public_page('awareness.html')
 
 
-@app.route('/support')
+@main.route('/support')
 def support():
-    return render_template('support.html')
+    return render_public_page('support.html')
 
 
 # REGISTER
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -120,59 +172,60 @@ def register():
         email = form.email.data
         password = form.password.data
 
-        session = SessionLocal()
-        try:
-            if session.query(User).filter_by(username=username).first():
-                flash('Username already taken.', 'warning')
-                return redirect(url_for('register'))
-            
-            if email and session.query(User).filter_by(email=email).first():
-                flash('Email already registered.', 'warning')
-                return redirect(url_for('register'))
-
-            user = User(username=username, email=email)
-            user.set_password(password)
-            session.add(user)
-            session.commit()
-            flash('Account created. Please log in.', 'success')
-            return redirect(url_for('login'))
-        finally:
-            session.close()
+        session = get_db(write=True)
+        if session.query(User).filter(func.lower(User.username) == username.strip().lower()).first():
+            flash('Username already taken.', 'warning')
+            return redirect(url_for('main.register'))
+
+        if email and session.query(User).filter(func.lower(User.email) == email.strip().lower()).first():
+            flash('Email already registered.', 'warning')
+            return redirect(url_for('main.register'))
+
+        user = User(username=username, email=email)
+        user.set_password(password)
+        session.add(user)
+        session.commit()
+        flash('Account created. Please log in.', 'success')
+        return redirect(url_for('main.login'))
 
     return render_template('register.html', form=form)
 
 # LOGIN
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
         username = form.username.data
         password = form.password.data
-        session = SessionLocal()
-        try:
-            user = session.query(User).filter_by(username=username).first()
-            if not user:
-                user = session.query(User).filter_by(email=username).first()
-            
-            if user and user.check_password(password):
-                login_user(user)
-                flash('Logged in successfully.', 'success')
-                next_page = url_for('dashboard')
-                return redirect(next_page)
-            flash('Invalid username or password.', 'danger')
-        finally:
-            session.close()
+        session = get_db()
+        user = find_login_user(session, username)
+
+        if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # Stored with an older hash policy; upgrade while we have the plaintext
+                session = get_db(write=True)
+                user = session.get(User, user.id)
+                user.set_password(password)
+                session.commit()
+            identity_cache.invalidate(user.id)
+            login_user(user)
+            flash('Logged in successfully.', 'success')
+            next_page = url_for('main.dashboard')
+            return redirect(next_page)
+        flash('Invalid username or password.', 'danger')
     return render_template('login.html', form=form)
 
 # DASHBOARD
-@app.route('/dashboard')
+@main.route('/dashboard')
 @login_required
+@query_budget(5)
+@read_from_replica
 def dashboard():
     if not current_user.is_authenticated:
         flash('Please log in first.', 'warning')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
-    session = SessionLocal()
+    session = get_db()
     try:
         # Get user ID safely
         try:
@@ -184,391 +237,678 @@ def dashboard():
         screenings = session.query(Screening).filter_by(user_id=user_id).order_by(Screening.created_at.desc()).limit(10).all()
         data = [(s.created_at.strftime('%Y-%m-%d'), s.score, s.level) for s in screenings]
         
-        # Get statistics
-        total_screenings = session.query(Screening).filter_by(user_id=user_id).count()
-        avg_score = session.query(func.avg(Screening.score)).filter_by(user_id=user_id).scalar() or 0
+        # Get statistics (maintained incrementally on each screening)
+        stats = get_user_stats(session, user_id)
         
-        return render_template('dashboard.html', data=data, total_screenings=total_screenings, avg_score=round(avg_score, 2))
+        return render_template('dashboard.html', data=data, total_screenings=stats.screening_count, avg_score=round(stats.avg_score, 2))
     except Exception as e:
-        print(f'Dashboard error: {str(e)}')
+        session.rollback()
+        current_app.logger.exception('Dashboard error')
         flash('Error loading dashboard. Please try again.', 'danger')
-        return redirect(url_for('index'))
-    finally:
-        session.close()
+        return redirect(url_for('main.index'))
 
 
 # SCREENING
-@app.route('/screening', methods=['GET', 'POST'])
+@main.route('/screening', methods=['GET', 'POST'])
 @login_required
+@query_budget(25)
 def screening():
     form = ScreeningForm()
     if form.validate_on_submit():
-        answers = [int(getattr(form, f'q{i}').data) for i in range(1, 11)]
-        score = sum(answers)
-        if score <= 8:
-            level = 'Low'
-        elif score <= 15:
-            level = 'Moderate'
-        else:
-            level = 'High'
+        score, level = score_quick(form.data)
 
-        session = SessionLocal()
-        try:
-            user_id = get_user_id()
-            if not user_id:
-                flash('User session expired. Please log in again.', 'warning')
-                return redirect(url_for('login'))
-            s = Screening(user_id=user_id, score=score, level=level)
-            session.add(s)
-            session.commit()
-            
-            # Generate recommendations
-            recommendations = get_recommendations(score, level, s.id)
-            
-            return render_template('result.html', score=score, level=level, recommendations=recommendations)
-        finally:
-            session.close()
-    return render_template('screening.html', form=form)
+        session = get_db(write=True)
+        user_id = get_user_id()
+        if not user_id:
+            flash('User session expired. Please log in again.', 'warning')
+            return redirect(url_for('main.login'))
+        s = Screening(user_id=user_id, score=score, level=level, **QUICK.stamp())
+        session.add(s)
+        record_screening(session, s)
+        trends.record(session, s)
+
+        # Generate recommendations (same transaction as the screening)
+        recommendations = get_recommendations(score, level, s.id)
+        # Side work runs after the response, once this transaction commits
+        rollups.schedule_refresh(session)
+        session.commit()
+
+        return render_template('result.html', score=score, level=level, recommendations=recommendations)
+    return render_template('screening.html', form=form, questionnaire=QUICK)
 
 # EXTENDED SCREENING
-@app.route('/extended-screening', methods=['GET', 'POST'])
+@main.route('/extended-screening', methods=['GET', 'POST'])
 @login_required
+@query_budget(25)
 def extended_screening():
     form = ExtendedScreeningForm()
     if form.validate_on_submit():
-        session = SessionLocal()
-        try:
-            # Calculate component scores
-            stress_score = int(form.stress_q1.data) + int(form.stress_q2.data)
-            anxiety_score = int(form.anxiety_q1.data) + int(form.anxiety_q2.data)
-            sleep_score = int(form.sleep_q1.data) + int(form.sleep_q2.data)
-            depression_score = int(form.depression_q1.data) + int(form.depression_q2.data)
-            social_score = int(form.social_q1.data) + int(form.social_q2.data)
-            
-            total_score = stress_score + anxiety_score + sleep_score + depression_score + social_score
-            
-            if total_score <= 15:
-                level = 'Low'
-            elif total_score <= 30:
-                level = 'Moderate'
-            else:
-                level = 'High'
-            
-            s = Screening(
-                user_id=get_user_id() or current_user.id,
-                score=total_score,
-                level=level,
-                stress_score=stress_score,
-                anxiety_score=anxiety_score,
-                sleep_score=sleep_score,
-                depression_score=depression_score,
-                social_score=social_score,
-                notes=form.notes.data
-            )
-            session.add(s)
-            session.commit()
-            
-            # Generate recommendations
-            recommendations = get_recommendations(total_score, level, s.id)
-            
-            return render_template('extended_result.html', 
-                                 total_score=total_score, 
-                                 level=level,
-                                 stress_score=stress_score,
-                                 anxiety_score=anxiety_score,
-                                 sleep_score=sleep_score,
-                                 depression_score=depression_score,
-                                 social_score=social_score,
-                                 recommendations=recommendations)
-        finally:
-            session.close()
+        session = get_db(write=True)
+        # Calculate component scores
+        dimensions, total_score, level = score_extended(form.data)
+
+        s = Screening(
+            user_id=get_user_id() or current_user.id,
+            score=total_score,
+            level=level,
+            notes=form.notes.data,
+            **dimensions,
+            **EXTENDED.stamp()
+        )
+        session.add(s)
+        record_screening(session, s)
+        trends.record(session, s)
+
+        # Generate recommendations (same transaction as the screening)
+        recommendations = get_recommendations(total_score, level, s.id)
+        # Side work runs after the response, once this transaction commits
+        rollups.schedule_refresh(session)
+        session.commit()
+
+        return render_template('extended_result.html', 
+                             total_score=total_score, 
+                             level=level,
+                             recommendations=recommendations,
+                             **dimensions)
     
-    return render_template('extended_screening.html', form=form)
+    return render_template('extended_screening.html', form=form, questionnaire=EXTENDED)
 
 # USER PROFILE
-@app.route('/profile')
+@main.route('/profile')
 @login_required
+@read_from_replica
 def profile():
-    session = SessionLocal()
-    try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        user = session.query(User).get(user_id)
-        screening_count = session.query(Screening).filter_by(user_id=user_id).count()
-        return render_template('profile.html', user=user, screening_count=screening_count)
-    finally:
-        session.close()
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    user = session.query(User).get(user_id)
+    screening_count = get_user_stats(session, user_id).screening_count
+    return render_template('profile.html', user=user, screening_count=screening_count)
 
 # EDIT PROFILE
-@app.route('/profile/edit', methods=['GET', 'POST'])
+@main.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 def edit_profile():
     form = ProfileForm()
-    session = SessionLocal()
-    try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        user = session.query(User).get(user_id)
-        
-        if form.validate_on_submit():
-            if form.username.data != user.username:
-                if session.query(User).filter_by(username=form.username.data).first():
-                    flash('Username already taken.', 'warning')
-                    return redirect(url_for('edit_profile'))
-            
-            user.username = form.username.data
-            user.email = form.email.data
-            user.bio = form.bio.data
-            user.updated_at = datetime.utcnow()
-            session.commit()
-            
-            flash('Profile updated successfully!', 'success')
-            return redirect(url_for('profile'))
-        elif request.method == 'GET':
-            form.username.data = user.username
-            form.email.data = user.email
-            form.bio.data = user.bio
-        
-        return render_template('edit_profile.html', form=form)
-    finally:
-        session.close()
+    session = get_db(write=request.method == 'POST')
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    user = session.query(User).get(user_id)
+
+    if form.validate_on_submit():
+        # Case-insensitive, like register and login: `Alice` and `alice` can't coexist
+        others = session.query(User).filter(User.id != user_id)
+        if others.filter(func.lower(User.username) == form.username.data.strip().lower()).first():
+            flash('Username already taken.', 'warning')
+            return redirect(url_for('main.edit_profile'))
+        email = form.email.data
+        if email and others.filter(func.lower(User.email) == email.strip().lower()).first():
+            flash('Email already registered.', 'warning')
+            return redirect(url_for('main.edit_profile'))
+
+        user.username = form.username.data
+        user.email = form.email.data
+        user.bio = form.bio.data
+        user.updated_at = datetime.utcnow()
+        session.commit()
+        identity_cache.invalidate(user_id)
+
+        flash('Profile updated successfully!', 'success')
+        return redirect(url_for('main.profile'))
+    elif request.method == 'GET':
+        form.username.data = user.username
+        form.email.data = user.email
+        form.bio.data = user.bio
+
+    return render_template('edit_profile.html', form=form)
 
 # CHANGE PASSWORD
-@app.route('/change-password', methods=['GET', 'POST'])
+@main.route('/change-password', methods=['GET', 'POST'])
 @login_required
 def change_password():
     form = ChangePasswordForm()
-    session = SessionLocal()
-    try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        user = session.query(User).get(user_id)
-        
-        if form.validate_on_submit():
-            if not user.check_password(form.current_password.data):
-                flash('Current password is incorrect.', 'danger')
-                return redirect(url_for('change_password'))
-            
-            user.set_password(form.new_password.data)
-            user.updated_at = datetime.utcnow()
-            session.commit()
-            
-            flash('Password changed successfully!', 'success')
-            return redirect(url_for('profile'))
-        
-        return render_template('change_password.html', form=form)
-    finally:
-        session.close()
+    session = get_db(write=request.method == 'POST')
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    user = session.query(User).get(user_id)
+
+    if form.validate_on_submit():
+        if not user.check_password(form.current_password.data):
+            flash('Current password is incorrect.', 'danger')
+            return redirect(url_for('main.change_password'))
+
+        user.set_password(form.new_password.data)
+        user.updated_at = datetime.utcnow()
+        session.commit()
+        identity_cache.invalidate(user_id)
+
+        flash('Password changed successfully!', 'success')
+        return redirect(url_for('main.profile'))
+
+    return render_template('change_password.html', form=form)
 
 # SCREENING HISTORY
-@app.route('/history')
+HISTORY_PAGE_SIZE = 20
+
+@main.route('/history')
 @login_required
+@query_budget(6)
+@read_from_replica
 def screening_history():
-    session = SessionLocal()
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    query = session.query(Screening).filter_by(user_id=user_id)
+    page = keyset_page(query, Screening, HISTORY_PAGE_SIZE,
+                       before=request.args.get('before'), after=request.args.get('after'))
+
+    # Score of the row just above this page, so the first row's trend can be shown
+    newer_score = None
+    if page.items and page.has_newer:
+        top = page.items[0]
+        newer_score = (session.query(Screening.score).filter_by(user_id=user_id)
+                       .filter(or_(Screening.created_at > top.created_at,
+                                   and_(Screening.created_at == top.created_at, Screening.id > top.id)))
+                       .order_by(Screening.created_at.asc(), Screening.id.asc())
+                       .limit(1).scalar())
+
+    # One query on the link table for the page; the text comes from the cached catalog
+    recommendations = recommendations_for(session, [s.id for s in page.items])
+    total_screenings = get_user_stats(session, user_id).screening_count
+    return render_template('screening_history.html', screenings=page.items, page=page,
+                           newer_score=newer_score, recommendations=recommendations,
+                           total_screenings=total_screenings)
+
+@main.route('/history/chart-data')
+@login_required
+def screening_history_chart():
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    def build():
+        rows = (session.query(Screening.created_at, Screening.score, Screening.level)
+                .filter_by(user_id=user_id)
+                .order_by(Screening.created_at.asc(), Screening.id.asc()))
+        return [{
+            'date': created_at.strftime('%Y-%m-%d'),
+            'score': score,
+            'level': level
+        } for created_at, score, level in rows]
+
+    # The browser revalidates with If-None-Match; unchanged history costs one index lookup
+    version = data_version(session, user_id, Screening)
+    return conditional_json(make_etag('chart', user_id, version), build)
+
+@main.route('/history/series')
+@login_required
+@query_budget(3)
+def screening_series():
+    """Score and sub-score series, downsampled to `points` per series (see series.py)."""
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        return jsonify({'error': 'Not authenticated'}), 401
     try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        screenings = session.query(Screening).filter_by(user_id=user_id).order_by(Screening.created_at.desc()).all()
-        
-        # Prepare data for chart
-        chart_data = [{
-            'date': s.created_at.strftime('%Y-%m-%d'),
-            'score': s.score,
-            'level': s.level
-        } for s in screenings]
-        
-        return render_template('screening_history.html', screenings=screenings, chart_data=json.dumps(chart_data))
-    finally:
-        session.close()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d') + timedelta(days=1) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    names = request.args.get('series', ','.join(series.SERIES)).split(',')
+    if not set(names) <= set(series.SERIES):
+        return jsonify({'error': f'series must be among {", ".join(series.SERIES)}'}), 400
+    points = min(max(request.args.get('points', series.DEFAULT_POINTS, type=int), series.MIN_POINTS), series.MAX_POINTS)
+
+    params = (start, end, points, tuple(names))
+    version = data_version(session, user_id, Screening)
+    return conditional_json(
+        make_etag('series', user_id, version, *params),
+        lambda: series_cache.get(user_id, version, params,
+                                 lambda: series.build(session, user_id, start, end, points, names)),
+    )
 
 # ANALYTICS
-@app.route('/analytics')
+@main.route('/analytics')
 @login_required
+@query_budget(5)
+@read_from_replica
 def analytics():
-    session = SessionLocal()
-    try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        screenings = session.query(Screening).filter_by(user_id=user_id).order_by(Screening.created_at.desc()).all()
-        
-        if not screenings:
-            flash('No screening data available.', 'info')
-            return render_template('analytics.html', stats={})
-        
-        scores = [s.score for s in screenings]
-        levels = [s.level for s in screenings]
-        
-        stats = {
-            'total': len(screenings),
-            'avg_score': round(sum(scores) / len(scores), 2),
-            'min_score': min(scores),
-            'max_score': max(scores),
-            'last_screening': screenings[0].created_at.strftime('%Y-%m-%d'),
-            'trend': 'Improving' if screenings[0].score < screenings[-1].score else 'Worsening' if screenings[0].score > screenings[-1].score else 'Stable',
-            'level_distribution': {
-                'Low': levels.count('Low'),
-                'Moderate': levels.count('Moderate'),
-                'High': levels.count('High')
-            }
-        }
-        
-        return render_template('analytics.html', stats=stats, screenings=screenings)
-    finally:
-        session.close()
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    # Aggregated in SQL; the history itself is never loaded
+    stats = analytics_summary(session, user_id)
+
+    if not stats:
+        flash('No screening data available.', 'info')
+        return render_template('analytics.html', stats={})
+
+    # Running per-series statistics, kept current on each screening (see trends.py)
+    series_trends = trends.user_trends(session, user_id)
+    stats['trend'] = series_trends.get('score', {}).get('direction') or 'Stable'
+    return render_template('analytics.html', stats=stats, trends=series_trends)
 
 # COPING STRATEGIES
-@app.route('/coping-strategies')
+@main.route('/coping-strategies')
 @login_required
+@read_from_replica
 def coping_strategies():
-    session = SessionLocal()
-    try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        strategies = session.query(CopingLog).filter_by(user_id=user_id).order_by(CopingLog.created_at.desc()).all()
-        return render_template('coping_strategies.html', strategies=strategies)
-    finally:
-        session.close()
+    session = get_db()
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+    strategies = session.query(CopingLog).filter_by(user_id=user_id).order_by(CopingLog.created_at.desc()).all()
+    return render_template('coping_strategies.html', strategies=strategies)
 
 # LOG COPING STRATEGY
-@app.route('/log-strategy', methods=['GET', 'POST'])
+@main.route('/log-strategy', methods=['GET', 'POST'])
 @login_required
 def log_strategy():
     form = CopingLogForm()
-    session = SessionLocal()
-    try:
-        if form.validate_on_submit():
-            user_id = get_user_id()
-            if not user_id:
-                flash('User session expired. Please log in again.', 'warning')
-                return redirect(url_for('login'))
-            log = CopingLog(
-                user_id=user_id,
-                strategy=form.strategy.data,
-                description=form.description.data,
-                effectiveness=int(form.effectiveness.data) if form.effectiveness.data else None
-            )
-            session.add(log)
-            session.commit()
-            flash('Strategy logged successfully!', 'success')
-            return redirect(url_for('coping_strategies'))
-        
-        return render_template('log_strategy.html', form=form)
-    finally:
-        session.close()
+    if form.validate_on_submit():
+        session = get_db(write=True)
+        user_id = get_user_id()
+        if not user_id:
+            flash('User session expired. Please log in again.', 'warning')
+            return redirect(url_for('main.login'))
+        log = CopingLog(
+            user_id=user_id,
+            strategy=form.strategy.data,
+            description=form.description.data,
+            effectiveness=int(form.effectiveness.data) if form.effectiveness.data else None
+        )
+        session.add(log)
+        session.commit()
+        flash('Strategy logged successfully!', 'success')
+        return redirect(url_for('main.coping_strategies'))
+
+    return render_template('log_strategy.html', form=form)
 
 # EXPORT DATA
-@app.route('/export-data')
+@main.route('/export-data')
 @login_required
 def export_data():
-    session = SessionLocal()
+    user_id = get_user_id()
+    if not user_id:
+        flash('User session expired. Please log in again.', 'warning')
+        return redirect(url_for('main.login'))
+
+    fmt = request.args.get('format', 'csv')
+    dataset = request.args.get('dataset', 'screenings')
+    if fmt not in exports.FORMATS or (dataset != 'all' and dataset not in exports.DATASETS):
+        flash('Unsupported export type.', 'warning')
+        return redirect(url_for('main.screening_history'))
+
+    # Long histories are built in the background instead of holding a worker
+    if get_user_stats(get_db(), user_id).screening_count > export_jobs.EXPORT_SYNC_MAX_ROWS:
+        session = get_db(write=True)
+        export_jobs.request_export(session, user_id, dataset, fmt)
+        session.commit()
+        flash('Your history is large, so the export is being prepared. It will be listed here when ready.', 'info')
+        return redirect(url_for('main.export_list'))
+
+    stamp = datetime.now().strftime("%Y%m%d")
+    if dataset == 'all':
+        body = exports.stream_bundle(get_db(), user_id, fmt)
+        mimetype, filename = 'application/zip', f'mindcare_data_{stamp}.zip'
+    else:
+        body = exports.stream_dataset(get_db(), user_id, dataset, fmt)
+        mimetype = exports.FORMATS[fmt][0]
+        prefix = 'screening_data' if dataset == 'screenings' else f'{dataset}_data'
+        filename = f'{prefix}_{stamp}.{exports.FORMATS[fmt][1]}'
+
+    # Rows are streamed from the database as the client downloads them
+    return Response(stream_with_context(body), content_type=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# EXPORT JOBS (built in the background, see export_jobs.py)
+@main.route('/exports', methods=['GET', 'POST'])
+@login_required
+def export_list():
+    user_id = get_user_id()
+    form = ExportForm()
+    if form.validate_on_submit():
+        scope = 'population' if form.population.data else 'user'
+        if scope == 'population' and not is_verified_admin():
+            abort(403)
+        session = get_db(write=True)
+        export_jobs.request_export(session, user_id, form.dataset.data, form.format.data, scope)
+        session.commit()
+        flash('Export requested. It will be ready to download shortly.', 'success')
+        return redirect(url_for('main.export_list'))
+    recent = export_jobs.recent_exports(get_db(), user_id)
+    return render_template('exports.html', form=form, exports=[export_jobs.status_json(e) for e in recent])
+
+def _own_export(export_id):
+    export = get_db().get(ExportJob, export_id)
+    if export is None or export.user_id != get_user_id():
+        abort(404)
+    return export
+
+@main.route('/exports/<int:export_id>')
+@login_required
+def export_status(export_id):
+    return jsonify(export_jobs.status_json(_own_export(export_id)))
+
+@main.route('/exports/<int:export_id>/download')
+@login_required
+def export_download(export_id):
+    export = _own_export(export_id)
+    if export_jobs.is_expired(export):
+        abort(410)
+    if export.status != 'ready':
+        abort(409)
+    # conditional=True answers Range and If-None-Match / If-Modified-Since
+    mimetype = 'application/zip' if export.filename.endswith('.zip') else 'application/gzip'
+    return send_file(export.path, mimetype=mimetype, as_attachment=True,
+                     download_name=export.filename, conditional=True)
+
+# JSON API (read-only, ETag / conditional GET)
+API_MAX_PAGE_SIZE = 100
+
+def _screening_json(s):
+    return {
+        'id': s.id,
+        'created_at': s.created_at.isoformat(),
+        'score': s.score,
+        'level': s.level,
+        'stress_score': s.stress_score,
+        'anxiety_score': s.anxiety_score,
+        'sleep_score': s.sleep_score,
+        'depression_score': s.depression_score,
+        'social_score': s.social_score,
+        'notes': s.notes,
+    }
+
+def _coping_log_json(log):
+    return {
+        'id': log.id,
+        'created_at': log.created_at.isoformat(),
+        'strategy': log.strategy,
+        'description': log.description,
+        'effectiveness': log.effectiveness,
+    }
+
+def _api_page(name, model, serialize):
+    """Keyset-paginated, newest-first listing of the current user's rows."""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'authentication required'}), 401
+    session = get_db()
+    user_id = get_user_id()
+    before, after = request.args.get('before'), request.args.get('after')
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+
+    def build():
+        page = keyset_page(session.query(model).filter_by(user_id=user_id), model, limit,
+                           before=before, after=after)
+        return {
+            'items': [serialize(row) for row in page.items],
+            'newer_cursor': page.newer_cursor,
+            'older_cursor': page.older_cursor,
+        }
+
+    version = data_version(session, user_id, model)
+    return conditional_json(make_etag(name, user_id, version, before, after, limit), build)
+
+@main.route('/api/screenings')
+def api_screenings():
+    return _api_page('screenings', Screening, _screening_json)
+
+@main.route('/api/coping-logs')
+def api_coping_logs():
+    return _api_page('coping_logs', CopingLog, _coping_log_json)
+
+@main.route('/api/stats')
+def api_stats():
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'authentication required'}), 401
+    session = get_db()
+    user_id = get_user_id()
+    version = data_version(session, user_id, Screening, CopingLog)
+
+    def build():
+        stats = analytics_summary(session, user_id)
+        return {
+            'screenings': stats,
+            'coping_log_count': version[1][0],
+        }
+
+    return conditional_json(make_etag('stats', user_id, version), build)
+
+# OFFLINE SYNC API
+@main.route('/api/sync', methods=['POST'])
+@query_budget(30)
+def sync_upload():
+    # JSON clients get a 401 rather than the login-page redirect
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'authentication required'}), 401
     try:
-        user_id = get_user_id()
-        if not user_id:
-            flash('User session expired. Please log in again.', 'warning')
-            return redirect(url_for('login'))
-        screenings = session.query(Screening).filter_by(user_id=user_id).order_by(Screening.created_at).all()
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Date', 'Score', 'Level', 'Stress', 'Anxiety', 'Sleep', 'Depression', 'Social', 'Notes'])
-        
-        for s in screenings:
-            writer.writerow([
-                s.created_at.strftime('%Y-%m-%d %H:%M'),
-                s.score,
-                s.level,
-                s.stress_score or '',
-                s.anxiety_score or '',
-                s.sleep_score or '',
-                s.depression_score or '',
-                s.social_score or '',
-                s.notes or ''
-            ])
-        
-        output.seek(0)
-        # send_file requires a binary file-like object; encode CSV to bytes
-        csv_bytes = output.getvalue().encode('utf-8')
-        bytes_io = BytesIO(csv_bytes)
-        bytes_io.seek(0)
-        return send_file(
-            bytes_io,
-            mimetype='text/csv; charset=utf-8',
-            as_attachment=True,
-            download_name=f'screening_data_{datetime.now().strftime("%Y%m%d")}.csv'
-        )
-    finally:
-        session.close()
+        items = sync.read_payload(request)
+    except sync.SyncError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    session = get_db(write=True)
+    summary = sync.apply_batch(session, get_user_id(), items)
+    if summary['created']:
+        rollups.schedule_refresh(session)
+    session.commit()
+    return jsonify(summary)
 
 # ADMIN DASHBOARD
-@app.route('/admin')
+@main.route('/admin')
 @admin_required
+@query_budget(8)
+@read_from_replica
 def admin_dashboard():
-    session = SessionLocal()
-    try:
-        total_users = session.query(User).count()
-        total_screenings = session.query(Screening).count()
-        users = session.query(User).all()
-        
-        return render_template('admin_dashboard.html', 
-                             total_users=total_users,
-                             total_screenings=total_screenings,
-                             users=users)
-    finally:
-        session.close()
+    session = get_db()
+    total_users, total_screenings = admin_users.directory_totals(session)
+    search = request.args.get('q', '').strip()
+    sort = request.args.get('sort', admin_users.DEFAULT_SORT)
+    if sort not in admin_users.SORTS:
+        sort = admin_users.DEFAULT_SORT
+    direction = 'asc' if request.args.get('dir') == 'asc' else 'desc'
+    page = admin_users.user_directory(session, search, sort, direction, request.args.get('page', 1, type=int))
+
+    return render_template('admin_dashboard.html', 
+                         total_users=total_users,
+                         total_screenings=total_screenings,
+                         avg_screenings=round(total_screenings / total_users, 2) if total_users else 0,
+                         page=page,
+                         search=search,
+                         sort=sort,
+                         direction=direction)
+
+# ADMIN TRENDS
+@main.route('/admin/trends')
+@admin_required
+def admin_trends():
+    period = request.args.get('period', rollups.DEFAULT_PERIOD)
+    if period not in rollups.PERIODS:
+        period = rollups.DEFAULT_PERIOD
+    # Read-only: the rollups are kept current by the queued refresh job (or cron)
+    session = get_db()
+    return render_template('admin_trends.html', report=rollups.trend_report(session, period),
+                           period=period, periods=list(rollups.PERIODS))
+
+# METRICS (Prometheus text format, for admins or a scraper with METRICS_TOKEN)
+@main.route('/metrics', endpoint='metrics')
+def prometheus_metrics():
+    if not metrics.is_authorized(current_user):
+        abort(403)
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type, headers={'Cache-Control': 'no-store'})
+
+# ADMIN IMPORT
+@main.route('/admin/import', methods=['GET', 'POST'])
+@admin_required
+@query_budget(0)
+def admin_import():
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        # The upload is already spooled to disk by werkzeug; read it as a stream
+        stream = io.TextIOWrapper(form.file.data.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = imports.import_screenings(get_db(write=True), stream, create_users=form.create_users.data)
+        except (imports.ImportFileError, UnicodeDecodeError) as e:
+            flash(f'Import failed: {e}', 'danger')
+        else:
+            flash(f'Imported {report.imported} screening(s); {report.error_count} row(s) skipped.',
+                  'success' if not report.error_count else 'warning')
+    return render_template('admin_import.html', form=form, report=report)
+
+# ADMIN IDENTITY CACHE STATS
+@main.route('/admin/identity-cache')
+@admin_required
+def identity_cache_stats():
+    return jsonify(identity_cache.stats())
 
 # ADMIN USER MANAGEMENT
-@app.route('/admin/users/<int:user_id>/toggle-admin', methods=['POST'])
+@main.route('/admin/users/<int:user_id>/toggle-admin', methods=['POST'])
 @admin_required
 def toggle_admin(user_id):
-    session = SessionLocal()
-    try:
-        user = session.query(User).get(user_id)
-        if user:
-            user.role = 'admin' if user.role != 'admin' else 'user'
-            session.commit()
-            flash(f'User {user.username} role updated.', 'success')
-        return redirect(url_for('admin_dashboard'))
-    finally:
-        session.close()
+    session = get_db(write=True)
+    user = session.query(User).get(user_id)
+    if user:
+        user.role = 'admin' if user.role != 'admin' else 'user'
+        session.commit()
+        identity_cache.invalidate(user_id)
+        flash(f'User {user.username} role updated.', 'success')
+    return redirect(url_for('main.admin_dashboard'))
 
 # ADMIN DELETE USER
-@app.route('/admin/users/<int:user_id>/delete', methods=['POST'])
+@main.route('/admin/users/<int:user_id>/delete', methods=['POST'])
 @admin_required
 def delete_user(user_id):
     if user_id == current_user.id:
         flash('Cannot delete your own account.', 'danger')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
-    session = SessionLocal()
-    try:
-        user = session.query(User).get(user_id)
-        if user:
-            session.delete(user)
-            session.commit()
-            flash(f'User {user.username} deleted.', 'success')
-        return redirect(url_for('admin_dashboard'))
-    finally:
-        session.close()
-
-@app.route('/logout')
+    session = get_db(write=True)
+    user = session.query(User).get(user_id)
+    if user:
+        rollups.forget_user(session, user_id)
+        session.delete(user)
+        session.commit()
+        identity_cache.invalidate(user_id)
+        series_cache.invalidate(user_id)
+        flash(f'User {user.username} deleted.', 'success')
+    return redirect(url_for('main.admin_dashboard'))
+
+@main.cli.command('rebuild-stats')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+@click.option('--check', is_flag=True, help='Report drifted users without writing.')
+def rebuild_stats_command(user_id, check):
+    """Recompute the user_stats summary table from screenings."""
+    session = get_db()
+    if check:
+        drifted = check_user_stats(session)
+        click.echo(f'{len(drifted)} user(s) out of sync' + (f': {drifted}' if drifted else ''))
+        return
+    count = rebuild_user_stats(session, user_id)
+    session.commit()
+    click.echo(f'Rebuilt stats for {count} user(s).')
+
+@main.cli.command('rebuild-trends')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_trends_command(user_id):
+    """Recompute per-dimension trend statistics by replaying screenings."""
+    session = get_db(write=True)
+    count = trends.rebuild(session, user_id)
+    session.commit()
+    click.echo(f'Rebuilt trends for {count} user(s).')
+
+@main.cli.command('refresh-rollups')
+@click.option('--rebuild', is_flag=True, help='Recompute from scratch instead of incrementally.')
+def refresh_rollups_command(rebuild):
+    """Fold new screenings into the daily population rollups."""
+    session = get_db(write=True)
+    count = rollups.rebuild_rollups(session) if rebuild else rollups.refresh_rollups(session)
+    session.commit()
+    click.echo(f'Rolled up {count} screening(s).')
+
+@main.cli.command('copy-replica')
+def copy_replica_command():
+    """Copy the primary SQLite database over each SQLite replica (local stand-in for replication)."""
+    primary = database.engine_for(current_app)
+    for replica in replicas.replicas:
+        if primary.url.get_backend_name() != 'sqlite' or replica.engine.url.get_backend_name() != 'sqlite':
+            click.echo(f'Skipped {replica.name}: only SQLite files can be copied.')
+            continue
+        replicas.copy_sqlite(primary.url, replica.engine.url)
+        click.echo(f'Copied the primary to {replica.name}.')
+
+@main.cli.command('drain-jobs')
+@click.option('--limit', type=int, default=None, help='Stop after this many jobs.')
+@click.option('--retry-failed', is_flag=True, help='Re-queue failed jobs first.')
+def drain_jobs_command(limit, retry_failed):
+    """Run queued background jobs in the foreground until none are due."""
+    session = get_db()
+    if retry_failed:
+        click.echo(f'Re-queued {jobs.retry_failed(session)} failed job(s).')
+        session.commit()
+    succeeded, failed = jobs.drain(session, limit)
+    pruned = jobs.prune(session)
+    session.commit()
+    click.echo(f'{succeeded} job(s) done, {failed} failed; pruned {pruned} old job(s).')
+
+@main.cli.command('import-screenings')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--create-users', is_flag=True, help='Create accounts for unknown usernames.')
+@click.option('--chunk-size', type=int, default=None, help='Rows per batch (default 5000).')
+def import_screenings_command(path, create_users, chunk_size):
+    """Bulk-import screenings from a CSV file (export layout plus Username)."""
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        try:
+            report = imports.import_screenings(get_db(), stream, create_users, chunk_size)
+        except imports.ImportFileError as e:
+            raise click.ClickException(str(e))
+    click.echo(f'{report.imported} of {report.rows} row(s) imported, '
+               f'{report.error_count} skipped, {report.users_created} user(s) created.')
+    for line, message in report.errors:
+        click.echo(f'  line {line}: {message}', err=True)
+
+@main.cli.command('rescore-screenings')
+@click.argument('questionnaire', type=click.Choice(sorted(REGISTRY)))
+@click.option('--all', 'everything', is_flag=True, help='Also re-check rows already on the current version.')
+@click.option('--chunk-size', type=int, default=None, help='Rows per batch (default 10000).')
+@click.option('--dry-run', is_flag=True, help='Report level changes without writing.')
+def rescore_screenings_command(questionnaire, everything, chunk_size, dry_run):
+    """Re-level stored screenings with the current questionnaire version."""
+    report = rescoring.rescore_screenings(get_db(), questionnaire, chunk_size, dry_run, everything)
+    verb = 'would be' if dry_run else 'were'
+    click.echo(f'{report.scanned} screening(s) scanned, {report.updated} {verb} updated '
+               f'to {questionnaire} v{report.questionnaire.version}.')
+    for (old, new), count in sorted(report.transitions.items()):
+        click.echo(f'  {old} -> {new}: {count}')
+
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
 
+# The app gunicorn serves (`app:app`) and `flask --app app` uses
+app = create_app()
 
 if __name__ == '__main__':
+    # The development server is its own pre-start step
+    from flask_migrate import upgrade
+    with app.app_context():
+        upgrade()
+    app.config['JOB_WORKER_AUTOSTART'] = True
     app.run(debug=True)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Measure login throughput for password hashing policies.
+
+Each login is the production path minus HTTP: one `find_login_user` lookup
+against an in-memory database plus one `check_password`. Runs in a single
+thread, so the figure is logins per second per (single-threaded) worker.
+
+    python bench_passwords.py
+    python bench_passwords.py --method scrypt:16384:8:1 --method pbkdf2:sha256:600000 --seconds 5
+"""
+
+import argparse
+import json
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User
+from passwords import hash_password
+
+DEFAULT_METHODS = [
+    'scrypt:32768:8:1',
+    'scrypt:16384:8:1',
+    'pbkdf2:sha256:1000000',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:260000',
+]
+
+
+def bench(method, seconds, find_login_user):
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(username='BenchUser', email='bench@example.com', password=hash_password('correct horse', method)))
+    session.commit()
+
+    logins = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        session.expire_all()
+        user = find_login_user(session, 'benchuser')
+        assert user.check_password('correct horse')
+        logins += 1
+    elapsed = time.perf_counter() - start
+    session.close()
+    engine.dispose()
+    return {'method': method, 'logins': logins, 'seconds': round(elapsed, 3),
+            'logins_per_second': round(logins / elapsed, 2), 'ms_per_login': round(1000 * elapsed / logins, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--method', action='append', help='hash method to measure (repeatable)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='time spent on each method')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    from app import find_login_user
+
+    results = [bench(method, args.seconds, find_login_user) for method in args.method or DEFAULT_METHODS]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f'{"method":<26}{"logins/s":>10}{"ms/login":>10}')
+    for r in results:
+        print(f'{r["method"]:<26}{r["logins_per_second"]:>10}{r["ms_per_login"]:>10}')
+
+
+if __name__ == '__main__':
+    main()
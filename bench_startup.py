@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Measure worker cold start: time and memory to import the app, and what it imports.
+
+Each run is a fresh interpreter doing what a gunicorn worker does without
+--preload: `import app` and build the WSGI app. Reports the median wall time
+and peak RSS over the runs, plus the slowest imports from `python -X
+importtime` (cumulative, so a package includes everything it pulls in).
+
+    python bench_startup.py
+    python bench_startup.py --runs 10 --top 25 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = '''
+import json, resource, time
+start = time.perf_counter()
+from app import app
+app.wsgi_app
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def run_once(importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    # Keep the probe off the real database and job queue
+    env = dict(os.environ, DATABASE_URL='sqlite://', JOB_WORKER_THREADS='0')
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(stderr, top):
+    """[(cumulative ms, self ms, module)] from -X importtime output, slowest first."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative) / 1000, int(own) / 1000, name.strip()))
+    # Top-level imports only for the headline; nested ones are inside them
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    samples = [run_once()[0] for _ in range(args.runs)]
+    _, stderr = run_once(importtime=True)
+    result = {
+        'runs': args.runs,
+        'import_seconds': round(statistics.median(s['seconds'] for s in samples), 3),
+        'max_rss_mb': round(statistics.median(s['max_rss_mb'] for s in samples), 1),
+        'slowest_imports': [
+            {'module': name, 'cumulative_ms': round(cumulative, 1), 'self_ms': round(own, 1)}
+            for cumulative, own, name in slowest_imports(stderr, args.top)
+        ],
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f'import app: {result["import_seconds"]}s, peak RSS {result["max_rss_mb"]} MB '
+          f'(median of {args.runs})')
+    print(f'{"cumulative ms":>14}{"self ms":>9}  module')
+    for row in result['slowest_imports']:
+        print(f'{row["cumulative_ms"]:>14}{row["self_ms"]:>9}  {row["module"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Request-scoped SQLAlchemy sessions.
+
+Views call `get_db()` instead of opening their own `SessionLocal()`. The first
+call in a request creates the session; the teardown hook commits it if the
+request finished without an exception and rolls it back otherwise, then closes
+it. Views may still `commit()` explicitly when they need the outcome before
+responding (e.g. to catch a unique-constraint error).
+
+Views marked `@read_from_replica` get a second, read-only session on a
+replica for their `get_db()` calls (see replicas.py); it is never committed.
+"""
+
+from flask import g, current_app
+from sqlalchemy.orm import sessionmaker
+
+import models
+import replicas
+
+
+def get_db(write=False):
+    """Return the session for the current request, creating it on first use.
+
+    Pass `write=True` before making changes. On SQLite this starts the
+    transaction with BEGIN IMMEDIATE, so concurrent writers queue on
+    busy_timeout instead of failing with "database is locked" when a read
+    transaction tries to upgrade. Read-only work never takes the write lock.
+
+    In a `@read_from_replica` view, reads come from a replica when one is
+    available; writes always go to the primary.
+    """
+    if not write and g.get('read_replica'):
+        session = g.get('replica_session')
+        if session is None:
+            session = g.replica_session = replicas.open_session()
+        if session is not None:
+            return session
+        g.read_replica = False  # no replica available: use the primary
+    session = g.get('db_session')
+    if session is None:
+        session = g.db_session = sessionmaker_for(current_app)()
+    if write and not session.info.get('write'):
+        if session.in_transaction():
+            session.commit()
+        session.info['write'] = True
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+    return session
+
+
+def close_db(exc=None):
+    replica_session = g.pop('replica_session', None)
+    if replica_session is not None:
+        replica_session.close()
+    session = g.pop('db_session', None)
+    if session is None:
+        return
+    try:
+        if exc is None:
+            session.commit()
+        else:
+            session.rollback()
+    finally:
+        session.close()
+
+
+def sessionmaker_for(app):
+    """The app's own session factory, else models.SessionLocal (looked up per call, so tests can swap it)."""
+    return app.extensions.get('database') or models.SessionLocal
+
+
+def engine_for(app):
+    return sessionmaker_for(app).kw['bind']
+
+
+def init_app(app):
+    """Register the teardown. DATABASE_URL in the app's config gives the app its own engine."""
+    url = app.config.get('DATABASE_URL')
+    if url:
+        app.extensions['database'] = sessionmaker(bind=models.create_db_engine(url), autoflush=False, autocommit=False)
+    app.teardown_appcontext(close_db)
+    replicas.init_app(app)
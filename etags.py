@@ -0,0 +1,60 @@
+"""Conditional GET for per-user JSON endpoints.
+
+Users add screenings and coping logs but never edit them, so (row count,
+highest id) per table tracks their changes. The one in-place change,
+re-scoring after a questionnaire revision, bumps `users.data_revision`
+through `bump_revision()`, and that is part of the version too. It is all
+read with one query of index and primary-key lookups, which lets a poll that
+matches the client's ETag answer 304 without loading rows.
+"""
+
+import hashlib
+
+from flask import request, jsonify, Response
+from sqlalchemy import select, update, func
+
+from models import User
+from stats import user_id_batches
+
+# Part of every tag, so changing a payload's shape invalidates client caches
+API_VERSION = '1'
+
+
+def data_version(session, user_id, *models):
+    """Return ((count, max id), ..., revision) for each model's rows owned by `user_id`."""
+    columns = []
+    for model in models:
+        columns.append(select(func.count(model.id)).where(model.user_id == user_id).scalar_subquery())
+        columns.append(select(func.max(model.id)).where(model.user_id == user_id).scalar_subquery())
+    columns.append(select(User.data_revision).where(User.id == user_id).scalar_subquery())
+    *counts, revision = session.execute(select(*columns)).one()
+    return tuple(zip(counts[::2], counts[1::2])) + (revision,)
+
+
+def bump_revision(session, user_ids):
+    """Invalidate the data versions of `user_ids` after changing their rows in place."""
+    for ids in user_id_batches(user_ids):
+        session.execute(update(User).where(User.id.in_(ids))
+                        .values(data_revision=User.data_revision + 1)
+                        .execution_options(synchronize_session=False))
+
+
+def make_etag(name, user_id, version, *extra):
+    """Strong ETag for one endpoint, user, data version and request parameters."""
+    raw = '|'.join(str(part) for part in (API_VERSION, name, user_id, version) + extra)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_json(etag, build):
+    """Answer 304 if the client already holds `etag`, else JSON from `build()`.
+
+    `build` is only called when the body is actually needed.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Cacheable by the browser only, and always revalidated
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,151 @@
+"""Background exports for large histories and whole-population datasets.
+
+Requesting an export only inserts an `export_jobs` row and queues a
+`build_export` job, so the request returns immediately however much data is
+involved. The job writes the export to EXPORT_DIR (a single dataset as
+``.csv.gz`` / ``.jsonl.gz``, everything as a ``.zip``) through a temporary
+file, then marks it ready. Downloads are served from disk with Range and
+conditional request support. Each artifact is deleted EXPORT_TTL_HOURS after
+it is built by an `expire_export` job; downloads past that time get 410.
+"""
+
+import gzip
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+import exports
+import jobs
+from models import ExportJob
+
+log = logging.getLogger(__name__)
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports'))
+EXPORT_TTL_HOURS = int(os.environ.get('EXPORT_TTL_HOURS', '24'))
+# /export-data streams histories up to this many screenings; larger ones are
+# turned into a background export
+EXPORT_SYNC_MAX_ROWS = int(os.environ.get('EXPORT_SYNC_MAX_ROWS', '5000'))
+
+SCOPES = ('user', 'population')
+ACTIVE = ('pending', 'running')
+
+
+def request_export(session, user_id, dataset, fmt, scope='user'):
+    """Create (or reuse an in-progress) export and queue its build. The caller commits."""
+    existing = session.execute(
+        select(ExportJob).where(
+            ExportJob.user_id == user_id, ExportJob.scope == scope, ExportJob.dataset == dataset,
+            ExportJob.format == fmt, ExportJob.status.in_(ACTIVE),
+        ).limit(1)
+    ).scalar()
+    if existing is not None:
+        return existing
+    export = ExportJob(user_id=user_id, scope=scope, dataset=dataset, format=fmt)
+    session.add(export)
+    session.flush()
+    jobs.enqueue(session, 'build_export', {'export_id': export.id}, key=f'build_export:{export.id}')
+    return export
+
+
+def _filename(export, stamp):
+    prefix = 'mindcare_population' if export.scope == 'population' else 'mindcare'
+    if export.dataset == 'all':
+        return f'{prefix}_data_{stamp}.zip'
+    return f'{prefix}_{export.dataset}_{stamp}.{exports.FORMATS[export.format][1]}.gz'
+
+
+def _write(session, export, target):
+    user_id = None if export.scope == 'population' else export.user_id
+    if export.dataset == 'all':
+        with open(target, 'wb') as out:
+            for chunk in exports.stream_bundle(session, user_id, export.format):
+                out.write(chunk)
+    else:
+        with gzip.open(target, 'wb', compresslevel=6) as out:
+            for chunk in exports.stream_dataset(session, user_id, export.dataset, export.format):
+                out.write(chunk)
+
+
+@jobs.handler('build_export')
+def build_export(session, export_id):
+    export = session.get(ExportJob, export_id)
+    if export is None or export.status not in ACTIVE:
+        return  # requester deleted, or already built by an earlier attempt
+    # Mark progress in its own commit so pollers see it
+    export.status = 'running'
+    session.commit()
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    filename = _filename(export, datetime.utcnow().strftime('%Y%m%d'))
+    path = os.path.join(EXPORT_DIR, f'{export.id}-{filename}')
+    partial = path + '.part'
+    try:
+        _write(session, export, partial)
+        os.replace(partial, path)
+    except Exception as e:
+        log.exception('Export %s failed', export_id)
+        session.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        # Reported to the requester, who can ask again; not retried
+        _finish(session, export_id, status='failed', error=f'{type(e).__name__}: {e}'[:2000])
+        return
+
+    export = _finish(session, export_id, status='ready', error=None, path=path, filename=filename,
+                     size=os.path.getsize(path))
+    jobs.enqueue(session, 'expire_export', {'export_id': export.id, 'path': path},
+                 key=f'expire_export:{export.id}', delay=EXPORT_TTL_HOURS * 3600)
+
+
+def _finish(session, export_id, **values):
+    # The build read in its own transaction; take the write lock afresh rather
+    # than upgrading a long-lived read transaction.
+    session.commit()
+    session.connection(execution_options={'sqlite_begin_immediate': True})
+    export = session.get(ExportJob, export_id)
+    for name, value in values.items():
+        setattr(export, name, value)
+    export.finished_at = datetime.utcnow()
+    if export.status == 'ready':
+        export.expires_at = export.finished_at + timedelta(hours=EXPORT_TTL_HOURS)
+    return export
+
+
+@jobs.handler('expire_export')
+def expire_export(session, export_id, path):
+    # The row may be gone with its user; the file is removed regardless
+    if os.path.exists(path):
+        os.remove(path)
+    export = session.get(ExportJob, export_id)
+    if export is not None and export.status == 'ready':
+        export.status, export.path = 'expired', None
+
+
+def is_expired(export, now=None):
+    return export.status == 'expired' or (
+        export.expires_at is not None and export.expires_at <= (now or datetime.utcnow())
+    )
+
+
+def status_json(export):
+    return {
+        'id': export.id,
+        'status': 'expired' if export.status == 'ready' and is_expired(export) else export.status,
+        'scope': export.scope,
+        'dataset': export.dataset,
+        'format': export.format,
+        'filename': export.filename,
+        'size': export.size,
+        'created_at': export.created_at.isoformat() if export.created_at else None,
+        'expires_at': export.expires_at.isoformat() if export.expires_at else None,
+        'error': export.error,
+    }
+
+
+def recent_exports(session, user_id, limit=20):
+    return session.execute(
+        select(ExportJob).where(ExportJob.user_id == user_id)
+        .order_by(ExportJob.created_at.desc(), ExportJob.id.desc()).limit(limit)
+    ).scalars().all()
@@ -0,0 +1,168 @@
+"""Streaming data exports (CSV, JSON lines and a ZIP bundle).
+
+Rows are read from the database in chunks (`yield_per`, which uses a
+server-side cursor where the driver supports one) and encoded straight into
+the response, so memory per export stays constant regardless of history size.
+"""
+
+import csv
+import io
+import json
+import zipfile
+
+from sqlalchemy import select
+
+from models import Screening, CopingLog, RecommendationTemplate, ScreeningRecommendation
+
+# Rows fetched per database round trip
+CHUNK_SIZE = 500
+# Approximate bytes buffered before a chunk is handed to the WSGI server
+FLUSH_BYTES = 64 * 1024
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+
+
+def _datetime_csv(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _datetime_json(value):
+    return value.isoformat() if value else None
+
+
+# Each dataset: statement (all owners), the owner column, and (CSV header,
+# JSON key) per selected column.
+DATASETS = {
+    'screenings': {
+        'statement': lambda: (
+            select(Screening.created_at, Screening.score, Screening.level,
+                   Screening.stress_score, Screening.anxiety_score, Screening.sleep_score,
+                   Screening.depression_score, Screening.social_score, Screening.notes)
+            .order_by(Screening.created_at, Screening.id)
+        ),
+        'owner': Screening.user_id,
+        'columns': [('Date', 'date'), ('Score', 'score'), ('Level', 'level'),
+                    ('Stress', 'stress_score'), ('Anxiety', 'anxiety_score'), ('Sleep', 'sleep_score'),
+                    ('Depression', 'depression_score'), ('Social', 'social_score'), ('Notes', 'notes')],
+    },
+    'coping_logs': {
+        'statement': lambda: (
+            select(CopingLog.created_at, CopingLog.strategy, CopingLog.description, CopingLog.effectiveness)
+            .order_by(CopingLog.created_at, CopingLog.id)
+        ),
+        'owner': CopingLog.user_id,
+        'columns': [('Date', 'date'), ('Strategy', 'strategy'), ('Description', 'description'),
+                    ('Effectiveness', 'effectiveness')],
+    },
+    'recommendations': {
+        'statement': lambda: (
+            select(Screening.created_at, ScreeningRecommendation.screening_id, RecommendationTemplate.category,
+                   RecommendationTemplate.title, RecommendationTemplate.description, RecommendationTemplate.url)
+            .join(ScreeningRecommendation, ScreeningRecommendation.screening_id == Screening.id)
+            .join(RecommendationTemplate, RecommendationTemplate.id == ScreeningRecommendation.template_id)
+            .order_by(Screening.created_at, ScreeningRecommendation.screening_id, RecommendationTemplate.position)
+        ),
+        'owner': Screening.user_id,
+        'columns': [('Date', 'date'), ('Screening', 'screening_id'), ('Category', 'category'),
+                    ('Title', 'title'), ('Description', 'description'), ('URL', 'url')],
+    },
+}
+# Population exports (user_id=None) identify owners by id only
+OWNER_COLUMN = ('User', 'user_id')
+
+
+class _Echo:
+    """File-like object whose write() hands back the encoded line."""
+
+    def write(self, value):
+        return value
+
+
+def _rows(session, dataset, user_id):
+    spec = DATASETS[dataset]
+    stmt = spec['statement']()
+    if user_id is None:
+        stmt = stmt.add_columns(spec['owner'])
+    else:
+        stmt = stmt.where(spec['owner'] == user_id)
+    return session.execute(stmt.execution_options(yield_per=CHUNK_SIZE))
+
+
+def _encode_lines(session, dataset, user_id, fmt):
+    """Yield encoded lines (str) for one dataset, header first for CSV."""
+    columns = DATASETS[dataset]['columns'] + ([OWNER_COLUMN] if user_id is None else [])
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow([header for header, _ in columns])
+        for row in _rows(session, dataset, user_id):
+            yield writer.writerow([_datetime_csv(row[0])] + ['' if v is None else v for v in row[1:]])
+    else:
+        keys = [key for _, key in columns]
+        for row in _rows(session, dataset, user_id):
+            yield json.dumps(dict(zip(keys, [_datetime_json(row[0])] + list(row[1:])))) + '\n'
+
+
+def _chunked(lines):
+    """Group small strings into ~FLUSH_BYTES UTF-8 chunks."""
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def stream_dataset(session, user_id, dataset='screenings', fmt='csv'):
+    """Yield the bytes of a single-dataset export (every user's if `user_id` is None).
+
+    The session must stay open while the generator is consumed; in a view that
+    means the request-scoped session together with `stream_with_context`.
+    """
+    yield from _chunked(_encode_lines(session, dataset, user_id, fmt))
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that lets zipfile output be drained as it is produced."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_bundle(session, user_id, fmt='csv'):
+    """Yield a ZIP archive containing every dataset for a user (or everyone).
+
+    zipfile writes data descriptors when the target is not seekable, so each
+    member is compressed and emitted incrementally.
+    """
+    extension = FORMATS[fmt][1]
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset in DATASETS:
+            with archive.open(f'{dataset}.{extension}', mode='w', force_zip64=True) as member:
+                for chunk in _chunked(_encode_lines(session, dataset, user_id, fmt)):
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
@@ -1,6 +1,5 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 
-# Initialize extensions (no app bound yet)
-db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+# Initialize extensions (no app bound yet). Models use plain SQLAlchemy
+# (models.py, database.py), so there is no Flask-SQLAlchemy `db` here.
+migrate = Migrate()
@@ -0,0 +1,46 @@
+"""Gunicorn settings, read automatically from the working directory.
+
+Command-line flags (as in the Dockerfile and Procfile) override these.
+
+Startup phases: the schema is upgraded before gunicorn starts (see the
+Dockerfile); the master imports the app once (`preload_app`), so workers are
+forked with the code already loaded and share its memory; each worker then
+starts its job worker and opens its own database connections on first use.
+"""
+
+import os
+import shutil
+
+# Import the app in the master and fork it. Set GUNICORN_PRELOAD=0 to import
+# in every worker instead (needed for `--reload` during development).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+
+# Workers share their Prometheus samples through files here (see metrics.py).
+# Set before the app is imported.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/mindcare-metrics')
+
+
+def on_starting(server):
+    # Samples left by a previous server would be added to this one's
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master (if any) must not be shared with
+    # the children; drop them without closing the parent's sockets.
+    import database
+    import models
+    import replicas
+    app = server.app.wsgi()
+    models.engine.dispose(close=False)
+    database.engine_for(app).dispose(close=False)
+    replicas.dispose(close=False)
+    # Each worker runs queued background jobs in its own thread pool, on the app's database
+    import jobs
+    jobs.worker.start(app)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
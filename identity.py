@@ -0,0 +1,113 @@
+"""In-process identity cache for Flask-Login's user_loader.
+
+Every authenticated request asks Flask-Login for the current user. Instead of
+loading the full `User` row each time, a small, bounded, TTL'd cache keeps just
+the fields requests actually read. Views that change those fields (or delete
+the user) call `identity_cache.invalidate(user_id)`.
+
+The cache is per process: with several gunicorn workers another worker may
+serve a stale identity for up to IDENTITY_CACHE_TTL seconds, so `admin_required`
+re-checks the role against the database before granting admin access.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+from models import User
+
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+IDENTITY_CACHE_TTL = float(os.environ.get('IDENTITY_CACHE_TTL', 60))
+
+
+class CachedUser(UserMixin):
+    """Lightweight stand-in for `User` carrying only what requests need."""
+
+    def __init__(self, id, username, role, created_at):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.created_at = created_at
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def __repr__(self):
+        return f"<CachedUser {self.username}>"
+
+
+class IdentityCache:
+    """Thread-safe LRU cache of CachedUser entries with a time-to-live."""
+
+    def __init__(self, maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, get_session):
+        """Return the cached identity, loading it on a miss.
+
+        `get_session` is only called on a miss, so cache hits never touch the
+        database. Returns None if the user does not exist.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        identity = self.load(user_id, get_session())
+        if identity is not None:
+            self.put(identity)
+        return identity
+
+    @staticmethod
+    def load(user_id, session):
+        """Read an identity straight from the database, bypassing the cache."""
+        row = (session.query(User.id, User.username, User.role, User.created_at)
+               .filter(User.id == user_id)
+               .first())
+        return CachedUser(*row) if row else None
+
+    def put(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (self._clock() + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,208 @@
+"""Bulk CSV import of historical screenings.
+
+Accepts the layout written by the screenings export (`exports.DATASETS`)
+plus a ``Username`` column naming the owner::
+
+    Username,Date,Score,Level,Stress,Anxiety,Sleep,Depression,Social,Notes
+
+The input is read as a stream and handled in chunks: each chunk resolves its
+usernames with one query, validates its rows, inserts the valid ones with a
+single executemany and commits. Invalid rows are reported by line number and
+skipped; they never abort the file. Once the file is done, the affected
+users' summaries are rebuilt and a rollup refresh is queued for the
+population trends.
+"""
+
+import csv
+from datetime import datetime
+
+from sqlalchemy import select, insert, func
+
+from models import User, Screening
+from stats import rebuild_user_stats
+import rollups
+import trends
+
+CHUNK_SIZE = 5000
+# Errors kept in the report; the count is always exact
+MAX_REPORTED_ERRORS = 1000
+# Stands in for a password hash on users created by an import, so they can't
+# log in until an admin or the user sets a real password.
+UNUSABLE_PASSWORD = '!'
+
+LEVELS = {'Low', 'Moderate', 'High'}
+DATE_FORMATS = ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+DIMENSION_COLUMNS = [
+    ('Stress', 'stress_score'), ('Anxiety', 'anxiety_score'), ('Sleep', 'sleep_score'),
+    ('Depression', 'depression_score'), ('Social', 'social_score'),
+]
+REQUIRED_COLUMNS = ['Username', 'Date', 'Score', 'Level']
+NOTES_MAX_LENGTH = 500
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (e.g. missing columns)."""
+
+
+class ImportReport:
+    """Outcome of one import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.users_created = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message)
+        self.user_ids = set()  # owners of imported rows
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    return datetime.fromisoformat(value)
+
+
+def _parse_int(value, name, minimum=0):
+    value = (value or '').strip()
+    if value == '':
+        return None
+    number = int(value)
+    if number < minimum:
+        raise ValueError(f'{name} must be >= {minimum}')
+    return number
+
+
+def _validate(record):
+    """Return the Screening column values for one CSV record, or raise ValueError."""
+    username = (record.get('Username') or '').strip()
+    if not username:
+        raise ValueError('Username is required')
+    try:
+        created_at = _parse_date((record.get('Date') or '').strip())
+    except ValueError:
+        raise ValueError(f'invalid Date {record.get("Date")!r}')
+    try:
+        score = _parse_int(record.get('Score'), 'Score')
+    except ValueError as e:
+        raise ValueError(f'invalid Score: {e}')
+    if score is None:
+        raise ValueError('Score is required')
+    level = (record.get('Level') or '').strip()
+    if level not in LEVELS:
+        raise ValueError(f'Level must be one of {", ".join(sorted(LEVELS))}')
+
+    row = {'created_at': created_at, 'score': score, 'level': level}
+    for header, column in DIMENSION_COLUMNS:
+        try:
+            row[column] = _parse_int(record.get(header), header)
+        except ValueError as e:
+            raise ValueError(f'invalid {header}: {e}')
+    # Paper screenings: the questionnaire is inferred from the sub-scales, and
+    # no version is recorded because the level was not computed by us.
+    # `flask rescore-screenings` treats such rows as outdated.
+    row['questionnaire'] = 'extended' if all(row[c] is not None for _, c in DIMENSION_COLUMNS) else 'quick'
+    row['questionnaire_version'] = None
+    notes = record.get('Notes') or None
+    if notes and len(notes) > NOTES_MAX_LENGTH:
+        raise ValueError(f'Notes longer than {NOTES_MAX_LENGTH} characters')
+    row['notes'] = notes
+    return username, row
+
+
+def _resolve_users(session, usernames, known, create_users, report):
+    """Fill `known` (lower-cased username -> id) for a chunk's usernames."""
+    missing = {}
+    for name in usernames:
+        # New accounts take the spelling first seen in the file
+        if name.lower() not in known:
+            missing.setdefault(name.lower(), name)
+    if not missing:
+        return
+    for user_id, username in session.execute(
+        select(User.id, User.username).where(func.lower(User.username).in_(list(missing)))
+    ):
+        known.setdefault(username.lower(), user_id)
+    new = [name for key, name in missing.items() if key not in known]
+    if new and create_users:
+        created = session.execute(
+            insert(User).returning(User.id, User.username),
+            [{'username': name, 'password': UNUSABLE_PASSWORD} for name in new],
+        ).all()
+        for user_id, username in created:
+            known[username.lower()] = user_id
+        report.users_created += len(created)
+
+
+def _flush_chunk(session, chunk, known, create_users, report):
+    """Validate and insert one chunk of (line number, record) pairs, then commit."""
+    parsed = []
+    for line, record in chunk:
+        try:
+            parsed.append((line,) + _validate(record))
+        except ValueError as e:
+            report.add_error(line, str(e))
+
+    # Take the write lock before the lookup so the chunk never has to
+    # upgrade a read transaction (see database.get_db).
+    if not session.in_transaction():
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+    _resolve_users(session, [username for _, username, _ in parsed], known, create_users, report)
+
+    rows = []
+    for line, username, row in parsed:
+        user_id = known.get(username.lower())
+        if user_id is None:
+            report.add_error(line, f'unknown user {username!r}')
+            continue
+        row['user_id'] = user_id
+        rows.append(row)
+    if rows:
+        session.execute(insert(Screening), rows)
+    session.commit()
+    report.imported += len(rows)
+    report.user_ids.update(row['user_id'] for row in rows)
+
+
+def import_screenings(session, stream, create_users=False, chunk_size=None):
+    """Import screenings from a text stream of CSV. Returns an ImportReport.
+
+    Commits after every chunk, so a large file never holds one long
+    transaction; the summaries and trends of the users who received rows are
+    rebuilt once at the end.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    reader = csv.DictReader(stream)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportFileError(f'missing column(s): {", ".join(missing)}')
+
+    report = ImportReport()
+    known = {}
+    chunk = []
+    for record in reader:
+        report.rows += 1
+        # Line numbers count the header as line 1 and follow embedded newlines
+        chunk.append((reader.line_num, record))
+        if len(chunk) >= chunk_size:
+            _flush_chunk(session, chunk, known, create_users, report)
+            chunk = []
+    if chunk:
+        _flush_chunk(session, chunk, known, create_users, report)
+
+    if report.imported:
+        if not session.in_transaction():
+            session.connection(execution_options={'sqlite_begin_immediate': True})
+        rebuild_user_stats(session, report.user_ids)
+        trends.rebuild(session, report.user_ids)
+        rollups.schedule_refresh(session)
+        session.commit()
+    report.errors.sort()
+    return report
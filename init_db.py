@@ -1,29 +1,44 @@
 #!/usr/bin/env python
-"""Initialize the database with the correct schema."""
+"""Initialize or upgrade the database schema.
+
+By default existing data is kept: the schema is brought up to date with the
+Alembic migrations in ``migrations/``. Pass ``--reset`` to drop every table and
+start from an empty database.
+"""
 
 from models import Base, engine, SessionLocal, User
 from datetime import datetime
 import os
+import sys
+
+from flask_migrate import upgrade
 
-# Drop all tables if they exist
-Base.metadata.drop_all(bind=engine)
+from app import app
 
-# Create all tables fresh
-Base.metadata.create_all(bind=engine)
+if '--reset' in sys.argv:
+    # Drop all tables if they exist
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql('DROP TABLE IF EXISTS alembic_version')
+    print("✓ Dropped existing tables")
+
+# Create missing tables / indexes and record the schema revision
+with app.app_context():
+    upgrade()
 
 # Create a test admin user
 session = SessionLocal()
 try:
-    admin = User(
-        username='admin',
-        email='admin@example.com',
-        role='admin'
-    )
-    admin.set_password('admin123')
-    session.add(admin)
-    session.commit()
-    print("✓ Admin user created (admin/admin123)")
+    if not session.query(User).filter_by(username='admin').first():
+        admin = User(
+            username='admin',
+            email='admin@example.com',
+            role='admin'
+        )
+        admin.set_password('admin123')
+        session.add(admin)
+        session.commit()
+        print("✓ Admin user created (admin/admin123)")
     print("✓ Database initialized successfully!")
 finally:
     session.close()
-
@@ -0,0 +1,278 @@
+"""Durable background jobs.
+
+Requests call `enqueue()` inside their own transaction, so a job exists only
+if the work that caused it was committed. Jobs live in the `jobs` table and
+are run by a small thread pool in each app process (`Worker`), started by
+gunicorn after it forks a worker (or on the first request with
+JOB_WORKER_AUTOSTART), or by `flask drain-jobs`.
+
+The worker opens its sessions from the app it was started for (its
+DATABASE_URL, see database.py), so jobs run against the database they were
+queued in. A job runs in its own session and its effects are committed together with its
+"done" mark, so a crash mid-job leaves it to be retried rather than half
+applied. Failures are retried with exponential backoff up to `max_attempts`.
+A job whose worker died is claimed again once its lease expires. Handlers
+must therefore tolerate running more than once.
+
+Handlers are registered by name::
+
+    @jobs.handler('refresh_rollups')
+    def refresh(session):
+        ...
+
+and receive the session plus the job's JSON payload as keyword arguments.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, or_, and_, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+import database
+import models
+from models import Job
+
+log = logging.getLogger(__name__)
+
+JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', '2'))  # 0 disables the in-process worker
+# Start the worker on the first request. Off by default so that importing the
+# app (tests, CLI, scripts) never runs jobs; gunicorn starts it in each worker
+# process instead (see gunicorn.conf.py).
+JOB_WORKER_AUTOSTART = os.environ.get('JOB_WORKER_AUTOSTART', '0').lower() in ('1', 'true', 'yes')
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '5'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_BACKOFF_BASE = float(os.environ.get('JOB_BACKOFF_BASE', '5'))  # seconds before the first retry
+JOB_BACKOFF_MAX = float(os.environ.get('JOB_BACKOFF_MAX', '3600'))
+# A running job not finished within this many seconds is assumed lost
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '600'))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', '7'))
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register the decorated function as the handler for `kind` jobs."""
+    def register(func):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue(session, kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Queue a job in the caller's transaction. Returns the Job, or None if
+    a job with the same idempotency `key` already exists."""
+    if kind not in _handlers:
+        raise ValueError(f'no handler registered for job kind {kind!r}')
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        idempotency_key=key,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    if key is None:
+        session.add(job)
+        session.flush()
+    else:
+        try:
+            with session.begin_nested():
+                session.add(job)
+        except IntegrityError:
+            return None
+    session.info['jobs_enqueued'] = True
+    return job
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after the `attempts`-th failure."""
+    delay = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX)
+    # Jitter, so jobs that failed together don't retry in lockstep
+    return delay * random.uniform(1, 1.1)
+
+
+def claim(session, now=None):
+    """Mark the oldest due job as running and return (id, kind, payload), or None."""
+    now = now or datetime.utcnow()
+    due = or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS)),
+    )
+    while True:
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+        row = session.execute(
+            select(Job.id, Job.kind, Job.payload).where(due).order_by(Job.run_at, Job.id).limit(1)
+        ).first()
+        if row is None:
+            session.commit()
+            return None
+        # Still due in the UPDATE itself: on databases with concurrent writers
+        # another process may have claimed it since the SELECT
+        claimed = session.execute(
+            update(Job).where(Job.id == row.id, due)
+            .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+        if claimed:
+            return row.id, row.kind, json.loads(row.payload)
+
+
+def run(job_id, kind, payload, session_factory=None):
+    """Run one claimed job to completion or to its next retry. Returns True on success."""
+    session = (session_factory or models.SessionLocal)()
+    try:
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+        _handlers[kind](session, **payload)
+        session.execute(
+            update(Job).where(Job.id == job_id)
+            .values(status='done', finished_at=datetime.utcnow(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return True
+    except Exception as e:
+        session.rollback()
+        log.exception('Job %s (%s) failed', job_id, kind)
+        _record_failure(session, job_id, f'{type(e).__name__}: {e}')
+        return False
+    finally:
+        session.close()
+
+
+def _record_failure(session, job_id, error):
+    session.connection(execution_options={'sqlite_begin_immediate': True})
+    job = session.get(Job, job_id)
+    job.last_error = error[:2000]
+    if job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = 'queued'
+        job.run_at = datetime.utcnow() + timedelta(seconds=backoff(job.attempts))
+    session.commit()
+
+
+def drain(session, limit=None):
+    """Run due jobs in this thread until none are left. Returns (succeeded, failed).
+
+    Each job runs in a session of its own on `session`'s database.
+    """
+    session_factory = sessionmaker(bind=session.get_bind(), autoflush=False, autocommit=False)
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        claimed = claim(session)
+        if claimed is None:
+            break
+        if run(*claimed, session_factory):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+def retry_failed(session):
+    """Queue every failed job again with a fresh set of attempts. The caller commits."""
+    return session.execute(
+        update(Job).where(Job.status == 'failed')
+        .values(status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def prune(session, days=JOB_RETENTION_DAYS):
+    """Delete finished jobs older than `days`. The caller commits."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return session.execute(
+        delete(Job).where(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff)
+    ).rowcount
+
+
+class Worker:
+    """Dispatcher thread feeding claimed jobs to a thread pool."""
+
+    def __init__(self, threads=JOB_WORKER_THREADS, poll_interval=JOB_POLL_INTERVAL):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app=None):
+        """Start the dispatcher, running jobs on `app`'s database (default: models.SessionLocal)."""
+        with self._lock:
+            if self.running or self.threads < 1:
+                return
+            self._app = app
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='job-dispatcher', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        slots = threading.Semaphore(self.threads)
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='job') as pool:
+            while not self._stop.is_set():
+                slots.acquire()
+                claimed = self._claim()
+                if claimed is None:
+                    slots.release()
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+                    continue
+                pool.submit(run, *claimed, self._session_factory()).add_done_callback(lambda _: slots.release())
+
+    def _session_factory(self):
+        # Looked up per use, like database.sessionmaker_for, so tests can swap models.SessionLocal
+        return database.sessionmaker_for(self._app) if self._app is not None else models.SessionLocal
+
+    def _claim(self):
+        session = self._session_factory()()
+        try:
+            return claim(session)
+        except Exception:
+            session.rollback()
+            log.exception('Claiming a job failed')
+            return None
+        finally:
+            session.close()
+
+
+worker = Worker()
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker(session):
+    # Jobs become visible to the worker once the enqueuing transaction commits
+    if session.info.pop('jobs_enqueued', False):
+        worker.wake()
+
+
+def init_app(app):
+    """Start this process's worker on its first request if JOB_WORKER_AUTOSTART is set."""
+    app.config.setdefault('JOB_WORKER_AUTOSTART', JOB_WORKER_AUTOSTART)
+
+    @app.before_request
+    def _start_worker():
+        if app.config['JOB_WORKER_AUTOSTART'] and not app.testing and not worker.running:
+            worker.start(app)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""Load test the main user flows and report per-route latency percentiles.
+
+Simulates N concurrent users, each registering, logging in and then looping
+over a weighted mix of screenings, history, analytics, dashboard, API and
+export calls. Runs in-process through Flask's test client against a fresh
+temporary SQLite database (the default), or against a running server such as
+a local gunicorn with --target.
+
+    python loadtest.py --users 20 --duration 30 --json before.json
+    python loadtest.py --users 20 --duration 30 --json after.json --compare before.json
+    gunicorn -w 4 app:app & python loadtest.py --target http://127.0.0.1:8000
+
+In-process numbers include the test client but not a WSGI server, and share
+one GIL between the simulated users; compare them with each other, not with
+--target runs.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# (weight, flow name); see Flows
+DEFAULT_MIX = [
+    (25, 'screening'),
+    (8, 'extended_screening'),
+    (20, 'history'),
+    (15, 'analytics'),
+    (15, 'dashboard'),
+    (10, 'api_screenings'),
+    (5, 'chart_data'),
+    (2, 'export'),
+]
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+class InProcessClient:
+    """Flask test client with the small response interface the flows need."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self._client.open(path, method=method, data=data)
+        body = response.get_data()  # consume streamed bodies, as a browser would
+        return response.status_code, body
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests  # only needed with --target
+        self._session = requests.Session()
+        self._base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None):
+        response = self._session.request(method, self._base_url + path, data=data, allow_redirects=False)
+        return response.status_code, response.content
+
+
+class Recorder:
+    """Thread-safe latency samples per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, route, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class Flows:
+    """One simulated user: a client, its credentials and the recorder."""
+
+    def __init__(self, client, recorder, username, rng):
+        self.client = client
+        self.recorder = recorder
+        self.username = username
+        self.rng = rng
+
+    def call(self, route, method, path, data=None, expect=(200,)):
+        start = time.perf_counter()
+        try:
+            status, body = self.client.request(method, path, data)
+        except Exception:
+            status, body = None, b''
+        self.recorder.add(route, time.perf_counter() - start, status in expect)
+        return status, body
+
+    def form(self, route, path, data, expect=(200, 302)):
+        """GET a form page for its CSRF token, then POST it."""
+        _, body = self.call(f'GET {route}', 'GET', path)
+        match = CSRF_PATTERN.search(body.decode('utf-8', 'replace'))
+        if match:
+            data = dict(data, csrf_token=match.group(1))
+        return self.call(f'POST {route}', 'POST', path, data, expect)
+
+    def sign_up(self):
+        password = 'load-test-pw'
+        self.form('/register', '/register',
+                  {'username': self.username, 'password': password, 'confirm_password': password})
+        self.form('/login', '/login', {'username': self.username, 'password': password})
+
+    def screening(self):
+        answers = {f'q{i}': self.rng.choice('012') for i in range(1, 11)}
+        self.form('/screening', '/screening', answers)
+
+    def extended_screening(self):
+        answers = {f'{area}_q{n}': self.rng.choice('012')
+                   for area in ('stress', 'anxiety', 'sleep', 'depression', 'social') for n in (1, 2)}
+        answers['notes'] = ''
+        self.form('/extended-screening', '/extended-screening', answers)
+
+    def history(self):
+        self.call('GET /history', 'GET', '/history')
+
+    def analytics(self):
+        self.call('GET /analytics', 'GET', '/analytics')
+
+    def dashboard(self):
+        self.call('GET /dashboard', 'GET', '/dashboard')
+
+    def api_screenings(self):
+        self.call('GET /api/screenings', 'GET', '/api/screenings?limit=50')
+
+    def chart_data(self):
+        self.call('GET /history/chart-data', 'GET', '/history/chart-data')
+
+    def export(self):
+        self.call('GET /export-data', 'GET', '/export-data', expect=(200, 302))
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route, values in sorted(recorder.samples.items()):
+        values = sorted(values)
+        routes[route] = {
+            'requests': len(values),
+            'errors': recorder.errors.get(route, 0),
+            'rps': round(len(values) / elapsed, 2),
+            **{f'p{p}_ms': round(1000 * percentile(values, p), 2) for p in (50, 95, 99)},
+            'mean_ms': round(1000 * sum(values) / len(values), 2),
+            'max_ms': round(1000 * values[-1], 2),
+        }
+    everything = sorted(v for values in recorder.samples.values() for v in values)
+    total = {
+        'requests': len(everything),
+        'errors': sum(recorder.errors.values()),
+        'rps': round(len(everything) / elapsed, 2),
+        **{f'p{p}_ms': round(1000 * (percentile(everything, p) or 0), 2) for p in (50, 95, 99)},
+    }
+    return routes, total
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _in_process_app():
+    """An app of its own on a fresh temporary database, seeded per user on demand."""
+    directory = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.setdefault('EXPORT_DIR', os.path.join(directory, 'exports'))
+    from app import create_app
+    import database
+    import models
+    app = create_app({'DATABASE_URL': f'sqlite:///{os.path.join(directory, "loadtest.db")}'})
+    models.Base.metadata.create_all(database.engine_for(app))
+    return app, directory
+
+
+def _seed_history(app, username, count, rng):
+    """Give a freshly registered user `count` past screenings (in-process only)."""
+    from datetime import timedelta
+    import database
+    import models
+    import trends
+    from stats import rebuild_user_stats
+    from scoring import quick_level
+    session = database.sessionmaker_for(app)()
+    try:
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+        user_id = session.query(models.User.id).filter_by(username=username).scalar()
+        start = datetime.utcnow() - timedelta(days=count)
+        rows = []
+        for day in range(count):
+            score = rng.randint(0, 20)
+            rows.append({'user_id': user_id, 'score': score, 'level': quick_level(score),
+                         'questionnaire': 'quick', 'questionnaire_version': 1,
+                         'created_at': start + timedelta(days=day)})
+        session.execute(models.Screening.__table__.insert(), rows)
+        rebuild_user_stats(session, user_id)
+        trends.rebuild(session, user_id)
+        session.commit()
+    finally:
+        session.close()
+
+
+def run(args):
+    mix = DEFAULT_MIX
+    weights = [w for w, _ in mix]
+    names = [name for _, name in mix]
+    recorder = Recorder()
+    run_id = f'{int(time.time())}{random.randrange(1000):03d}'
+
+    app = None
+    if args.target:
+        make_client = lambda: HttpClient(args.target)
+    else:
+        app, _ = _in_process_app()
+        make_client = lambda: InProcessClient(app)
+
+    stop = threading.Event()
+    setup_errors = []
+
+    def user(index):
+        rng = random.Random(args.seed * 1000 + index)
+        flows = Flows(make_client(), recorder, f'load{run_id}u{index}', rng)
+        try:
+            flows.sign_up()
+            if args.history and not args.target:
+                _seed_history(app, flows.username, args.history, rng)
+        except Exception as e:
+            setup_errors.append(repr(e))
+            return
+        while not stop.is_set():
+            getattr(flows, rng.choices(names, weights)[0])()
+            if args.think:
+                time.sleep(rng.uniform(0, 2 * args.think))
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+    start = time.perf_counter()
+    for i, thread in enumerate(threads):
+        thread.start()
+        if args.ramp_up:
+            time.sleep(args.ramp_up / args.users)
+    time.sleep(max(0.0, args.duration - (time.perf_counter() - start)))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    routes, total = summarize(recorder, elapsed)
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'mode': 'http' if args.target else 'in-process',
+            'target': args.target,
+            'users': args.users,
+            'duration_s': round(elapsed, 2),
+            'think_s': args.think,
+            'history_per_user': args.history,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'setup_errors': setup_errors[:10],
+        },
+        'total': total,
+        'routes': routes,
+    }
+
+
+def print_report(result, baseline=None):
+    meta = result['meta']
+    print(f'{meta["mode"]} run: {meta["users"]} users for {meta["duration_s"]}s'
+          f' (commit {meta["commit"] or "?"})')
+    header = f'{"route":<28}{"reqs":>7}{"err":>5}{"rps":>8}{"p50":>9}{"p95":>9}{"p99":>9}'
+    if baseline:
+        header += f'{"p95 vs base":>13}'
+    print(header)
+    rows = list(result['routes'].items()) + [('TOTAL', result['total'])]
+    for route, r in rows:
+        line = (f'{route:<28}{r["requests"]:>7}{r["errors"]:>5}{r["rps"]:>8}'
+                f'{r["p50_ms"]:>9}{r["p95_ms"]:>9}{r["p99_ms"]:>9}')
+        if baseline:
+            base = baseline['total'] if route == 'TOTAL' else baseline['routes'].get(route)
+            if base and base['p95_ms']:
+                line += f'{100 * (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"]:>+12.1f}%'
+        print(line)
+    if meta['setup_errors']:
+        print(f'{len(meta["setup_errors"])} user(s) failed to sign up, e.g. {meta["setup_errors"][0]}',
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=10, help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to run')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='seconds over which users start')
+    parser.add_argument('--think', type=float, default=0.0, help='mean pause between a user\'s actions (s)')
+    parser.add_argument('--history', type=int, default=100,
+                        help='past screenings seeded per user (in-process only)')
+    parser.add_argument('--target', help='base URL of a running server instead of in-process')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the action mix')
+    parser.add_argument('--json', metavar='PATH', help='write the report as JSON ("-" for stdout)')
+    parser.add_argument('--compare', metavar='PATH', help='earlier --json report to compare p95 against')
+    args = parser.parse_args()
+
+    result = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.json == '-':
+        print(json.dumps(result, indent=2))
+        return
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    print_report(result, baseline)
+
+
+if __name__ == '__main__':
+    main()
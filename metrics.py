@@ -0,0 +1,122 @@
+"""Prometheus metrics: per-endpoint requests, latency and SQL work.
+
+Every request is counted by endpoint, method and status, and timed into a
+latency histogram. SQLAlchemy cursor events on the app engine count the SQL
+statements a request runs and the time spent in them; both go into
+per-endpoint histograms, whose ``_sum`` and ``_count`` give totals.
+Transaction control (the explicit BEGIN on SQLite, savepoints) is timed but
+not counted, so counts (and the query budgets built on them) are the same on
+every backend.
+
+Under gunicorn each worker is a separate process with its own counters. When
+PROMETHEUS_MULTIPROC_DIR is set (gunicorn.conf.py sets it and clears it on
+start), every worker writes its samples to files in that directory and
+`/metrics` sums them, so a scrape sees the whole server whichever worker
+answers it. Without it (the dev server, tests) metrics are per process.
+
+`/metrics` is served to admins, or to a scraper presenting
+``Authorization: Bearer $METRICS_TOKEN``.
+"""
+
+import hmac
+import os
+import time
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status.',
+    ['endpoint', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response (excludes streamed bodies).',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS,
+)
+SQL_STATEMENTS = Histogram(
+    'db_statements_per_request', 'SQL statements executed per request.',
+    ['endpoint'], buckets=STATEMENT_BUCKETS,
+)
+SQL_TIME = Histogram(
+    'db_time_per_request_seconds', 'Time spent in SQL statements per request.',
+    ['endpoint'], buckets=LATENCY_BUCKETS,
+)
+
+
+# Statement prefixes that only delimit transactions
+TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+def _endpoint():
+    # The route's endpoint name, never the raw path, to keep label sets bounded
+    return request.endpoint or 'unmatched'
+
+
+def instrument_engine(engine):
+    """Count statements run on `engine` (and their time) towards the current request."""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        # Popped so an engine instrumented twice (e.g. also via the Engine
+        # class) counts each statement once
+        started = conn.info.pop('metrics_started', None)
+        # Job worker threads have no request to charge the statement to
+        if started is not None and has_request_context() and 'sql_count' in g:
+            if not statement.lstrip().upper().startswith(TRANSACTION_CONTROL):
+                g.sql_count += 1
+            g.sql_time += time.perf_counter() - started
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+
+
+def _record(response):
+    started = g.pop('request_started', None)
+    if started is None or request.endpoint == 'main.metrics':
+        return response
+    endpoint = _endpoint()
+    LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    SQL_STATEMENTS.labels(endpoint).observe(g.sql_count)
+    SQL_TIME.labels(endpoint).observe(g.sql_time)
+    return response
+
+
+def is_authorized(user):
+    """A scraper with the metrics token, or a signed-in admin."""
+    if METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer ') and hmac.compare_digest(header[7:], METRICS_TOKEN):
+            return True
+    return user.is_authenticated and user.is_admin()
+
+
+def exposition():
+    """(body, content type) of the current metrics in Prometheus text format."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app, engine):
+    instrument_engine(engine)
+    app.before_request(_start_timer)
+    app.after_request(_record)
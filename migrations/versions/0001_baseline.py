@@ -0,0 +1,90 @@
+"""baseline schema
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_tables()/init_db.py already have these
+    # tables; only create what is missing so they can be upgraded in place.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=120), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=True),
+            sa.Column('password', sa.String(length=255), nullable=False),
+            sa.Column('role', sa.String(length=50), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('bio', sa.Text(), nullable=True),
+            sa.Column('preferences', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+            sa.UniqueConstraint('email'),
+        )
+
+    if 'screenings' not in existing:
+        op.create_table(
+            'screenings',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('score', sa.Integer(), nullable=False),
+            sa.Column('level', sa.String(length=50), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('stress_score', sa.Integer(), nullable=True),
+            sa.Column('anxiety_score', sa.Integer(), nullable=True),
+            sa.Column('sleep_score', sa.Integer(), nullable=True),
+            sa.Column('depression_score', sa.Integer(), nullable=True),
+            sa.Column('social_score', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'coping_logs' not in existing:
+        op.create_table(
+            'coping_logs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('strategy', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('effectiveness', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'recommendations' not in existing:
+        op.create_table(
+            'recommendations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('screening_id', sa.Integer(), nullable=False),
+            sa.Column('category', sa.String(length=100), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=False),
+            sa.Column('url', sa.String(length=500), nullable=True),
+            sa.ForeignKeyConstraint(['screening_id'], ['screenings.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('recommendations')
+    op.drop_table('coping_logs')
+    op.drop_table('screenings')
+    op.drop_table('users')
@@ -0,0 +1,52 @@
+"""per-user screening summary table
+
+Revision ID: 0003_user_stats
+Revises: 0002_hot_query_indexes
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_user_stats'
+down_revision = '0002_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'user_stats' not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            'user_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('screening_count', sa.Integer(), nullable=False),
+            sa.Column('score_sum', sa.Integer(), nullable=False),
+            sa.Column('score_min', sa.Integer(), nullable=True),
+            sa.Column('score_max', sa.Integer(), nullable=True),
+            sa.Column('last_score', sa.Integer(), nullable=True),
+            sa.Column('last_level', sa.String(length=50), nullable=True),
+            sa.Column('last_screening_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id'),
+        )
+
+    # Backfill from existing screenings (same query as `flask rebuild-stats`)
+    if bind.execute(sa.text('SELECT COUNT(*) FROM user_stats')).scalar() == 0:
+        op.execute("""
+            INSERT INTO user_stats (user_id, screening_count, score_sum, score_min, score_max,
+                                    last_score, last_level, last_screening_at)
+            SELECT t.user_id, t.n, t.total, t.lo, t.hi, r.score, r.level, r.created_at
+            FROM (SELECT user_id, COUNT(id) AS n, SUM(score) AS total, MIN(score) AS lo, MAX(score) AS hi
+                  FROM screenings GROUP BY user_id) t
+            JOIN (SELECT user_id, score, level, created_at,
+                         ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at DESC, id DESC) AS rn
+                  FROM screenings) r
+              ON r.user_id = t.user_id AND r.rn = 1
+        """)
+
+
+def downgrade():
+    op.drop_table('user_stats')
@@ -0,0 +1,107 @@
+"""normalize recommendations into a template catalog
+
+Revision ID: 0004_recommendation_catalog
+Revises: 0003_user_stats
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_recommendation_catalog'
+down_revision = '0003_user_stats'
+branch_labels = None
+depends_on = None
+
+# Snapshot of recommendations.DEFAULT_TEMPLATES at the time of this revision
+DEFAULT_TEMPLATES = [
+    ('High', 'professional', 'Consider Professional Help', 'Your assessment suggests you may benefit from speaking with a mental health professional.'),
+    ('High', 'coping', 'Grounding Technique', 'Try the 5-4-3-2-1 technique: Notice 5 things you see, 4 you touch, 3 you hear, 2 you smell, 1 you taste.'),
+    ('High', 'resource', 'Mental Health Hotline', 'Call 988 (Suicide & Crisis Lifeline) for immediate support anytime.'),
+    ('Moderate', 'coping', 'Deep Breathing Exercise', 'Try Box Breathing: Breathe in for 4 counts, hold for 4, out for 4, hold for 4.'),
+    ('Moderate', 'coping', 'Physical Activity', 'Regular exercise can improve mental health. Aim for 30 minutes daily.'),
+    ('Moderate', 'resource', 'Meditation Apps', 'Try apps like Headspace or Calm for guided meditation and mindfulness.'),
+    ('Low', 'coping', 'Maintain Healthy Habits', 'Keep up with exercise, sleep, and social connections.'),
+    ('Low', 'resource', 'Wellness Tips', 'Continue with self-care practices and stress management techniques.'),
+]
+
+# Legacy rows match a template on these columns (url may be NULL on both sides)
+MATCH = """
+    t.level = s.level AND t.category = r.category AND t.title = r.title
+    AND t.description = r.description
+    AND (t.url = r.url OR (t.url IS NULL AND r.url IS NULL))
+"""
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'recommendation_templates' not in tables:
+        op.create_table(
+            'recommendation_templates',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('level', sa.String(length=50), nullable=False),
+            sa.Column('category', sa.String(length=100), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=False),
+            sa.Column('url', sa.String(length=500), nullable=True),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('active', sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if 'screening_recommendations' not in tables:
+        op.create_table(
+            'screening_recommendations',
+            sa.Column('screening_id', sa.Integer(), nullable=False),
+            sa.Column('template_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['screening_id'], ['screenings.id']),
+            sa.ForeignKeyConstraint(['template_id'], ['recommendation_templates.id']),
+            sa.PrimaryKeyConstraint('screening_id', 'template_id'),
+        )
+
+    templates = sa.table(
+        'recommendation_templates',
+        sa.column('level', sa.String), sa.column('category', sa.String), sa.column('title', sa.String),
+        sa.column('description', sa.Text), sa.column('position', sa.Integer), sa.column('active', sa.Boolean),
+    )
+    if bind.execute(sa.text('SELECT COUNT(*) FROM recommendation_templates')).scalar() == 0:
+        positions = {}
+        rows = []
+        for level, category, title, description in DEFAULT_TEMPLATES:
+            position = positions[level] = positions.get(level, -1) + 1
+            rows.append({'level': level, 'category': category, 'title': title,
+                         'description': description, 'position': position, 'active': True})
+        op.bulk_insert(templates, rows)
+
+    # Any other distinct legacy text becomes an inactive template, so history
+    # still resolves but new screenings don't receive it.
+    op.execute(f"""
+        INSERT INTO recommendation_templates (level, category, title, description, url, position, active)
+        SELECT DISTINCT s.level, r.category, r.title, r.description, r.url, 0, {sa.false().compile(bind)}
+        FROM recommendations r JOIN screenings s ON s.id = r.screening_id
+        WHERE NOT EXISTS (SELECT 1 FROM recommendation_templates t WHERE {MATCH})
+    """)
+    op.execute(f"""
+        INSERT INTO screening_recommendations (screening_id, template_id)
+        SELECT DISTINCT r.screening_id, t.id
+        FROM recommendations r
+        JOIN screenings s ON s.id = r.screening_id
+        JOIN recommendation_templates t ON {MATCH}
+        WHERE NOT EXISTS (SELECT 1 FROM screening_recommendations sr
+                          WHERE sr.screening_id = r.screening_id AND sr.template_id = t.id)
+    """)
+    op.execute('DELETE FROM recommendations')
+
+
+def downgrade():
+    op.execute("""
+        INSERT INTO recommendations (screening_id, category, title, description, url)
+        SELECT sr.screening_id, t.category, t.title, t.description, t.url
+        FROM screening_recommendations sr JOIN recommendation_templates t ON t.id = sr.template_id
+        ORDER BY sr.screening_id, t.position
+    """)
+    op.drop_table('screening_recommendations')
+    op.drop_table('recommendation_templates')
@@ -0,0 +1,33 @@
+"""expression indexes for admin user search
+
+Revision ID: 0005_user_search_indexes
+Revises: 0004_recommendation_catalog
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_user_search_indexes'
+down_revision = '0004_recommendation_catalog'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_users_username_lower', 'users', 'lower(username)'),
+    ('ix_users_email_lower', 'users', 'lower(email)'),
+]
+
+
+# SQLite's reflection leaves out expression indexes, so the inspector can't
+# tell whether create_all already built these; let the database check instead.
+def upgrade():
+    for name, table, expression in INDEXES:
+        op.create_index(name, table, [sa.text(expression)], if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,37 @@
+"""client UUIDs for offline sync dedupe
+
+Revision ID: 0006_sync_client_uuid
+Revises: 0005_user_search_indexes
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_sync_client_uuid'
+down_revision = '0005_user_search_indexes'
+branch_labels = None
+depends_on = None
+
+TABLES = [
+    ('screenings', 'ux_screenings_user_id_client_uuid'),
+    ('coping_logs', 'ux_coping_logs_user_id_client_uuid'),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, index in TABLES:
+        if 'client_uuid' not in {c['name'] for c in inspector.get_columns(table)}:
+            op.add_column(table, sa.Column('client_uuid', sa.String(length=36), nullable=True))
+        if index not in {ix['name'] for ix in inspector.get_indexes(table)}:
+            op.create_index(index, table, ['user_id', 'client_uuid'], unique=True)
+
+
+def downgrade():
+    for table, index in TABLES:
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('client_uuid')
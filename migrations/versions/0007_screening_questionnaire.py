@@ -0,0 +1,45 @@
+"""record the questionnaire and version each screening was scored with
+
+Revision ID: 0007_screening_questionnaire
+Revises: 0006_sync_client_uuid
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_screening_questionnaire'
+down_revision = '0006_sync_client_uuid'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_screenings_questionnaire_id'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('screenings')}
+    if 'questionnaire' not in columns:
+        op.add_column('screenings', sa.Column('questionnaire', sa.String(length=50), nullable=True))
+    if 'questionnaire_version' not in columns:
+        op.add_column('screenings', sa.Column('questionnaire_version', sa.Integer(), nullable=True))
+    if INDEX not in {ix['name'] for ix in inspector.get_indexes('screenings')}:
+        op.create_index(INDEX, 'screenings', ['questionnaire', 'id'])
+
+    # Only extended assessments store sub-scale scores; everything so far was
+    # scored with version 1 of its questionnaire.
+    op.execute("""
+        UPDATE screenings
+        SET questionnaire = CASE WHEN stress_score IS NULL THEN 'quick' ELSE 'extended' END,
+            questionnaire_version = 1
+        WHERE questionnaire IS NULL
+    """)
+
+
+def downgrade():
+    op.drop_index(INDEX, table_name='screenings')
+    with op.batch_alter_table('screenings') as batch_op:
+        batch_op.drop_column('questionnaire_version')
+        batch_op.drop_column('questionnaire')
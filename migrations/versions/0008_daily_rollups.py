@@ -0,0 +1,45 @@
+"""daily population rollups and their high-water mark
+
+Revision ID: 0008_daily_rollups
+Revises: 0007_screening_questionnaire
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_daily_rollups'
+down_revision = '0007_screening_questionnaire'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ['screening_count', 'score_sum', 'extended_count',
+            'stress_sum', 'anxiety_sum', 'sleep_sum', 'depression_sum', 'social_sum']
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'daily_rollups' not in tables:
+        op.create_table(
+            'daily_rollups',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('level', sa.String(length=50), nullable=False),
+            *[sa.Column(name, sa.Integer(), nullable=False) for name in COUNTERS],
+            sa.PrimaryKeyConstraint('day', 'level'),
+        )
+    # Empty on purpose: the first `flask refresh-rollups` (or visit to
+    # /admin/trends) starts from id 0 and backfills everything.
+    if 'rollup_state' not in tables:
+        op.create_table(
+            'rollup_state',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('last_screening_id', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name'),
+        )
+
+
+def downgrade():
+    op.drop_table('rollup_state')
+    op.drop_table('daily_rollups')
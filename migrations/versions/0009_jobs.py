@@ -0,0 +1,46 @@
+"""background job queue
+
+Revision ID: 0009_jobs
+Revises: 0008_daily_rollups
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_jobs'
+down_revision = '0008_daily_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'jobs' not in inspector.get_table_names():
+        op.create_table(
+            'jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=100), nullable=False),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('idempotency_key', sa.String(length=255), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_at', sa.DateTime(), nullable=True),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    indexes = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('jobs')}
+    if 'ix_jobs_status_run_at' not in indexes:
+        op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'])
+    if 'ux_jobs_idempotency_key' not in indexes:
+        op.create_index('ux_jobs_idempotency_key', 'jobs', ['idempotency_key'], unique=True)
+
+
+def downgrade():
+    op.drop_table('jobs')
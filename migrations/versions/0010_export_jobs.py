@@ -0,0 +1,47 @@
+"""background export requests
+
+Revision ID: 0010_export_jobs
+Revises: 0009_jobs
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_export_jobs'
+down_revision = '0009_jobs'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_export_jobs_user_id_created_at'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'export_jobs' not in inspector.get_table_names():
+        op.create_table(
+            'export_jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('scope', sa.String(length=20), nullable=False),
+            sa.Column('dataset', sa.String(length=50), nullable=False),
+            sa.Column('format', sa.String(length=10), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('path', sa.String(length=500), nullable=True),
+            sa.Column('filename', sa.String(length=255), nullable=True),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+    if INDEX not in {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('export_jobs')}:
+        op.create_index(INDEX, 'export_jobs', ['user_id', 'created_at'])
+
+
+def downgrade():
+    op.drop_table('export_jobs')
@@ -0,0 +1,40 @@
+"""per-user running statistics for the score and each sub-score
+
+Revision ID: 0011_dimension_stats
+Revises: 0010_export_jobs
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_dimension_stats'
+down_revision = '0010_export_jobs'
+branch_labels = None
+depends_on = None
+
+SUMS = ['w', 'wx', 'wy', 'wxx', 'wxy']
+
+
+def upgrade():
+    # Empty on purpose: `flask rebuild-trends` seeds it from existing screenings
+    if 'dimension_stats' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            'dimension_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('dimension', sa.String(length=30), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.Column('mean', sa.Float(), nullable=False),
+            sa.Column('m2', sa.Float(), nullable=False),
+            sa.Column('ewma', sa.Float(), nullable=True),
+            *[sa.Column(name, sa.Float(), nullable=False) for name in SUMS],
+            sa.Column('last_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('user_id', 'dimension'),
+        )
+
+
+def downgrade():
+    op.drop_table('dimension_stats')
@@ -0,0 +1,26 @@
+"""per-user data revision, bumped when screenings are changed in place
+
+Revision ID: 0012_user_data_revision
+Revises: 0011_dimension_stats
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_user_data_revision'
+down_revision = '0011_dimension_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'data_revision' not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('users')}:
+        op.add_column('users', sa.Column('data_revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_revision')
@@ -0,0 +1,60 @@
+"""daily rollups high-water mark on screenings.recorded_at instead of the id
+
+Revision ID: 0013_rollup_recorded_at
+Revises: 0012_user_data_revision
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_rollup_recorded_at'
+down_revision = '0012_user_data_revision'
+branch_labels = None
+depends_on = None
+
+# Marks screenings that were already rolled up under the id-based mark
+EPOCH = datetime(1970, 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    screenings = sa.table('screenings', sa.column('id', sa.Integer), sa.column('recorded_at', sa.DateTime))
+    state = sa.table('rollup_state', sa.column('last_screening_id', sa.Integer),
+                     sa.column('last_recorded_at', sa.DateTime))
+
+    if 'recorded_at' not in {c['name'] for c in inspector.get_columns('screenings')}:
+        op.add_column('screenings', sa.Column('recorded_at', sa.DateTime(), nullable=True))
+        # Rows at or below the old mark are in the rollups; the rest are picked up next refresh
+        last_id = bind.execute(sa.select(sa.func.max(state.c.last_screening_id))).scalar() or 0
+        op.execute(screenings.update().where(screenings.c.id <= last_id).values(recorded_at=EPOCH))
+        op.execute(screenings.update().where(screenings.c.id > last_id).values(recorded_at=datetime.utcnow()))
+    if 'ix_screenings_recorded_at' not in {i['name'] for i in inspector.get_indexes('screenings')}:
+        op.create_index('ix_screenings_recorded_at', 'screenings', ['recorded_at'])
+    if 'last_recorded_at' not in {c['name'] for c in inspector.get_columns('rollup_state')}:
+        op.add_column('rollup_state', sa.Column('last_recorded_at', sa.DateTime(), nullable=True))
+        op.execute(state.update().where(state.c.last_screening_id > 0).values(last_recorded_at=EPOCH))
+
+
+def downgrade():
+    # Back to the id-based mark: the highest id among rows already rolled up
+    bind = op.get_bind()
+    screenings = sa.table('screenings', sa.column('id', sa.Integer), sa.column('recorded_at', sa.DateTime))
+    state = sa.table('rollup_state', sa.column('last_screening_id', sa.Integer),
+                     sa.column('last_recorded_at', sa.DateTime))
+    mark = bind.execute(sa.select(sa.func.max(state.c.last_recorded_at))).scalar()
+    if mark is not None:
+        last_id = bind.execute(
+            sa.select(sa.func.max(screenings.c.id)).where(screenings.c.recorded_at <= mark)
+        ).scalar() or 0
+        op.execute(state.update().values(last_screening_id=last_id))
+    with op.batch_alter_table('rollup_state') as batch_op:
+        batch_op.drop_column('last_recorded_at')
+    op.drop_index('ix_screenings_recorded_at', table_name='screenings')
+    with op.batch_alter_table('screenings') as batch_op:
+        batch_op.drop_column('recorded_at')
@@ -1,12 +1,69 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, create_engine, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, create_engine, Date, DateTime, Text, Boolean, Index, event, func
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 import os
 
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+
+# Engine / pool tuning, all overridable from the environment
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes')
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+
+
+def _configure_sqlite(engine, in_memory):
+    """Per-connection pragmas and explicit BEGIN handling for pysqlite.
+
+    pysqlite's own transaction handling defers BEGIN until the first write and
+    cannot issue BEGIN IMMEDIATE, which is what lets concurrent writers fail
+    with "database is locked" instead of waiting on busy_timeout. We take over
+    BEGIN so write requests can reserve the write lock up front.
+    """
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _on_begin(conn):
+        if conn.get_execution_options().get('sqlite_begin_immediate'):
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        else:
+            conn.exec_driver_sql('BEGIN')
+
+
+def create_db_engine(url=DATABASE_URL):
+    """Build an engine for `url` using the DB_* / SQLITE_* environment settings."""
+    url = make_url(url)
+    kwargs = {'echo': False, 'future': True, 'pool_pre_ping': DB_POOL_PRE_PING}
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    in_memory = is_sqlite and url.database in (None, '', ':memory:')
+    if not in_memory:
+        # In-memory SQLite uses a single shared connection, so no pool sizing
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                      pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    if is_sqlite:
+        kwargs['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT / 1000}
+    engine = create_engine(url, **kwargs)
+    if is_sqlite:
+        _configure_sqlite(engine, in_memory)
+    return engine
+
+
+engine = create_db_engine()
 Base = declarative_base()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
@@ -22,15 +79,24 @@ class User(Base, UserMixin):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     bio = Column(Text, nullable=True)
     preferences = Column(Text, nullable=True)  # JSON string for user preferences
+    # Bumped when stored rows are changed in place (re-scoring), so ETags and
+    # cached chart series keyed on etags.data_version() go stale
+    data_revision = Column(Integer, default=0, server_default='0', nullable=False)
 
     screenings = relationship('Screening', back_populates='user', cascade='all, delete-orphan')
     coping_logs = relationship('CopingLog', back_populates='user', cascade='all, delete-orphan')
+    stats = relationship('UserStats', back_populates='user', uselist=False, cascade='all, delete-orphan')
+    dimension_stats = relationship('DimensionStats', back_populates='user', cascade='all, delete-orphan')
+    export_jobs = relationship('ExportJob', back_populates='user', cascade='all, delete-orphan')
 
     def set_password(self, raw_password):
-        self.password = generate_password_hash(raw_password)
+        self.password = hash_password(raw_password)
 
     def check_password(self, raw_password):
-        return check_password_hash(self.password, raw_password)
+        return verify_password(self.password, raw_password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password)
 
     def is_admin(self):
         return self.role == 'admin'
@@ -38,8 +104,21 @@ class User(Base, UserMixin):
     def __repr__(self):
         return f"<User {self.username}>"
 
+# Case-insensitive prefix search in the admin user list
+Index('ix_users_username_lower', func.lower(User.username))
+Index('ix_users_email_lower', func.lower(User.email))
+
 class Screening(Base):
     __tablename__ = 'screenings'
+    __table_args__ = (
+        # Per-user history pages filter on user_id and sort by created_at
+        Index('ix_screenings_user_id_created_at', 'user_id', 'created_at'),
+        # Offline sync dedupes uploads on the client-generated UUID
+        Index('ux_screenings_user_id_client_uuid', 'user_id', 'client_uuid', unique=True),
+        # Batch re-scoring walks one questionnaire's rows in id order
+        Index('ix_screenings_questionnaire_id', 'questionnaire', 'id'),
+        Index('ix_screenings_recorded_at', 'recorded_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -53,15 +132,27 @@ class Screening(Base):
     sleep_score = Column(Integer, nullable=True)
     depression_score = Column(Integer, nullable=True)
     social_score = Column(Integer, nullable=True)
+    client_uuid = Column(String(36), nullable=True)  # set by offline sync clients
+    # Registry key and version the level was computed with (see questionnaires.py)
+    questionnaire = Column(String(50), nullable=True)
+    questionnaire_version = Column(Integer, nullable=True)
+    # When the row was written (created_at may be backdated by sync/imports);
+    # the daily rollups' high-water mark
+    recorded_at = Column(DateTime, default=datetime.utcnow, nullable=True)
 
     user = relationship('User', back_populates='screenings')
     recommendations = relationship('Recommendation', back_populates='screening', cascade='all, delete-orphan')
+    recommendation_links = relationship('ScreeningRecommendation', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"<Screening {self.score} - {self.level}>"
 
 class CopingLog(Base):
     __tablename__ = 'coping_logs'
+    __table_args__ = (
+        Index('ix_coping_logs_user_id_created_at', 'user_id', 'created_at'),
+        Index('ux_coping_logs_user_id_client_uuid', 'user_id', 'client_uuid', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -69,6 +160,7 @@ class CopingLog(Base):
     description = Column(Text, nullable=True)
     effectiveness = Column(Integer, nullable=True)  # 1-5 rating
     created_at = Column(DateTime, default=datetime.utcnow)
+    client_uuid = Column(String(36), nullable=True)  # set by offline sync clients
 
     user = relationship('User', back_populates='coping_logs')
 
@@ -76,10 +168,15 @@ class CopingLog(Base):
         return f"<CopingLog {self.strategy}>"
 
 class Recommendation(Base):
+    """Legacy per-screening copy of recommendation text.
+
+    New screenings link to RecommendationTemplate rows through
+    ScreeningRecommendation instead; migration 0004 moves existing rows over.
+    """
     __tablename__ = 'recommendations'
 
     id = Column(Integer, primary_key=True)
-    screening_id = Column(Integer, ForeignKey('screenings.id'), nullable=False)
+    screening_id = Column(Integer, ForeignKey('screenings.id'), nullable=False, index=True)
     category = Column(String(100), nullable=False)  # 'coping', 'resource', 'professional'
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
@@ -90,6 +187,161 @@ class Recommendation(Base):
     def __repr__(self):
         return f"<Recommendation {self.title}>"
 
+class RecommendationTemplate(Base):
+    """Catalog entry shown to users whose screening lands on `level`."""
+    __tablename__ = 'recommendation_templates'
+
+    id = Column(Integer, primary_key=True)
+    level = Column(String(50), nullable=False)  # 'Low', 'Moderate', 'High'
+    category = Column(String(100), nullable=False)  # 'coping', 'resource', 'professional'
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False)
+    url = Column(String(500), nullable=True)
+    position = Column(Integer, default=0, nullable=False)
+    active = Column(Boolean, default=True, nullable=False)  # offered for new screenings
+
+    def __repr__(self):
+        return f"<RecommendationTemplate {self.level}: {self.title}>"
+
+class ScreeningRecommendation(Base):
+    """Which catalog templates were recommended for a screening."""
+    __tablename__ = 'screening_recommendations'
+
+    screening_id = Column(Integer, ForeignKey('screenings.id'), primary_key=True)
+    template_id = Column(Integer, ForeignKey('recommendation_templates.id'), primary_key=True)
+
+    def __repr__(self):
+        return f"<ScreeningRecommendation {self.screening_id} -> {self.template_id}>"
+
+class UserStats(Base):
+    """Per-user screening summary, kept current by stats.record_screening()."""
+    __tablename__ = 'user_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    screening_count = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Integer, default=0, nullable=False)
+    score_min = Column(Integer, nullable=True)
+    score_max = Column(Integer, nullable=True)
+    last_score = Column(Integer, nullable=True)
+    last_level = Column(String(50), nullable=True)
+    last_screening_at = Column(DateTime, nullable=True)
+
+    user = relationship('User', back_populates='stats')
+
+    @property
+    def avg_score(self):
+        if not self.screening_count:
+            return 0
+        return self.score_sum / self.screening_count
+
+    def __repr__(self):
+        return f"<UserStats {self.user_id}: {self.screening_count}>"
+
+class DimensionStats(Base):
+    """Running statistics of one score series for one user, kept by trends.record()."""
+    __tablename__ = 'dimension_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    dimension = Column(String(30), primary_key=True)  # 'score' or a sub-score column
+    count = Column(Integer, default=0, nullable=False)
+    # Welford: running mean and sum of squared deviations
+    mean = Column(Float, default=0.0, nullable=False)
+    m2 = Column(Float, default=0.0, nullable=False)
+    ewma = Column(Float, nullable=True)
+    # Exponentially weighted least-squares sums over (screening number, value)
+    w = Column(Float, default=0.0, nullable=False)
+    wx = Column(Float, default=0.0, nullable=False)
+    wy = Column(Float, default=0.0, nullable=False)
+    wxx = Column(Float, default=0.0, nullable=False)
+    wxy = Column(Float, default=0.0, nullable=False)
+    last_at = Column(DateTime, nullable=True)
+
+    user = relationship('User', back_populates='dimension_stats')
+
+    def __repr__(self):
+        return f"<DimensionStats {self.user_id} {self.dimension}: {self.count}>"
+
+class DailyRollup(Base):
+    """Population totals per day and level, maintained by rollups.refresh_rollups()."""
+    __tablename__ = 'daily_rollups'
+
+    day = Column(Date, primary_key=True)
+    level = Column(String(50), primary_key=True)
+    screening_count = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Integer, default=0, nullable=False)
+    # Extended assessments only; averages divide by extended_count
+    extended_count = Column(Integer, default=0, nullable=False)
+    stress_sum = Column(Integer, default=0, nullable=False)
+    anxiety_sum = Column(Integer, default=0, nullable=False)
+    sleep_sum = Column(Integer, default=0, nullable=False)
+    depression_sum = Column(Integer, default=0, nullable=False)
+    social_sum = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<DailyRollup {self.day} {self.level}: {self.screening_count}>"
+
+class RollupState(Base):
+    """High-water mark: screenings with recorded_at <= last_recorded_at are in the rollups."""
+    __tablename__ = 'rollup_state'
+
+    name = Column(String(50), primary_key=True)
+    last_screening_id = Column(Integer, default=0, nullable=False)  # the id-based mark before 0013; unused
+    last_recorded_at = Column(DateTime, nullable=True)  # None: nothing rolled up yet
+
+    def __repr__(self):
+        return f"<RollupState {self.name}: {self.last_recorded_at}>"
+
+class Job(Base):
+    """Background work queued by a request and run by jobs.Worker."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # The worker polls for the oldest due job
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),
+        Index('ux_jobs_idempotency_key', 'idempotency_key', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False, default='{}')  # JSON keyword arguments
+    idempotency_key = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind}: {self.status}>"
+
+class ExportJob(Base):
+    """A requested export, built in the background into a compressed file."""
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        Index('ix_export_jobs_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # who asked for it
+    scope = Column(String(20), nullable=False, default='user')  # 'user' or 'population' (admins)
+    dataset = Column(String(50), nullable=False)  # exports.DATASETS key or 'all'
+    format = Column(String(10), nullable=False)  # exports.FORMATS key
+    status = Column(String(20), nullable=False, default='pending')  # pending, running, ready, failed, expired
+    path = Column(String(500), nullable=True)
+    filename = Column(String(255), nullable=True)
+    size = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+    user = relationship('User', back_populates='export_jobs')
+
+    def __repr__(self):
+        return f"<ExportJob {self.id} {self.dataset}.{self.format}: {self.status}>"
+
 def init_db():
     Base.metadata.create_all(engine)
 
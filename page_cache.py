@@ -0,0 +1,109 @@
+"""In-memory cache of rendered public pages.
+
+The public pages (home, awareness, support) only vary by the visitor's auth
+state, which shows up in the navbar. Each (template, variant) is rendered once
+and served from memory with an ETag and Cache-Control, so browsers and a CDN
+can cache the anonymous variant.
+
+Entries are dropped when any file in the template folder changes (checked at
+most every TEMPLATE_CHECK_INTERVAL seconds). A deploy starts fresh processes
+and therefore an empty cache; the ETag is a hash of the page itself, so it is
+identical across workers and changes exactly when the output does.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app, make_response, render_template, request, session
+from flask_login import current_user
+
+# Seconds browsers/CDNs may serve the anonymous variant without revalidating
+PUBLIC_PAGE_MAX_AGE = int(os.environ.get('PUBLIC_PAGE_MAX_AGE', '300'))
+TEMPLATE_CHECK_INTERVAL = float(os.environ.get('TEMPLATE_CHECK_INTERVAL', '2'))
+
+
+class PageCache:
+    """Rendered bodies keyed by (template, variant), invalidated on template edits."""
+
+    def __init__(self, check_interval=TEMPLATE_CHECK_INTERVAL, clock=time.monotonic):
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._fingerprint = None
+        self._checked_at = None
+        self.hits = self.misses = 0
+
+    def _template_fingerprint(self, folder):
+        latest = 0.0
+        for root, _, files in os.walk(folder):
+            for name in files:
+                try:
+                    latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+                except OSError:
+                    pass
+        return latest
+
+    def _check_templates(self, folder):
+        now = self._clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        fingerprint = self._template_fingerprint(folder)
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._pages.clear()
+
+    def get(self, key, folder, render):
+        """Return (body, etag) for `key`, calling `render()` on a miss."""
+        with self._lock:
+            self._check_templates(folder)
+            entry = self._pages.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        body = render()
+        entry = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+        with self._lock:
+            self._pages[key] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+page_cache = PageCache()
+
+
+def _variant():
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    return 'admin' if current_user.is_admin() else 'user'
+
+
+def render_public_page(template_name):
+    """Serve `template_name` from the page cache with HTTP caching headers."""
+    # Pending flash messages are rendered into the page once; don't cache that
+    if session.get('_flashes'):
+        response = make_response(render_template(template_name))
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+
+    variant = _variant()
+    folder = os.path.join(current_app.root_path, current_app.template_folder)
+    body, etag = page_cache.get((template_name, variant), folder, lambda: render_template(template_name))
+
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+    response.set_etag(etag)
+    if variant == 'anonymous':
+        response.headers['Cache-Control'] = f'public, max-age={PUBLIC_PAGE_MAX_AGE}'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
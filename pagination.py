@@ -0,0 +1,119 @@
+"""Pagination helpers.
+
+Per-user timelines use keyset (seek) pagination over (created_at, id): pages
+are addressed by an opaque cursor naming the last row already shown, so
+fetching page 500 costs the same index range scan as page 1, unlike OFFSET.
+Admin tables that need page numbers and arbitrary sort orders use
+`numbered_page`.
+"""
+
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_, func, select
+
+
+def encode_cursor(created_at, row_id):
+    raw = f'{created_at.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """One page of rows, newest first, with cursors for its neighbours."""
+
+    def __init__(self, items, newer_cursor=None, older_cursor=None):
+        self.items = items
+        self.newer_cursor = newer_cursor
+        self.older_cursor = older_cursor
+
+    @property
+    def has_newer(self):
+        return self.newer_cursor is not None
+
+    @property
+    def has_older(self):
+        return self.older_cursor is not None
+
+
+def keyset_page(query, model, per_page, before=None, after=None):
+    """Fetch a newest-first page of `query` relative to a cursor.
+
+    `before` returns rows older than the cursor (the "next" page), `after`
+    returns rows newer than it (the "previous" page). The query should already
+    be filtered, e.g. by user_id, so an index on (user_id, created_at) serves it.
+    """
+    created, row_id = model.created_at, model.id
+    before_key = decode_cursor(before)
+    after_key = decode_cursor(after) if before_key is None else None
+
+    if after_key:
+        ts, key = after_key
+        rows = (query.filter(or_(created > ts, and_(created == ts, row_id > key)))
+                .order_by(created.asc(), row_id.asc())
+                .limit(per_page + 1)
+                .all())
+        has_more_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_more_older = True
+    else:
+        if before_key:
+            ts, key = before_key
+            query = query.filter(or_(created < ts, and_(created == ts, row_id < key)))
+        rows = (query.order_by(created.desc(), row_id.desc())
+                .limit(per_page + 1)
+                .all())
+        has_more_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_more_newer = before_key is not None
+
+    newer_cursor = older_cursor = None
+    if items and has_more_newer:
+        newer_cursor = encode_cursor(items[0].created_at, items[0].id)
+    if items and has_more_older:
+        older_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return KeysetPage(items, newer_cursor, older_cursor)
+
+
+class NumberedPage:
+    """One page of a numbered listing."""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self.page < self.pages
+
+
+def numbered_page(session, stmt, page, per_page):
+    """Run an ordered SELECT for one page, plus a COUNT of the whole result.
+
+    Out-of-range page numbers are clamped to the last page.
+    """
+    total = session.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
+    page = min(max(page, 1), max(1, -(-total // per_page)))
+    items = session.execute(stmt.limit(per_page).offset((page - 1) * per_page)).all()
+    return NumberedPage(items, page, per_page, total)
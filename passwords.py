@@ -0,0 +1,35 @@
+"""Password hashing policy.
+
+The hash method and its cost come from the environment, e.g.
+``PASSWORD_HASH_METHOD=scrypt:16384:8:1`` or ``pbkdf2:sha256:600000``.
+Stored hashes record the parameters they were made with, so existing
+passwords keep verifying after the policy changes and are upgraded the next
+time their owner logs in (see `needs_rehash`).
+"""
+
+import os
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Werkzeug's default (scrypt:32768:8:1) unless configured
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+
+
+@lru_cache(maxsize=None)
+def _canonical(method):
+    """Full parameter string werkzeug records for `method` (e.g. 'scrypt' -> 'scrypt:32768:8:1')."""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def hash_password(raw_password, method=None):
+    return generate_password_hash(raw_password, method=method or PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored_hash, raw_password):
+    return check_password_hash(stored_hash, raw_password)
+
+
+def needs_rehash(stored_hash, method=None):
+    """True if `stored_hash` was made with a method or cost other than the policy's."""
+    return stored_hash.split('$', 1)[0] != _canonical(method or PASSWORD_HASH_METHOD)
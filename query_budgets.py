@@ -0,0 +1,117 @@
+"""Per-route limits on the number of SQL statements a request may run.
+
+A view that loads a list and then touches a relationship per row in its
+template runs one query per row (N+1); it works in development and falls
+over under production data. Each endpoint therefore has a statement budget:
+
+    @app.route('/history')
+    @login_required
+    @query_budget(4)
+    def screening_history():
+        ...
+
+or an entry in ``app.config['QUERY_BUDGETS']`` (which wins), falling back to
+QUERY_BUDGET_DEFAULT. A budget of 0 leaves the endpoint unchecked, for views
+whose work grows with their input (bulk imports). Statements are counted by
+the engine events in metrics.py, which leave out BEGIN and savepoints. A
+budget must cover a request whose `load_user` misses the identity cache. A request over budget raises
+QueryBudgetExceeded when the app is testing and logs a warning otherwise.
+
+Every checked request is also tallied per endpoint; `report()` returns the
+tallies, and the test suite prints them at the end of a run.
+"""
+
+import logging
+import os
+import threading
+
+from flask import current_app, g, request
+
+log = logging.getLogger(__name__)
+
+# Budget for endpoints that declare none; 0 leaves them unchecked
+QUERY_BUDGET_DEFAULT = int(os.environ.get('QUERY_BUDGET_DEFAULT', '20'))
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most SQL statements the decorated view may run per request."""
+    def decorate(view):
+        view.query_budget = limit
+        return view
+    return decorate
+
+
+def budget_for(app, endpoint):
+    configured = app.config.get('QUERY_BUDGETS', {})
+    if endpoint in configured:
+        return configured[endpoint]
+    limit = getattr(app.view_functions.get(endpoint), 'query_budget', None)
+    return QUERY_BUDGET_DEFAULT if limit is None else limit
+
+
+class Tally:
+    """Statements seen per endpoint: requests, max, total and budget overruns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+
+    def add(self, endpoint, statements, budget):
+        with self._lock:
+            row = self._rows.setdefault(endpoint, {'requests': 0, 'max': 0, 'total': 0, 'over': 0})
+            row['requests'] += 1
+            row['max'] = max(row['max'], statements)
+            row['total'] += statements
+            row['budget'] = budget
+            if budget and statements > budget:
+                row['over'] += 1
+
+    def report(self):
+        """Rows sorted by how close each endpoint's worst request came to its budget."""
+        with self._lock:
+            rows = [
+                {'endpoint': endpoint, **row, 'mean': round(row['total'] / row['requests'], 1)}
+                for endpoint, row in self._rows.items()
+            ]
+        return sorted(rows, key=lambda r: (-(r['max'] / r['budget'] if r['budget'] else 0), r['endpoint']))
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+tally = Tally()
+report = tally.report
+
+
+def format_report(rows):
+    lines = [f'{"endpoint":<32}{"requests":>9}{"mean":>7}{"max":>6}{"budget":>8}{"over":>6}']
+    for r in rows:
+        lines.append(f'{r["endpoint"]:<32}{r["requests"]:>9}{r["mean"]:>7}{r["max"]:>6}'
+                     f'{r["budget"] or "-":>8}{r["over"]:>6}')
+    return '\n'.join(lines)
+
+
+def _check(response):
+    statements = g.get('sql_count')
+    if statements is None or request.endpoint in (None, 'static'):
+        return response
+    app = current_app._get_current_object()
+    budget = budget_for(app, request.endpoint)
+    tally.add(request.endpoint, statements, budget)
+    if budget and statements > budget:
+        message = f'{request.endpoint} ran {statements} SQL statements (budget {budget})'
+        if app.testing:
+            raise QueryBudgetExceeded(message)
+        log.warning(message)
+    return response
+
+
+def init_app(app):
+    """Check budgets after each response; register after metrics.init_app."""
+    app.config.setdefault('QUERY_BUDGETS', {})
+    app.after_request(_check)
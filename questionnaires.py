@@ -0,0 +1,153 @@
+"""Questionnaire registry.
+
+Each questionnaire declares its questions (answer choices and weights), how
+questions group into sub-scales, and the cut-offs that turn a total score into
+a risk level. The WTForms classes in `forms.py` are generated from these
+definitions and `scoring` computes scores from them, so a revision is made in
+one place. Bump `version` whenever cut-offs or weights change; stored
+screenings record the version they were scored with, and
+`flask rescore-screenings` re-levels older rows (see `rescoring.py`).
+"""
+
+from flask_wtf import FlaskForm
+from wtforms import RadioField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, Length, Optional
+
+FREQUENCY = [('2', 'Often'), ('1', 'Sometimes'), ('0', 'Never')]
+
+
+class Question:
+    def __init__(self, name, label, choices=FREQUENCY, weight=1):
+        self.name = name
+        self.label = label
+        self.choices = choices
+        self.weight = weight
+
+    def points(self, answer):
+        return int(answer) * self.weight
+
+
+class Subscale:
+    """Questions summed into one stored column (e.g. `stress_score`)."""
+
+    def __init__(self, column, title, questions):
+        self.column = column
+        self.title = title
+        self.questions = questions
+
+
+class Questionnaire:
+    """A versioned questionnaire definition.
+
+    `cutoffs` is a list of (highest score, level) in ascending order; scores
+    above the last cut-off get `top_level`.
+    """
+
+    def __init__(self, key, version, title, cutoffs, top_level='High', questions=None, subscales=None,
+                 notes=False, submit_label='Submit'):
+        self.key = key
+        self.version = version
+        self.title = title
+        self.cutoffs = cutoffs
+        self.top_level = top_level
+        self.subscales = subscales or []
+        if questions is None:
+            questions = [q for subscale in self.subscales for q in subscale.questions]
+        self.questions = questions
+        self.notes = notes
+        self.submit_label = submit_label
+
+    @property
+    def levels(self):
+        return [level for _, level in self.cutoffs] + [self.top_level]
+
+    def level_for(self, score):
+        for highest, level in self.cutoffs:
+            if score <= highest:
+                return level
+        return self.top_level
+
+    def score(self, answers):
+        """Return (total, level, {subscale column: score}) for submitted answers."""
+        subscales = {
+            subscale.column: sum(q.points(answers[q.name]) for q in subscale.questions)
+            for subscale in self.subscales
+        }
+        total = sum(q.points(answers[q.name]) for q in self.questions)
+        return total, self.level_for(total), subscales
+
+    def stamp(self):
+        """Screening column values recording that this version did the scoring."""
+        return {'questionnaire': self.key, 'questionnaire_version': self.version}
+
+    def build_form(self, name):
+        """Generate the FlaskForm class for this questionnaire."""
+        attrs = {
+            q.name: RadioField(q.label, choices=q.choices, validators=[DataRequired()])
+            for q in self.questions
+        }
+        if self.notes:
+            attrs['notes'] = TextAreaField('Any additional notes?', validators=[Optional(), Length(max=500)])
+        attrs['submit'] = SubmitField(self.submit_label)
+        return type(name, (FlaskForm,), attrs)
+
+
+QUICK = Questionnaire(
+    key='quick',
+    version=1,
+    title='Quick Mental Health Screening',
+    cutoffs=[(8, 'Low'), (15, 'Moderate')],
+    questions=[
+        Question('q1', 'I feel stressed frequently'),
+        Question('q2', 'I feel anxious or worried'),
+        Question('q3', 'I have trouble sleeping'),
+        Question('q4', 'I feel sad or depressed'),
+        Question('q5', 'I have difficulty concentrating'),
+        Question('q6', 'I feel isolated or lonely'),
+        Question('q7', 'I have lost interest in activities I enjoy'),
+        Question('q8', 'I experience appetite changes'),
+        Question('q9', 'I feel overwhelmed by my responsibilities'),
+        Question('q10', 'I have thoughts of harming myself'),
+    ],
+)
+
+EXTENDED = Questionnaire(
+    key='extended',
+    version=1,
+    title='Extended Assessment',
+    cutoffs=[(15, 'Low'), (30, 'Moderate')],
+    subscales=[
+        Subscale('stress_score', 'Stress', [
+            Question('stress_q1', 'How often do you feel stressed?'),
+            Question('stress_q2', 'How do you manage stress?', [('0', 'Well'), ('1', 'Somewhat'), ('2', 'Poorly')]),
+        ]),
+        Subscale('anxiety_score', 'Anxiety', [
+            Question('anxiety_q1', 'How often do you experience anxiety?'),
+            Question('anxiety_q2', 'How much does anxiety affect your daily life?',
+                     [('0', 'Minimal'), ('1', 'Moderate'), ('2', 'Significant')]),
+        ]),
+        Subscale('sleep_score', 'Sleep', [
+            Question('sleep_q1', 'How many hours do you typically sleep?',
+                     [('2', '<6 hours'), ('1', '6-7 hours'), ('0', '8+ hours')]),
+            Question('sleep_q2', 'How is your sleep quality?', [('2', 'Poor'), ('1', 'Fair'), ('0', 'Good')]),
+        ]),
+        Subscale('depression_score', 'Mood / Depression', [
+            Question('depression_q1', 'How often do you feel down or depressed?'),
+            Question('depression_q2', 'Do you enjoy activities you usually enjoy?',
+                     [('0', 'Yes'), ('1', 'Sometimes'), ('2', 'No')]),
+        ]),
+        Subscale('social_score', 'Social Support', [
+            Question('social_q1', 'How is your social connection with others?',
+                     [('0', 'Strong'), ('1', 'Moderate'), ('2', 'Weak')]),
+            Question('social_q2', 'Do you have someone to talk to?', [('0', 'Yes'), ('1', 'Sometimes'), ('2', 'No')]),
+        ]),
+    ],
+    notes=True,
+    submit_label='Complete Assessment',
+)
+
+REGISTRY = {q.key: q for q in (QUICK, EXTENDED)}
+
+
+def get_questionnaire(key):
+    return REGISTRY[key]
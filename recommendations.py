@@ -0,0 +1,148 @@
+"""Recommendation catalog.
+
+Recommendation text lives once in `recommendation_templates`; each screening
+only stores (screening_id, template_id) pairs in `screening_recommendations`.
+The catalog is small and changes rarely, so it is loaded once per process and
+served from memory. Pages that list past screenings resolve their links with
+`recommendations_for`: one query on the link table, text from the cache.
+"""
+
+import threading
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
+from models import RecommendationTemplate, ScreeningRecommendation
+
+# Seeded into an empty catalog (and by migration 0004)
+DEFAULT_TEMPLATES = {
+    'High': [
+        {'category': 'professional', 'title': 'Consider Professional Help', 'description': 'Your assessment suggests you may benefit from speaking with a mental health professional.'},
+        {'category': 'coping', 'title': 'Grounding Technique', 'description': 'Try the 5-4-3-2-1 technique: Notice 5 things you see, 4 you touch, 3 you hear, 2 you smell, 1 you taste.'},
+        {'category': 'resource', 'title': 'Mental Health Hotline', 'description': 'Call 988 (Suicide & Crisis Lifeline) for immediate support anytime.'},
+    ],
+    'Moderate': [
+        {'category': 'coping', 'title': 'Deep Breathing Exercise', 'description': 'Try Box Breathing: Breathe in for 4 counts, hold for 4, out for 4, hold for 4.'},
+        {'category': 'coping', 'title': 'Physical Activity', 'description': 'Regular exercise can improve mental health. Aim for 30 minutes daily.'},
+        {'category': 'resource', 'title': 'Meditation Apps', 'description': 'Try apps like Headspace or Calm for guided meditation and mindfulness.'},
+    ],
+    'Low': [
+        {'category': 'coping', 'title': 'Maintain Healthy Habits', 'description': 'Keep up with exercise, sleep, and social connections.'},
+        {'category': 'resource', 'title': 'Wellness Tips', 'description': 'Continue with self-care practices and stress management techniques.'},
+    ],
+}
+
+
+class RecommendationCatalog:
+    """In-memory view of recommendation_templates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_level = None
+
+    def load(self, session):
+        """Populate the cache from the database, seeding defaults if empty."""
+        with self._lock:
+            if self._by_id is not None:
+                return
+            rows = session.execute(
+                select(RecommendationTemplate).order_by(RecommendationTemplate.level, RecommendationTemplate.position)
+            ).scalars().all()
+            if not rows:
+                rows = seed_default_templates(session)
+                # The seeded ids only exist once the caller commits (see _forget_uncommitted_seed)
+                session.info['catalog_seeded'] = True
+
+            by_id, by_level = {}, {}
+            for t in rows:
+                entry = {'id': t.id, 'category': t.category, 'title': t.title,
+                         'description': t.description, 'url': t.url}
+                by_id[t.id] = entry
+                if t.active:
+                    by_level.setdefault(t.level, []).append(entry)
+            self._by_id, self._by_level = by_id, by_level
+
+    def invalidate(self):
+        with self._lock:
+            self._by_id = self._by_level = None
+
+    def for_level(self, session, level):
+        self.load(session)
+        return self._by_level.get(level, [])
+
+    def resolve(self, session, template_ids):
+        """Map template ids to their entries without touching the database."""
+        self.load(session)
+        return [self._by_id[tid] for tid in template_ids if tid in self._by_id]
+
+
+def seed_default_templates(session):
+    templates = [
+        RecommendationTemplate(level=level, position=position, active=True, **rec)
+        for level, recs in DEFAULT_TEMPLATES.items()
+        for position, rec in enumerate(recs)
+    ]
+    session.add_all(templates)
+    session.flush()
+    return templates
+
+
+catalog = RecommendationCatalog()
+
+
+@event.listens_for(Session, 'after_commit')
+def _keep_committed_seed(session):
+    session.info.pop('catalog_seeded', None)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_uncommitted_seed(session, transaction):
+    # A seed rolled back (or discarded with the session) must not leave cached ids pointing nowhere
+    if transaction.parent is None and session.info.pop('catalog_seeded', False):
+        catalog.invalidate()
+
+
+def recommend(session, screening_id, level):
+    """Link the catalog entries for `level` to a screening and return them.
+
+    The links are written with a single executemany INSERT in the caller's
+    transaction.
+    """
+    entries = catalog.for_level(session, level)
+    if entries:
+        session.execute(
+            insert(ScreeningRecommendation),
+            [{'screening_id': screening_id, 'template_id': e['id']} for e in entries],
+        )
+    return entries
+
+
+def recommend_many(session, screenings):
+    """Link catalog entries to many (screening_id, level) pairs in one INSERT."""
+    rows = [
+        {'screening_id': screening_id, 'template_id': entry['id']}
+        for screening_id, level in screenings
+        for entry in catalog.for_level(session, level)
+    ]
+    if rows:
+        session.execute(insert(ScreeningRecommendation), rows)
+    return len(rows)
+
+
+def recommendations_for(session, screening_ids):
+    """Return {screening_id: [entries]} for the given screenings.
+
+    One query over the narrow link table; the text comes from the cache.
+    """
+    links = {}
+    if not screening_ids:
+        return links
+    rows = session.execute(
+        select(ScreeningRecommendation.screening_id, ScreeningRecommendation.template_id)
+        .where(ScreeningRecommendation.screening_id.in_(list(screening_ids)))
+        .order_by(ScreeningRecommendation.screening_id, ScreeningRecommendation.template_id)
+    )
+    for screening_id, template_id in rows:
+        links.setdefault(screening_id, []).append(template_id)
+    return {sid: catalog.resolve(session, tids) for sid, tids in links.items()}
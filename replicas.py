@@ -0,0 +1,168 @@
+"""Read replicas for read-only views, with read-your-writes stickiness.
+
+Views decorated with `@read_from_replica` read from one of the engines in
+DATABASE_REPLICA_URLS (comma separated, tried round-robin). Everything else
+reads and writes the primary (`models.engine`). Inside a decorated view, only
+`get_db()` returns the replica session. `get_db(write=True)` always returns
+the primary.
+
+Replicas lag the primary, so a user who has just written is kept on the
+primary for REPLICA_STICKY_SECONDS. The time of the last write is stored in
+the signed session cookie, so it holds across gunicorn workers.
+
+Each replica is health-checked at most every REPLICA_CHECK_INTERVAL seconds.
+The check is a query against the users table, so an empty or missing SQLite
+file fails it. A replica that fails the check, or that cannot give a session
+a connection, is skipped for REPLICA_RETRY_INTERVAL seconds. When no replica
+is available, reads fall back to the primary.
+
+Locally, two SQLite files stand in for a primary and a replica, and
+`flask copy-replica` stands in for replication:
+
+    DATABASE_URL=sqlite:///database.db DATABASE_REPLICA_URLS=sqlite:///replica.db
+"""
+
+import itertools
+import logging
+import os
+import sqlite3
+import time
+from functools import wraps
+
+import flask
+from flask import g, request
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+import metrics
+import models
+
+REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+REPLICA_RETRY_INTERVAL = float(os.environ.get('REPLICA_RETRY_INTERVAL', 30))
+
+# Key in the session cookie holding the time of the user's last write
+WROTE_AT_KEY = '_db_wrote_at'
+
+log = logging.getLogger(__name__)
+
+
+class Replica:
+    """One replica engine, its sessions and its last known health."""
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = models.create_db_engine(url)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        self.healthy = True
+        self.checked_at = None
+
+    def available(self, now=None):
+        """Whether to use this replica, re-checking it when the last check is due."""
+        now = time.monotonic() if now is None else now
+        interval = REPLICA_CHECK_INTERVAL if self.healthy else REPLICA_RETRY_INTERVAL
+        if self.checked_at is None or now - self.checked_at >= interval:
+            self.check(now)
+        return self.healthy
+
+    def check(self, now=None):
+        self.checked_at = time.monotonic() if now is None else now
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(select(models.User.id).limit(1))
+        except SQLAlchemyError as e:
+            self.mark_down(e)
+        else:
+            if not self.healthy:
+                log.info('Replica %s is back', self.name)
+            self.healthy = True
+
+    def mark_down(self, error):
+        if self.healthy:
+            log.warning('Replica %s failed its health check, reading from the primary: %s', self.name, error)
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+    @property
+    def name(self):
+        return make_url(self.url).render_as_string(hide_password=True)
+
+
+replicas = []
+_next = itertools.count()
+
+
+def configure(urls):
+    """Replace the replica set (module import uses DATABASE_REPLICA_URLS)."""
+    for replica in replicas:
+        replica.engine.dispose()
+    replicas[:] = [Replica(url) for url in urls]
+    for replica in replicas:
+        # Statements on replicas count towards the request's metrics and query budget
+        metrics.instrument_engine(replica.engine)
+
+
+def dispose(close=True):
+    for replica in replicas:
+        replica.engine.dispose(close=close)
+
+
+def recently_wrote():
+    wrote_at = flask.session.get(WROTE_AT_KEY)
+    return wrote_at is not None and time.time() - wrote_at < REPLICA_STICKY_SECONDS
+
+
+def open_session():
+    """A session on the next available replica, or None to use the primary."""
+    for _ in range(len(replicas)):
+        replica = replicas[next(_next) % len(replicas)]
+        if not replica.available():
+            continue
+        session = replica.SessionLocal()
+        try:
+            session.connection()
+        except SQLAlchemyError as e:
+            session.close()
+            replica.mark_down(e)
+            continue
+        session.info['replica'] = replica.name
+        return session
+    return None
+
+
+def read_from_replica(view):
+    """Serve the view's `get_db()` reads from a replica (GET only, unless the user just wrote)."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if replicas and request.method == 'GET' and not recently_wrote():
+            g.read_replica = True
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def _remember_write(response):
+    session = g.get('db_session')
+    if replicas and session is not None and session.info.get('write'):
+        flask.session[WROTE_AT_KEY] = time.time()
+    return response
+
+
+def copy_sqlite(source_url, target_url):
+    """Copy one SQLite database over another with the online backup API."""
+    source_path, target_path = make_url(source_url).database, make_url(target_url).database
+    source, target = sqlite3.connect(source_path), sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def init_app(app):
+    app.after_request(_remember_write)
+
+
+configure(REPLICA_URLS)
@@ -0,0 +1,131 @@
+"""Batch re-leveling of stored screenings after a questionnaire revision.
+
+Individual answers are not stored, only the total and (for the extended
+assessment) the sub-scale scores. A revision of the cut-offs can therefore be
+applied to history; a change of question weights only affects new
+screenings. The total of an extended screening is recomputed as the sum of
+its sub-scales, so a revision that drops or adds a sub-scale is reflected.
+
+Rows are read in primary-key order, one chunk at a time, into NumPy arrays.
+Levels are computed for the whole chunk at once with `np.searchsorted` over
+the cut-offs, and only rows whose score, level or version changed are written
+back, with one executemany UPDATE per chunk. Afterwards the user_stats
+summaries and trend statistics of the users whose rows changed are rebuilt,
+and so are the daily rollups. Each chunk also bumps its users'
+`data_revision`, so their ETags and cached chart series change.
+"""
+
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import select, update, or_
+
+from etags import bump_revision
+from models import Screening
+from questionnaires import get_questionnaire
+from rollups import rebuild_rollups
+from stats import rebuild_user_stats
+import trends
+
+CHUNK_SIZE = 10000
+
+
+class RescoreReport:
+    """Outcome of one re-scoring run."""
+
+    def __init__(self, questionnaire):
+        self.questionnaire = questionnaire
+        self.scanned = 0
+        self.updated = 0
+        self.user_ids = set()  # owners of updated rows
+        # (old level, new level) -> count, for rows whose level changed
+        self.transitions = Counter()
+
+    @property
+    def relevelled(self):
+        return sum(self.transitions.values())
+
+
+def levels_for(questionnaire, scores):
+    """Vectorised `Questionnaire.level_for` over an integer array."""
+    bounds = np.array([highest for highest, _ in questionnaire.cutoffs])
+    levels = np.array(questionnaire.levels, dtype=object)
+    # side='left': a score equal to a cut-off belongs to that cut-off's level
+    return levels[np.searchsorted(bounds, scores, side='left')]
+
+
+def _chunk_arrays(questionnaire, rows):
+    ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+    owners = np.fromiter((row.user_id for row in rows), dtype=np.int64, count=len(rows))
+    scores = np.fromiter((row.score for row in rows), dtype=np.int64, count=len(rows))
+    if questionnaire.subscales:
+        subscales = np.array(
+            [[getattr(row, s.column) or 0 for s in questionnaire.subscales] for row in rows],
+            dtype=np.int64,
+        )
+        new_scores = subscales.sum(axis=1)
+    else:
+        new_scores = scores
+    old_levels = np.array([row.level for row in rows], dtype=object)
+    versions = np.array([row.questionnaire_version or 0 for row in rows], dtype=np.int64)
+    return ids, owners, scores, new_scores, old_levels, versions
+
+
+def rescore_screenings(session, key, chunk_size=None, dry_run=False, everything=False):
+    """Re-level stored screenings of questionnaire `key`. Returns a RescoreReport.
+
+    Only rows scored with an older version (or none, e.g. imported paper
+    screenings) are considered unless `everything` is set. Commits after each
+    chunk; with `dry_run` nothing is written and the report shows what would
+    change.
+    """
+    questionnaire = get_questionnaire(key)
+    chunk_size = chunk_size or CHUNK_SIZE
+    columns = [Screening.id, Screening.user_id, Screening.score, Screening.level, Screening.questionnaire_version]
+    columns += [getattr(Screening, s.column) for s in questionnaire.subscales]
+    stmt = select(*columns).where(Screening.questionnaire == key)
+    if not everything:
+        stmt = stmt.where(or_(
+            Screening.questionnaire_version.is_(None),
+            Screening.questionnaire_version < questionnaire.version,
+        ))
+
+    report = RescoreReport(questionnaire)
+    last_id = 0
+    while True:
+        # Take the write lock before reading, so the chunk never has to
+        # upgrade a read transaction (see database.get_db).
+        if not dry_run and not session.in_transaction():
+            session.connection(execution_options={'sqlite_begin_immediate': True})
+        rows = session.execute(stmt.where(Screening.id > last_id).order_by(Screening.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        report.scanned += len(rows)
+
+        ids, owners, scores, new_scores, old_levels, versions = _chunk_arrays(questionnaire, rows)
+        new_levels = levels_for(questionnaire, new_scores)
+        relevelled = old_levels != new_levels
+        changed = relevelled | (scores != new_scores) | (versions != questionnaire.version)
+        report.transitions.update(zip(old_levels[relevelled], new_levels[relevelled]))
+        report.updated += int(changed.sum())
+        report.user_ids.update(owners[changed].tolist())
+
+        if changed.any() and not dry_run:
+            # ORM bulk UPDATE by primary key: one executemany per chunk
+            session.execute(update(Screening), [
+                {'id': int(i), 'score': int(score), 'level': level, 'questionnaire_version': questionnaire.version}
+                for i, score, level in zip(ids[changed], new_scores[changed], new_levels[changed])
+            ])
+            # Rows changed in place: ETags and cached series must not match anymore
+            bump_revision(session, set(owners[changed].tolist()))
+        session.commit()
+
+    session.commit()
+    if report.updated and not dry_run:
+        session.connection(execution_options={'sqlite_begin_immediate': True})
+        rebuild_user_stats(session, report.user_ids)
+        trends.rebuild(session, report.user_ids)
+        rebuild_rollups(session)
+        session.commit()
+    return report
@@ -0,0 +1,218 @@
+"""Daily population rollups for admin trend reporting.
+
+`daily_rollups` holds one row per (day, level) with the screening count, the
+score sum and per-dimension sub-score sums. It is maintained incrementally:
+`refresh_rollups` aggregates only screenings recorded after the high-water
+mark in `rollup_state` and adds them to the existing rows, so a refresh costs
+the same whether the table covers a week or ten years. The mark is on
+`Screening.recorded_at` (the time the row was written), not `created_at`, so
+backdated rows (offline sync, imports) are picked up by the next refresh.
+
+With concurrent writers (PostgreSQL), a transaction can commit a row recorded
+before a refresh's mark after the refresh has run. Refreshes therefore stop
+ROLLUP_LAG_SECONDS short of the current time and leave newer rows to a later
+run; the lag must exceed the longest write transaction. On SQLite the refresh
+holds the only write lock, so nothing can commit behind it and the lag is 0.
+
+Refreshes run in the background (`schedule_refresh`, queued wherever
+screenings are added: the screening views, sync and imports) or from
+`flask refresh-rollups`; the admin report only reads.
+
+Changes to rows already rolled up are handled where they happen: deleting a
+user subtracts their screenings (`forget_user`), and re-scoring rebuilds the
+table (`rebuild_rollups`).
+
+The trends report reads only this table, via pandas (imported on first use).
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, update, delete, func, tuple_, bindparam, Date
+
+import jobs
+from models import Screening, DailyRollup, RollupState
+from stats import DIMENSIONS, LEVELS
+
+STATE = 'daily_rollups'
+
+# Screening dimension column -> rollup sum column
+SUM_COLUMNS = {dim: dim.replace('_score', '_sum') for dim in DIMENSIONS}
+COUNTER_COLUMNS = ['screening_count', 'score_sum', 'extended_count'] + list(SUM_COLUMNS.values())
+
+# Refreshes requested within the same window coalesce into one job
+REFRESH_DELAY = 30
+
+# Rows recorded this recently may belong to uncommitted transactions (ignored on SQLite)
+ROLLUP_LAG_SECONDS = float(os.environ.get('ROLLUP_LAG_SECONDS', 120))
+
+PERIODS = {'week': 'W', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+DEFAULT_PERIOD = 'month'
+
+
+def _aggregate(*criteria):
+    """SELECT day, level and the counter columns over matching screenings."""
+    day = func.date(Screening.created_at, type_=Date)
+    return (
+        select(
+            day.label('day'),
+            Screening.level,
+            func.count(Screening.id),
+            func.coalesce(func.sum(Screening.score), 0),
+            func.count(Screening.stress_score),
+            *[func.coalesce(func.sum(getattr(Screening, dim)), 0) for dim in DIMENSIONS],
+        )
+        .where(Screening.created_at.is_not(None), *criteria)
+        .group_by(day, Screening.level)
+    )
+
+
+def _high_water_mark(session):
+    state = session.get(RollupState, STATE)
+    if state is None:
+        state = RollupState(name=STATE, last_screening_id=0)
+        session.add(state)
+    return state
+
+
+def _lag(session):
+    return 0 if session.get_bind().dialect.name == 'sqlite' else ROLLUP_LAG_SECONDS
+
+
+def _cutoff(session):
+    """Rows recorded at or before this time are safe to roll up."""
+    return datetime.utcnow() - timedelta(seconds=_lag(session))
+
+
+def _apply(session, groups, sign=1):
+    """Add (or with sign=-1 subtract) aggregated groups to the rollup rows."""
+    if not groups:
+        return
+    keys = [(day, level) for day, level, *_ in groups]
+    existing = set(session.execute(
+        select(DailyRollup.day, DailyRollup.level).where(tuple_(DailyRollup.day, DailyRollup.level).in_(keys))
+    ).all())
+    updates, inserts = [], []
+    for day, level, *counters in groups:
+        values = {column: sign * value for column, value in zip(COUNTER_COLUMNS, counters)}
+        if (day, level) in existing:
+            updates.append({'b_day': day, 'b_level': level, **values})
+        else:
+            inserts.append({'day': day, 'level': level, **values})
+
+    if updates:
+        table = DailyRollup.__table__
+        session.execute(
+            update(table)
+            .where(table.c.day == bindparam('b_day'), table.c.level == bindparam('b_level'))
+            .values({column: table.c[column] + bindparam(column) for column in COUNTER_COLUMNS}),
+            updates,
+        )
+    if inserts:
+        session.execute(insert(DailyRollup), inserts)
+
+
+def refresh_rollups(session, cutoff=None):
+    """Fold screenings recorded since the last refresh, up to `cutoff`
+    (default: now less the lag), into daily_rollups.
+
+    Returns the number of screenings added. Run it in a write transaction
+    (BEGIN IMMEDIATE on SQLite) so two refreshes cannot fold the same rows.
+    The caller commits.
+    """
+    state = _high_water_mark(session)
+    cutoff = _cutoff(session) if cutoff is None else cutoff
+    newest = session.execute(
+        select(func.max(Screening.recorded_at)).where(Screening.recorded_at <= cutoff)
+    ).scalar()
+    if newest is None or (state.last_recorded_at is not None and newest <= state.last_recorded_at):
+        return 0
+    in_range = [Screening.recorded_at <= newest]
+    if state.last_recorded_at is not None:
+        in_range.append(Screening.recorded_at > state.last_recorded_at)
+    groups = session.execute(_aggregate(*in_range)).all()
+    _apply(session, groups)
+    state.last_recorded_at = newest
+    session.flush()
+    return sum(group[2] for group in groups)
+
+
+@jobs.handler('refresh_rollups')
+def _refresh_job(session):
+    cutoff = _cutoff(session)
+    refresh_rollups(session, cutoff)
+    # Rows still inside the lag window need another pass once it has passed
+    if session.execute(select(Screening.id).where(Screening.recorded_at > cutoff).limit(1)).first() is not None:
+        schedule_refresh(session, delay=max(REFRESH_DELAY, _lag(session)))
+
+
+def schedule_refresh(session, delay=REFRESH_DELAY):
+    """Queue a background refresh; at most one per REFRESH_DELAY-second window."""
+    window = int(datetime.utcnow().timestamp() + delay) // REFRESH_DELAY
+    jobs.enqueue(session, 'refresh_rollups', key=f'refresh_rollups:{window}', delay=delay)
+
+
+def rebuild_rollups(session):
+    """Recompute daily_rollups from scratch. The caller commits."""
+    session.execute(delete(DailyRollup))
+    _high_water_mark(session).last_recorded_at = None
+    return refresh_rollups(session)
+
+
+def forget_user(session, user_id):
+    """Subtract a user's rolled-up screenings, before the user is deleted."""
+    state = session.get(RollupState, STATE)
+    if state is None or state.last_recorded_at is None:
+        return
+    groups = session.execute(
+        _aggregate(Screening.user_id == user_id, Screening.recorded_at <= state.last_recorded_at)
+    ).all()
+    _apply(session, groups, sign=-1)
+    session.execute(delete(DailyRollup).where(DailyRollup.screening_count <= 0))
+
+
+def daily_frame(session):
+    """The rollup table as a DataFrame, one row per (day, level)."""
+    import pandas as pd  # only the admin report needs it; keeps it out of worker startup
+    rows = session.execute(select(
+        DailyRollup.day, DailyRollup.level, *[getattr(DailyRollup, c) for c in COUNTER_COLUMNS]
+    )).all()
+    frame = pd.DataFrame(rows, columns=['day', 'level'] + COUNTER_COLUMNS)
+    frame['day'] = pd.to_datetime(frame['day'])
+    return frame
+
+
+def trend_report(session, period=DEFAULT_PERIOD):
+    """Per-period population trends, oldest first.
+
+    Each row has the period label, screening counts per level, the High
+    share (%), the average score and per-dimension averages (extended
+    assessments only; None when a period has none).
+    """
+    frame = daily_frame(session)
+    if frame.empty:
+        return []
+    frame['period'] = frame['day'].dt.to_period(PERIODS[period])
+
+    totals = frame.groupby('period')[COUNTER_COLUMNS].sum()
+    by_level = (
+        frame.pivot_table(index='period', columns='level', values='screening_count', aggfunc='sum', fill_value=0)
+        .reindex(columns=LEVELS, fill_value=0)
+    )
+    report = []
+    for period_key, row in totals.iterrows():
+        count = int(row['screening_count'])
+        extended = int(row['extended_count'])
+        levels = {level: int(by_level.at[period_key, level]) for level in LEVELS}
+        report.append({
+            'period': str(period_key),
+            'total': count,
+            'levels': levels,
+            'high_share': round(100 * levels['High'] / count, 1) if count else 0.0,
+            'avg_score': round(row['score_sum'] / count, 2) if count else None,
+            'dimension_averages': {
+                dim: round(row[column] / extended, 2) if extended else None
+                for dim, column in SUM_COLUMNS.items()
+            },
+        })
+    return report
@@ -0,0 +1,36 @@
+"""Scoring rules for the screening questionnaires.
+
+Shared by the HTML forms and the sync API so both produce identical scores
+and levels. `answers` maps form field names to their submitted values. The
+rules themselves (weights, sub-scales, cut-offs) live in `questionnaires`.
+"""
+
+from questionnaires import QUICK, EXTENDED
+
+QUICK_FIELDS = [q.name for q in QUICK.questions]
+
+# Extended screening: dimension -> the questions summed into it
+EXTENDED_DIMENSIONS = {
+    subscale.column: tuple(q.name for q in subscale.questions)
+    for subscale in EXTENDED.subscales
+}
+
+
+def quick_level(score):
+    return QUICK.level_for(score)
+
+
+def extended_level(score):
+    return EXTENDED.level_for(score)
+
+
+def score_quick(answers):
+    """Return (score, level) for the 10-question screening."""
+    score, level, _ = QUICK.score(answers)
+    return score, level
+
+
+def score_extended(answers):
+    """Return (dimension scores, total, level) for the extended screening."""
+    total, level, dimensions = EXTENDED.score(answers)
+    return dimensions, total, level
@@ -1,4 +1,6 @@
+import trends
 from models import User, Screening, SessionLocal, init_db
+from stats import rebuild_user_stats
 
 if __name__ == '__main__':
     init_db()
@@ -24,5 +26,10 @@ if __name__ == '__main__':
             print('Seeded screening sample data')
         else:
             print('Screening samples already present')
+
+        # The samples bypass record_screening, so bring the summaries up to date
+        rebuild_user_stats(session, demo.id)
+        trends.rebuild(session, demo.id)
+        session.commit()
     finally:
         session.close()
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""Downsampled score series for the history and analytics charts.
+
+A chart a few hundred pixels wide cannot show more than a few hundred points,
+so `/history/series` returns at most `points` per series, whatever the length
+of the history. The user's rows in the requested range are read with one
+column query into NumPy arrays. Each series is then reduced by min/max
+bucketing: the rows are split into points/2 equal runs and the lowest and
+highest value of each run are kept, in time order. Unlike averaging or
+picking every n-th row, this keeps every spike that would be visible at that
+width, which is what matters on a risk chart.
+
+Results are cached per user and request parameters. A cache entry is keyed by
+the user's data version from etags.py (screening count and highest id); a new
+screening changes the version, so stale series are never served.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import select
+
+from models import Screening
+from stats import DIMENSIONS
+
+SERIES = ['score'] + DIMENSIONS
+DEFAULT_POINTS = 500
+MIN_POINTS, MAX_POINTS = 10, 5000
+
+SERIES_CACHE_SIZE = int(os.environ.get('SERIES_CACHE_SIZE', '1000'))  # users
+SERIES_CACHE_VARIANTS = 8  # parameter sets kept per user
+
+
+def fetch(session, user_id, start=None, end=None):
+    """(epoch-ms timestamps, {series: float values with NaN for missing}) in time order."""
+    columns = [getattr(Screening, name) for name in SERIES]
+    query = (select(Screening.created_at, *columns)
+             .where(Screening.user_id == user_id, Screening.created_at.is_not(None))
+             .order_by(Screening.created_at, Screening.id))
+    if start is not None:
+        query = query.where(Screening.created_at >= start)
+    if end is not None:
+        query = query.where(Screening.created_at < end)
+    rows = session.execute(query).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in SERIES}
+    created, *values = zip(*rows)
+    timestamps = np.array(created, dtype='datetime64[ms]').astype(np.int64)
+    return timestamps, {name: np.array(column, dtype=float) for name, column in zip(SERIES, values)}
+
+
+def minmax_downsample(y, points):
+    """Indices of at most `points` samples keeping each bucket's extremes, in order.
+
+    NaNs are ignored; a bucket of only NaNs contributes nothing.
+    """
+    present = np.flatnonzero(~np.isnan(y))
+    if len(present) <= points:
+        return present
+    buckets = max(points // 2, 1)
+    size = -(-len(present) // buckets)  # ceil
+    # Pad to a whole number of equal buckets so all of them reduce at once
+    padded = np.full(buckets * size, np.nan)
+    padded[:len(present)] = y[present]
+    grid = padded.reshape(buckets, size)
+    valid = ~np.isnan(grid).all(axis=1)
+    grid = grid[valid]
+    offsets = np.flatnonzero(valid) * size
+    low = offsets + np.nanargmin(grid, axis=1)
+    high = offsets + np.nanargmax(grid, axis=1)
+    return present[np.unique(np.concatenate([low, high]))]
+
+
+def build(session, user_id, start=None, end=None, points=DEFAULT_POINTS, names=SERIES):
+    timestamps, values = fetch(session, user_id, start, end)
+    series = {}
+    for name in names:
+        keep = minmax_downsample(values[name], points)
+        series[name] = {
+            't': timestamps[keep].tolist(),
+            'v': [round(v, 2) for v in values[name][keep].tolist()],
+        }
+    return {'total': len(timestamps), 'points': points, 'series': series}
+
+
+class SeriesCache:
+    """Thread-safe LRU of users, each holding payloads for one data version."""
+
+    def __init__(self, maxsize=SERIES_CACHE_SIZE, variants=SERIES_CACHE_VARIANTS):
+        self.maxsize = maxsize
+        self.variants = variants
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, version, params, build):
+        """Payload for `params`, calling `build()` unless cached at `version`."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and entry[0] == version and params in entry[1]:
+                self._users.move_to_end(user_id)
+                entry[1].move_to_end(params)
+                self.hits += 1
+                return entry[1][params]
+            self.misses += 1
+
+        payload = build()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or entry[0] != version:
+                entry = self._users[user_id] = (version, OrderedDict())
+            entry[1][params] = payload
+            while len(entry[1]) > self.variants:
+                entry[1].popitem(last=False)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+        return payload
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+series_cache = SeriesCache()
@@ -0,0 +1,198 @@
+"""Per-user screening summaries: the incrementally maintained `user_stats` table
+and the aggregate queries behind the analytics page."""
+
+from sqlalchemy import select, insert, update, delete, func, case, or_
+from sqlalchemy.exc import IntegrityError
+
+from models import Screening, UserStats
+
+
+def record_screening(session, screening):
+    """Fold a newly added screening into its owner's UserStats row.
+
+    Runs inside the caller's transaction so the screening and the summary are
+    committed (or rolled back) together. The UPDATE is computed from the stored
+    row rather than read-modify-write, so concurrent submissions don't lose counts.
+    """
+    session.flush()
+    user_id, score, level, created_at = screening.user_id, screening.score, screening.level, screening.created_at
+
+    # Screenings can arrive out of order (e.g. synced from a device), so only
+    # move the "last" fields forward in time.
+    is_newer = or_(UserStats.last_screening_at.is_(None), UserStats.last_screening_at <= created_at)
+    stmt = (
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            screening_count=UserStats.screening_count + 1,
+            score_sum=UserStats.score_sum + score,
+            score_min=case((UserStats.score_min <= score, UserStats.score_min), else_=score),
+            score_max=case((UserStats.score_max >= score, UserStats.score_max), else_=score),
+            last_score=case((is_newer, score), else_=UserStats.last_score),
+            last_level=case((is_newer, level), else_=UserStats.last_level),
+            last_screening_at=case((is_newer, created_at), else_=UserStats.last_screening_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if session.execute(stmt).rowcount:
+        return
+
+    # First screening for this user. Another request may be creating the row at
+    # the same time; if so fall back to the UPDATE path.
+    try:
+        with session.begin_nested():
+            session.execute(insert(UserStats).values(
+                user_id=user_id,
+                screening_count=1,
+                score_sum=score,
+                score_min=score,
+                score_max=score,
+                last_score=score,
+                last_level=level,
+                last_screening_at=created_at,
+            ))
+    except IntegrityError:
+        session.execute(stmt)
+
+
+def get_user_stats(session, user_id):
+    """Return the UserStats row for a user, or an empty (unsaved) one."""
+    return session.get(UserStats, user_id) or UserStats(user_id=user_id, screening_count=0, score_sum=0)
+
+
+DIMENSIONS = ['stress_score', 'anxiety_score', 'sleep_score', 'depression_score', 'social_score']
+LEVELS = ['Low', 'Moderate', 'High']
+
+
+def analytics_summary(session, user_id):
+    """Aggregate a user's screening history for the analytics page.
+
+    Two queries regardless of history size: one row of totals and
+    per-dimension averages, and a GROUP BY level. Returns None when the user
+    has no screenings. Trends come from trends.user_trends().
+    """
+    totals = session.execute(
+        select(
+            func.count(Screening.id),
+            func.avg(Screening.score),
+            func.min(Screening.score),
+            func.max(Screening.score),
+            func.max(Screening.created_at),
+            *[func.avg(getattr(Screening, dim)) for dim in DIMENSIONS],
+        ).where(Screening.user_id == user_id)
+    ).one()
+    total, avg_score, min_score, max_score, last_at = totals[:5]
+    if not total:
+        return None
+
+    distribution = dict.fromkeys(LEVELS, 0)
+    distribution.update(session.execute(
+        select(Screening.level, func.count(Screening.id))
+        .where(Screening.user_id == user_id)
+        .group_by(Screening.level)
+    ).all())
+
+    return {
+        'total': total,
+        'avg_score': round(avg_score, 2),
+        'min_score': min_score,
+        'max_score': max_score,
+        'last_screening': last_at.strftime('%Y-%m-%d'),
+        'level_distribution': distribution,
+        'dimension_averages': {
+            dim: None if value is None else round(value, 2)
+            for dim, value in zip(DIMENSIONS, totals[5:])
+        },
+    }
+
+
+def _summary_select(user_ids=None):
+    """SELECT producing one freshly aggregated user_stats row per user (all, or `user_ids`)."""
+    totals = select(
+        Screening.user_id,
+        func.count(Screening.id).label('screening_count'),
+        func.sum(Screening.score).label('score_sum'),
+        func.min(Screening.score).label('score_min'),
+        func.max(Screening.score).label('score_max'),
+    ).group_by(Screening.user_id)
+    ranked = select(
+        Screening.user_id,
+        Screening.score,
+        Screening.level,
+        Screening.created_at,
+        func.row_number().over(
+            partition_by=Screening.user_id,
+            order_by=(Screening.created_at.desc(), Screening.id.desc()),
+        ).label('rn'),
+    )
+    if user_ids is not None:
+        totals = totals.where(Screening.user_id.in_(user_ids))
+        ranked = ranked.where(Screening.user_id.in_(user_ids))
+    totals = totals.subquery()
+    ranked = ranked.subquery()
+
+    return select(
+        totals.c.user_id,
+        totals.c.screening_count,
+        totals.c.score_sum,
+        totals.c.score_min,
+        totals.c.score_max,
+        ranked.c.score,
+        ranked.c.level,
+        ranked.c.created_at,
+    ).join_from(totals, ranked, (ranked.c.user_id == totals.c.user_id) & (ranked.c.rn == 1))
+
+
+SUMMARY_COLUMNS = [
+    'user_id', 'screening_count', 'score_sum', 'score_min', 'score_max',
+    'last_score', 'last_level', 'last_screening_at',
+]
+
+
+# Users per statement when rebuilding a given set of users
+REBUILD_BATCH_SIZE = 500
+
+
+def user_id_batches(user_id):
+    """[None] for all users, else lists of ids from one id or a collection of them."""
+    if user_id is None:
+        return [None]
+    ids = [user_id] if isinstance(user_id, int) else sorted(set(user_id))
+    return [ids[i:i + REBUILD_BATCH_SIZE] for i in range(0, len(ids), REBUILD_BATCH_SIZE)]
+
+
+def rebuild_user_stats(session, user_id=None):
+    """Recompute user_stats from the screenings table.
+
+    `user_id` is one id, a collection of ids, or None for all users. Returns
+    the number of summary rows written. The caller commits.
+    """
+    session.flush()
+    written = 0
+    for ids in user_id_batches(user_id):
+        clear = delete(UserStats)
+        if ids is not None:
+            clear = clear.where(UserStats.user_id.in_(ids))
+        session.execute(clear)
+        result = session.execute(insert(UserStats).from_select(SUMMARY_COLUMNS, _summary_select(ids)))
+        written += result.rowcount
+    return written
+
+
+def check_user_stats(session):
+    """Compare stored summaries with a fresh aggregate.
+
+    Returns a list of user ids whose stored row is missing, stale or orphaned.
+    """
+    session.flush()
+    stored = {
+        row[0]: tuple(row)
+        for row in session.execute(select(*[getattr(UserStats, c) for c in SUMMARY_COLUMNS]))
+    }
+    drifted = []
+    for row in session.execute(_summary_select()):
+        if stored.pop(row[0], None) != tuple(row):
+            drifted.append(row[0])
+    # Rows left over belong to users that no longer have any screenings
+    drifted.extend(uid for uid, row in stored.items() if row[1])
+    return sorted(drifted)
@@ -0,0 +1,213 @@
+"""Offline sync: batched uploads from the companion app.
+
+The client sends a JSON array (optionally gzip-compressed, with
+``Content-Encoding: gzip``) of items collected while offline::
+
+    [{"type": "screening", "uuid": "…", "created_at": "2026-05-01T08:30:00",
+      "data": {"q1": "2", …, "q10": "0"}},
+     {"type": "extended_screening", "uuid": "…", "data": {"stress_q1": "1", …, "notes": "…"}},
+     {"type": "coping_log", "uuid": "…", "data": {"strategy": "Walk", "effectiveness": "4"}}]
+
+Each item is validated with the same WTForms class as the matching HTML form
+and scored by `scoring`. Items whose UUID was already uploaded are reported
+as duplicates, so a client can safely retry a batch. Everything valid is
+written in the caller's transaction with one multi-row INSERT per table.
+"""
+
+import json
+import os
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, insert
+from werkzeug.datastructures import MultiDict
+
+from forms import ScreeningForm, ExtendedScreeningForm, CopingLogForm
+from models import Screening, CopingLog
+from recommendations import recommend_many
+from questionnaires import QUICK, EXTENDED
+from scoring import EXTENDED_DIMENSIONS, score_quick, score_extended
+from stats import rebuild_user_stats
+import trends
+
+MAX_ITEMS = int(os.environ.get('SYNC_MAX_ITEMS', '1000'))
+# Limit on the decompressed body, so a small gzip bomb can't exhaust memory
+MAX_BYTES = int(os.environ.get('SYNC_MAX_BYTES', str(5 * 1024 * 1024)))
+# Tolerated clock skew for client timestamps
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+ITEM_TYPES = {
+    'screening': (ScreeningForm, Screening),
+    'extended_screening': (ExtendedScreeningForm, Screening),
+    'coping_log': (CopingLogForm, CopingLog),
+}
+
+
+class SyncError(Exception):
+    """The request body as a whole was rejected."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def read_payload(request):
+    """Decode the request body into a list of item dicts."""
+    raw = request.get_data(cache=False)
+    if len(raw) > MAX_BYTES:
+        raise SyncError('payload too large', 413)
+
+    encoding = request.headers.get('Content-Encoding', '').strip().lower()
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            raw = decompressor.decompress(raw, MAX_BYTES + 1)
+        except zlib.error:
+            raise SyncError('invalid gzip body')
+        if len(raw) > MAX_BYTES or decompressor.unconsumed_tail:
+            raise SyncError('payload too large', 413)
+    elif encoding not in ('', 'identity'):
+        raise SyncError(f'unsupported content encoding: {encoding}', 415)
+
+    try:
+        items = json.loads(raw)
+    except ValueError:
+        raise SyncError('body is not valid JSON')
+    if not isinstance(items, list):
+        raise SyncError('body must be a JSON array')
+    if len(items) > MAX_ITEMS:
+        raise SyncError(f'at most {MAX_ITEMS} items per batch', 413)
+    return items
+
+
+def _parse_timestamp(value, now):
+    if value is None:
+        return now
+    created_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if created_at.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if created_at > now + MAX_CLOCK_SKEW:
+        raise ValueError('timestamp is in the future')
+    return created_at
+
+
+def _validate(item, now):
+    """Return (type, uuid, created_at, form data) or raise ValueError with field errors."""
+    if not isinstance(item, dict):
+        raise ValueError({'item': ['must be an object']})
+    kind = item.get('type')
+    if kind not in ITEM_TYPES:
+        raise ValueError({'type': [f'must be one of {", ".join(ITEM_TYPES)}']})
+    try:
+        client_uuid = str(uuid.UUID(str(item.get('uuid'))))
+    except ValueError:
+        raise ValueError({'uuid': ['must be a UUID']})
+    try:
+        created_at = _parse_timestamp(item.get('created_at'), now)
+    except ValueError as e:
+        raise ValueError({'created_at': [str(e)]})
+
+    data = item.get('data')
+    if not isinstance(data, dict):
+        raise ValueError({'data': ['must be an object']})
+    form_class = ITEM_TYPES[kind][0]
+    form = form_class(
+        formdata=MultiDict({k: str(v) for k, v in data.items() if v is not None}),
+        meta={'csrf': False},
+    )
+    if not form.validate():
+        raise ValueError(form.errors)
+    return kind, client_uuid, created_at, form.data
+
+
+def _existing_uuids(session, model, user_id, uuids):
+    found = set()
+    uuids = list(uuids)
+    for start in range(0, len(uuids), LOOKUP_CHUNK):
+        found.update(session.execute(
+            select(model.client_uuid)
+            .where(model.user_id == user_id, model.client_uuid.in_(uuids[start:start + LOOKUP_CHUNK]))
+        ).scalars())
+    return found
+
+
+def _row(kind, user_id, client_uuid, created_at, data):
+    """Column values for one validated item."""
+    row = {'user_id': user_id, 'client_uuid': client_uuid, 'created_at': created_at}
+    if kind == 'coping_log':
+        row.update(
+            strategy=data['strategy'],
+            description=data['description'],
+            effectiveness=int(data['effectiveness']) if data['effectiveness'] else None,
+        )
+    elif kind == 'screening':
+        row['score'], row['level'] = score_quick(data)
+        # Same column set as extended rows, so one executemany covers both
+        row.update(dict.fromkeys(EXTENDED_DIMENSIONS), notes=None, **QUICK.stamp())
+    else:
+        dimensions, row['score'], row['level'] = score_extended(data)
+        row.update(dimensions, notes=data['notes'], **EXTENDED.stamp())
+    return row
+
+
+def apply_batch(session, user_id, items):
+    """Validate, dedupe and stage a batch for `user_id`. The caller commits.
+
+    Returns a summary with one result per item, in request order.
+    """
+    now = datetime.utcnow()
+    results = []
+    accepted = []
+    seen = set()
+    for index, item in enumerate(items):
+        result = {'index': index, 'uuid': item.get('uuid') if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            kind, client_uuid, created_at, data = _validate(item, now)
+        except ValueError as e:
+            result.update(status='invalid', errors=e.args[0])
+            continue
+        result['uuid'] = client_uuid
+        if client_uuid in seen:
+            result['status'] = 'duplicate'
+            continue
+        seen.add(client_uuid)
+        accepted.append((result, kind, client_uuid, created_at, data))
+
+    by_model = {}
+    for _, kind, client_uuid, _, _ in accepted:
+        by_model.setdefault(ITEM_TYPES[kind][1], set()).add(client_uuid)
+    uploaded = set()
+    for model, uuids in by_model.items():
+        uploaded |= _existing_uuids(session, model, user_id, uuids)
+
+    rows = {Screening: [], CopingLog: []}
+    for result, kind, client_uuid, created_at, data in accepted:
+        if client_uuid in uploaded:
+            result['status'] = 'duplicate'
+            continue
+        result['status'] = 'created'
+        rows[ITEM_TYPES[kind][1]].append(_row(kind, user_id, client_uuid, created_at, data))
+
+    # One multi-row INSERT per table
+    if rows[CopingLog]:
+        session.execute(insert(CopingLog), rows[CopingLog])
+    if rows[Screening]:
+        created = session.execute(insert(Screening).returning(Screening.id, Screening.level), rows[Screening]).all()
+        recommend_many(session, created)
+        # One INSERT ... SELECT instead of a summary UPDATE per screening;
+        # also correct when offline screenings arrive out of order.
+        rebuild_user_stats(session, user_id)
+        trends.rebuild(session, user_id)
+
+    statuses = [r['status'] for r in results]
+    return {
+        'created': statuses.count('created'),
+        'duplicates': statuses.count('duplicate'),
+        'invalid': statuses.count('invalid'),
+        'items': results,
+    }
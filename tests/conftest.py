@@ -0,0 +1,14 @@
+import metrics
+import query_budgets
+from sqlalchemy.engine import Engine
+
+# Tests swap in their own engines; count statements on all of them so query
+# budgets are enforced (app.testing makes an overrun raise)
+metrics.instrument_engine(Engine)
+
+
+def pytest_terminal_summary(terminalreporter):
+    rows = query_budgets.report()
+    if rows:
+        terminalreporter.write_sep('-', 'SQL statements per endpoint')
+        terminalreporter.write_line(query_budgets.format_report(rows))
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening
+from stats import record_screening
+from admin_users import user_directory, directory_totals
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    start = datetime(2026, 1, 1)
+    for i in range(30):
+        u = User(username=f'user{i:02d}', email=f'u{i:02d}@example.com' if i % 2 else None,
+                 password='x', created_at=start + timedelta(days=i))
+        session.add(u)
+    session.add(User(username='Alice', email='ALICE@Example.com', password='x', created_at=start))
+    session.flush()
+    for i in range(3):
+        s = Screening(user_id=2, score=i, level='Low', created_at=start + timedelta(days=40 + i))
+        session.add(s)
+        record_screening(session, s)
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_directory_paginates(session):
+    """Test the directory returns numbered pages newest-joined first"""
+    page = user_directory(session, per_page=10)
+    assert page.total == 31
+    assert page.pages == 4
+    assert [row[0].username for row in page.items][:2] == ['user29', 'user28']
+    last = user_directory(session, page=99, per_page=10)
+    assert last.page == 4 and len(last.items) == 1 and not last.has_next
+
+
+def test_directory_prefix_search_is_case_insensitive(session):
+    """Test prefix search matches username or email regardless of case"""
+    assert [r[0].username for r in user_directory(session, 'ali').items] == ['Alice']
+    assert [r[0].username for r in user_directory(session, 'alice@ex').items] == ['Alice']
+    assert [r[0].username for r in user_directory(session, 'USER1', sort='username', direction='asc').items] == [
+        f'user{i}' for i in range(10, 20)]
+    assert user_directory(session, 'lice').total == 0
+
+
+def test_directory_prefix_search_covers_all_code_points(session):
+    """Test names continuing with a character above U+FFFF still match the prefix"""
+    session.add_all([User(username='ali\U0001F600', password='x'), User(username='alj', password='x')])
+    session.commit()
+    assert sorted(r[0].username for r in user_directory(session, 'ali').items) == ['Alice', 'ali\U0001F600']
+    assert [r[0].username for r in user_directory(session, '\U0010FFFF').items] == []
+
+
+def test_directory_screening_aggregates(session):
+    """Test counts and last activity come from the per-user summary"""
+    page = user_directory(session, sort='screenings')
+    user, count, last_activity = page.items[0]
+    assert (user.id, count, last_activity) == (2, 3, datetime(2026, 2, 12))
+    assert page.items[1].screening_count == 0
+    assert directory_totals(session) == (31, 3)
+
+
+def test_directory_query_count(session):
+    """Test a page costs a count and a single joined select"""
+    engine = session.get_bind()
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    page = user_directory(session, per_page=25)
+    [(u.username, u.email, u.is_admin()) for u, _, _ in page.items]
+    event.remove(engine, 'before_cursor_execute', count)
+    assert len(statements) == 2
+
+
+def test_search_uses_expression_index(session):
+    """Test the prefix range is served by the lower(username) index"""
+    stmt = select(User.id).where((func.lower(User.username) >= 'user1') & (func.lower(User.username) < 'user1\uffff'))
+    sql = str(stmt.compile(compile_kwargs={'literal_binds': True}))
+    plan = ' '.join(str(row) for row in session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+    assert 'ix_users_username_lower' in plan
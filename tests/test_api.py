@@ -0,0 +1,111 @@
+import pytest
+from app import app
+import models
+from models import Screening, CopingLog
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'apiuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'apiuser', 'password': 'pass123'})
+        client.engine = engine
+        yield client
+
+
+def add(*rows):
+    session = models.SessionLocal()
+    session.add_all(rows)
+    session.commit()
+    session.close()
+
+
+def screenings(n, start=datetime(2026, 1, 1)):
+    return [Screening(user_id=1, score=i % 20, level='Low', created_at=start + timedelta(days=i)) for i in range(n)]
+
+
+def test_api_requires_login():
+    """Test anonymous API calls get a JSON 401"""
+    app.config['TESTING'] = True
+    with app.test_client() as anonymous:
+        for url in ('/api/screenings', '/api/coping-logs', '/api/stats'):
+            assert anonymous.get(url).status_code == 401
+
+
+def test_screenings_page_and_etag(client):
+    """Test screenings are paged newest first with a strong ETag"""
+    add(*screenings(30))
+    rv = client.get('/api/screenings?limit=10')
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert [item['score'] for item in body['items']][:3] == [9, 8, 7]
+    assert body['older_cursor'] and body['newer_cursor'] is None
+    etag, weak = rv.get_etag()
+    assert etag and not weak
+    assert rv.headers['Cache-Control'] == 'private, no-cache'
+
+    older = client.get(f'/api/screenings?limit=10&before={body["older_cursor"]}')
+    assert older.get_etag()[0] != etag
+    assert older.get_json()['items'][0]['created_at'] == '2026-01-20T00:00:00'
+
+
+def test_not_modified_without_loading_rows(client):
+    """Test a matching If-None-Match is answered 304 after one version query"""
+    add(*screenings(5))
+    etag = client.get('/api/screenings').get_etag()[0]
+    statements = []
+
+    @event.listens_for(client.engine, 'before_cursor_execute')
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    rv = client.get('/api/screenings', headers={'If-None-Match': f'"{etag}"'})
+    event.remove(client.engine, 'before_cursor_execute', capture)
+    assert rv.status_code == 304
+    assert rv.get_etag()[0] == etag
+    assert rv.data == b''
+    selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) == 1 and 'count' in selects[0].lower()
+
+
+def test_etag_changes_with_new_data(client):
+    """Test new rows produce a new tag for the affected endpoints only"""
+    add(*screenings(2))
+    screenings_tag = client.get('/api/screenings').get_etag()[0]
+    stats_tag = client.get('/api/stats').get_etag()[0]
+    logs_tag = client.get('/api/coping-logs').get_etag()[0]
+
+    add(CopingLog(user_id=1, strategy='Walk'))
+    assert client.get('/api/screenings', headers={'If-None-Match': f'"{screenings_tag}"'}).status_code == 304
+    assert client.get('/api/coping-logs', headers={'If-None-Match': f'"{logs_tag}"'}).status_code == 200
+    rv = client.get('/api/stats', headers={'If-None-Match': f'"{stats_tag}"'})
+    assert rv.status_code == 200
+    assert rv.get_json()['coping_log_count'] == 1
+
+    add(*screenings(1, datetime(2026, 6, 1)))
+    assert client.get('/api/screenings', headers={'If-None-Match': f'"{screenings_tag}"'}).status_code == 200
+
+
+def test_stats_payload(client):
+    """Test the stats endpoint returns the analytics summary"""
+    assert client.get('/api/stats').get_json() == {'screenings': None, 'coping_log_count': 0}
+    add(*screenings(3))
+    stats = client.get('/api/stats').get_json()['screenings']
+    assert stats['total'] == 3 and stats['max_score'] == 2
+
+
+def test_chart_data_conditional(client):
+    """Test the history chart revalidates with its ETag"""
+    add(*screenings(3))
+    rv = client.get('/history/chart-data')
+    assert len(rv.get_json()) == 3
+    assert client.get('/history/chart-data', headers={'If-None-Match': rv.headers['ETag']}).status_code == 304
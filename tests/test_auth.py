@@ -57,7 +57,7 @@ def test_duplicate_username(client):
     """Test registration with duplicate username"""
     client.post('/register', data={'username': 'testuser', 'password': 'test123', 'confirm_password': 'test123'})
     
-    rv = client.post('/register', data={'username': 'testuser', 'password': 'other', 'confirm_password': 'other'}, follow_redirects=True)
+    rv = client.post('/register', data={'username': 'testuser', 'password': 'other123', 'confirm_password': 'other123'}, follow_redirects=True)
     assert b'Username already taken' in rv.data
 
 
@@ -174,3 +174,47 @@ def test_logout(client):
     # Try accessing dashboard (should redirect)
     rv = client.get('/dashboard')
     assert rv.status_code == 302
+
+
+def test_login_is_case_insensitive(client):
+    """Test login accepts the username or email in any case"""
+    client.post('/register', data={'username': 'CaseUser', 'email': 'case@example.com', 'password': 'pass123', 'confirm_password': 'pass123'})
+    rv = client.post('/login', data={'username': 'caseuser', 'password': 'pass123'}, follow_redirects=True)
+    assert b'Logged in successfully' in rv.data
+    client.get('/logout')
+    rv = client.post('/login', data={'username': 'CASE@example.com', 'password': 'pass123'}, follow_redirects=True)
+    assert b'Logged in successfully' in rv.data
+
+
+def test_register_rejects_case_variant_username(client):
+    """Test usernames differing only in case are treated as taken"""
+    client.post('/register', data={'username': 'Taken', 'password': 'pass123', 'confirm_password': 'pass123'})
+    rv = client.post('/register', data={'username': 'taken', 'password': 'pass123', 'confirm_password': 'pass123'}, follow_redirects=True)
+    assert b'Username already taken' in rv.data
+
+
+def test_edit_profile_rejects_case_variant_username(client):
+    """Test renaming to another user's name in a different case is refused, but re-casing your own is not"""
+    client.post('/register', data={'username': 'alice', 'password': 'pass123', 'confirm_password': 'pass123'})
+    client.post('/register', data={'username': 'bob', 'password': 'pass123', 'confirm_password': 'pass123'})
+    client.post('/login', data={'username': 'bob', 'password': 'pass123'})
+    rv = client.post('/profile/edit', data={'username': 'Alice'}, follow_redirects=True)
+    assert b'Username already taken' in rv.data
+    rv = client.post('/profile/edit', data={'username': 'Bob'}, follow_redirects=True)
+    assert b'Profile updated successfully' in rv.data
+
+
+def test_login_upgrades_outdated_hash(client, monkeypatch):
+    """Test a hash made under an old policy is replaced on successful login"""
+    import passwords
+    session = models.SessionLocal()
+    user = models.User(username='legacy', password=passwords.hash_password('pass123', 'pbkdf2:sha256:1000'))
+    session.add(user)
+    session.commit()
+    monkeypatch.setattr(passwords, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+
+    rv = client.post('/login', data={'username': 'legacy', 'password': 'pass123'}, follow_redirects=True)
+    assert b'Logged in successfully' in rv.data
+    session.expire_all()
+    assert session.query(models.User).filter_by(username='legacy').one().password.startswith('pbkdf2:sha256:2000$')
+    session.close()
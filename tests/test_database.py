@@ -0,0 +1,106 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import models
+import database
+from models import Base, User, create_db_engine
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(models, 'SessionLocal', sessionmaker(bind=engine))
+
+    app = Flask(__name__)
+    database.init_app(app)
+
+    @app.route('/add/<name>', methods=['POST'])
+    def add(name):
+        database.get_db(write=True).add(User(username=name, password='x'))
+        if name == 'boom':
+            raise RuntimeError('fail after write')
+        return 'ok'
+
+    return app
+
+
+def usernames():
+    session = models.SessionLocal()
+    try:
+        return [u.username for u in session.query(User).order_by(User.id)]
+    finally:
+        session.close()
+
+
+def test_request_session_commits_on_teardown(flask_app):
+    """Test pending changes are committed when the request succeeds"""
+    assert flask_app.test_client().post('/add/alice').status_code == 200
+    assert usernames() == ['alice']
+
+
+def test_request_session_rolls_back_on_error(flask_app):
+    """Test pending changes are discarded when the view raises"""
+    flask_app.config['PROPAGATE_EXCEPTIONS'] = False
+    assert flask_app.test_client().post('/add/boom').status_code == 500
+    assert usernames() == []
+
+
+def test_same_session_within_request(flask_app):
+    """Test get_db returns one session per request"""
+    with flask_app.test_request_context('/'):
+        assert database.get_db() is database.get_db()
+
+
+def test_sqlite_engine_pragmas(tmp_path):
+    """Test file-backed SQLite engines enable WAL, NORMAL sync and a busy timeout"""
+    engine = create_db_engine(f'sqlite:///{tmp_path / "pragmas.db"}')
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar().lower() == 'wal'
+        assert conn.exec_driver_sql('PRAGMA synchronous').scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql('PRAGMA busy_timeout').scalar() == models.SQLITE_BUSY_TIMEOUT
+    engine.dispose()
+
+
+def test_create_app_builds_isolated_apps(tmp_path):
+    """Test each app from the factory has every route and, given DATABASE_URL, its own database"""
+    from app import create_app
+    apps = [create_app({'TESTING': True, 'WTF_CSRF_ENABLED': False, 'DATABASE_URL': f'sqlite:///{tmp_path}/{n}.db'})
+            for n in ('one', 'two')]
+    for flask_app in apps:
+        Base.metadata.create_all(database.engine_for(flask_app))
+    assert 'main.dashboard' in apps[0].view_functions
+    assert apps[0].login_manager is not apps[1].login_manager
+
+    with apps[0].test_client() as client:
+        client.post('/register', data={'username': 'onlyone', 'password': 'pass123', 'confirm_password': 'pass123'})
+        assert client.post('/login', data={'username': 'onlyone', 'password': 'pass123'}).status_code == 302
+        assert client.get('/dashboard').status_code == 200
+    counts = [database.sessionmaker_for(a)().query(User).count() for a in apps]
+    assert counts == [1, 0]
+
+
+def test_migrations_use_the_app_database(tmp_path):
+    """Test `db upgrade` builds the schema in the app's DATABASE_URL, not the default database"""
+    from flask_migrate import upgrade
+    from sqlalchemy import inspect
+    from app import create_app
+    flask_app = create_app({'DATABASE_URL': f'sqlite:///{tmp_path}/migrated.db'})
+    with flask_app.app_context():
+        upgrade()
+    assert 'users' in inspect(database.engine_for(flask_app)).get_table_names()
+
+
+def test_migrations_upgrade_a_create_all_database(tmp_path):
+    """Test `db upgrade` succeeds on a schema built by create_all (init_db(), seed.py)"""
+    from flask_migrate import upgrade
+    from app import create_app
+    flask_app = create_app({'DATABASE_URL': f'sqlite:///{tmp_path}/created.db'})
+    engine = database.engine_for(flask_app)
+    Base.metadata.create_all(engine)
+    with flask_app.app_context():
+        upgrade()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT version_num FROM alembic_version').scalar()
+        indexes = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars().all()
+    assert {'ix_users_username_lower', 'ix_users_email_lower'} <= set(indexes)
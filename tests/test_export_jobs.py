@@ -0,0 +1,162 @@
+import csv
+import gzip
+import io
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from app import app
+import models
+from models import User, Screening, ExportJob, Job
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import jobs
+import export_jobs
+from identity import identity_cache
+from stats import rebuild_user_stats
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Jobs are run explicitly below, not by a worker another test started
+    jobs.worker.stop(timeout=5)
+    # A file database, so jobs run in their own sessions see the same data
+    engine = create_engine(f'sqlite:///{tmp_path}/exports.db')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    monkeypatch.setattr(export_jobs, 'EXPORT_DIR', str(tmp_path / 'exports'))
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'exporter', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'exporter', 'password': 'pass123'})
+        session = models.SessionLocal()
+        other = User(username='someone', password='x')
+        session.add(other)
+        session.flush()
+        for i in range(50):
+            session.add(Screening(user_id=1, score=i % 20, level='Low', created_at=datetime(2026, 1, 1) + timedelta(days=i)))
+        session.add(Screening(user_id=other.id, score=7, level='Low', created_at=datetime(2026, 1, 1)))
+        rebuild_user_stats(session)
+        session.commit()
+        session.close()
+        yield client
+    engine.dispose()
+
+
+def drain():
+    session = models.SessionLocal()
+    try:
+        return jobs.drain(session)
+    finally:
+        session.close()
+
+
+def request_export(client, **data):
+    return client.post('/exports', data={'dataset': 'screenings', 'format': 'csv', **data})
+
+
+def test_export_is_built_in_the_background(client):
+    """Test requesting returns at once; the gzip artifact appears after the job runs"""
+    rv = request_export(client)
+    assert rv.status_code == 302
+    assert client.get('/exports/1').get_json()['status'] == 'pending'
+    # Asking again while it is pending reuses the same export
+    request_export(client)
+    session = models.SessionLocal()
+    assert session.query(ExportJob).count() == 1
+    session.close()
+
+    assert drain() == (1, 0)
+    status = client.get('/exports/1').get_json()
+    assert status['status'] == 'ready' and status['filename'].endswith('.csv.gz')
+
+    rv = client.get('/exports/1/download')
+    assert rv.status_code == 200 and rv.mimetype == 'application/gzip'
+    rows = list(csv.reader(io.StringIO(gzip.decompress(rv.data).decode())))
+    assert rows[0][:3] == ['Date', 'Score', 'Level'] and len(rows) == 51
+    assert status['size'] == len(rv.data)
+    assert b'Preparing' not in client.get('/exports').data
+
+
+def test_download_supports_ranges_and_etags(client):
+    request_export(client)
+    drain()
+    full = client.get('/exports/1/download')
+    part = client.get('/exports/1/download', headers={'Range': 'bytes=10-19'})
+    assert part.status_code == 206 and part.data == full.data[10:20]
+    assert part.headers['Content-Range'] == f'bytes 10-19/{len(full.data)}'
+    assert client.get('/exports/1/download', headers={'If-None-Match': full.headers['ETag']}).status_code == 304
+
+
+def test_population_export_requires_admin(client):
+    """Test only admins can export every user's data, which carries a User column"""
+    assert request_export(client, dataset='all', population='y').status_code == 403
+    session = models.SessionLocal()
+    session.get(User, 1).role = 'admin'
+    session.commit()
+    session.close()
+    identity_cache.invalidate(1)
+
+    request_export(client, dataset='all', format='jsonl', population='y')
+    drain()
+    rv = client.get('/exports/1/download')
+    assert rv.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(rv.data)) as archive:
+        lines = archive.read('screenings.jsonl').decode().splitlines()
+    assert len(lines) == 51
+    assert sum('"user_id": 2' in line for line in lines) == 1
+
+
+def test_population_export_rechecks_demoted_admin(client):
+    """Test an admin demoted by another worker can't export everyone's data on a stale cached identity"""
+    session = models.SessionLocal()
+    session.get(User, 1).role = 'admin'
+    session.commit()
+    identity_cache.invalidate(1)
+    client.get('/exports')  # caches the admin identity
+    session.get(User, 1).role = 'user'  # changed elsewhere; this process's cache isn't told
+    session.commit()
+    session.close()
+
+    assert request_export(client, dataset='all', population='y').status_code == 403
+    assert models.SessionLocal().query(ExportJob).count() == 0
+
+
+def test_exports_are_private_and_expire(client, monkeypatch):
+    request_export(client)
+    drain()
+    session = models.SessionLocal()
+    export = session.get(ExportJob, 1)
+    path = export.path
+    # Someone else's export is invisible
+    export.user_id = 2
+    session.commit()
+    assert client.get('/exports/1').status_code == 404
+    assert client.get('/exports/1/download').status_code == 404
+    export.user_id = 1
+    session.commit()
+
+    # The expiry job is queued for EXPORT_TTL_HOURS later; run it now
+    expire = session.query(Job).filter_by(kind='expire_export').one()
+    assert expire.run_at > datetime.utcnow() + timedelta(hours=export_jobs.EXPORT_TTL_HOURS - 1)
+    expire.run_at = datetime.utcnow()
+    session.commit()
+    session.close()
+    assert drain() == (1, 0)
+    assert client.get('/exports/1').get_json()['status'] == 'expired'
+    assert client.get('/exports/1/download').status_code == 410
+    assert not os.path.exists(path)
+
+
+def test_large_history_export_goes_to_background(client, monkeypatch):
+    """Test /export-data hands long histories to an export job instead of streaming"""
+    monkeypatch.setattr(export_jobs, 'EXPORT_SYNC_MAX_ROWS', 10)
+    rv = client.get('/export-data?dataset=all')
+    assert rv.status_code == 302 and rv.location.endswith('/exports')
+    assert client.get('/exports/1').get_json()['dataset'] == 'all'
+    monkeypatch.setattr(export_jobs, 'EXPORT_SYNC_MAX_ROWS', 1000)
+    assert client.get('/export-data').mimetype == 'text/csv'
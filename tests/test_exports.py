@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import zipfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, CopingLog, RecommendationTemplate, ScreeningRecommendation
+import exports
+from exports import stream_dataset, stream_bundle
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def user_id(session_factory):
+    session = session_factory()
+    u = User(username='exporter')
+    u.set_password('pw')
+    other = User(username='someone')
+    other.set_password('pw')
+    session.add_all([u, other])
+    session.commit()
+    start = datetime(2026, 1, 1, 9, 30)
+    for i in range(1200):
+        session.add(Screening(user_id=u.id, score=i % 20, level='Low', stress_score=0,
+                              notes='a, "quoted" note' if i == 0 else None,
+                              created_at=start + timedelta(hours=i)))
+    session.add(Screening(user_id=other.id, score=1, level='Low'))
+    session.add(CopingLog(user_id=u.id, strategy='Walk', effectiveness=4, created_at=start))
+    session.commit()
+    template = RecommendationTemplate(level='Low', category='coping', title='Breathe', description='Box breathing')
+    session.add(template)
+    session.flush()
+    session.add(ScreeningRecommendation(screening_id=1, template_id=template.id))
+    session.commit()
+    uid = u.id
+    session.close()
+    return uid
+
+
+def test_screenings_csv_stream(session_factory, user_id, monkeypatch):
+    """Test the CSV stream keeps the export layout and only the user's rows"""
+    monkeypatch.setattr(exports, 'FLUSH_BYTES', 4096)
+    chunks = list(stream_dataset(session_factory(), user_id))
+    assert len(chunks) > 1  # streamed in pieces, not built in one buffer
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == ['Date', 'Score', 'Level', 'Stress', 'Anxiety', 'Sleep', 'Depression', 'Social', 'Notes']
+    assert len(rows) == 1201
+    assert rows[1] == ['2026-01-01 09:30', '0', 'Low', '0', '', '', '', '', 'a, "quoted" note']
+
+
+def test_coping_logs_jsonl_stream(session_factory, user_id):
+    """Test JSON lines output for coping logs"""
+    lines = b''.join(stream_dataset(session_factory(), user_id, 'coping_logs', 'jsonl')).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'date': '2026-01-01T09:30:00', 'strategy': 'Walk', 'description': None, 'effectiveness': 4}
+    ]
+
+
+def test_zip_bundle(session_factory, user_id):
+    """Test the streamed ZIP contains every dataset"""
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_bundle(session_factory(), user_id))))
+    assert archive.testzip() is None
+    assert archive.namelist() == ['screenings.csv', 'coping_logs.csv', 'recommendations.csv']
+    assert len(archive.read('screenings.csv').splitlines()) == 1201
+    recommendations = list(csv.reader(io.StringIO(archive.read('recommendations.csv').decode())))
+    assert recommendations[1][2:5] == ['coping', 'Breathe', 'Box breathing']
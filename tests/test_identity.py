@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, User
+from identity import IdentityCache
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    for name in ('ada', 'ben', 'cy'):
+        u = User(username=name, role='admin' if name == 'ada' else 'user')
+        u.set_password('pw')
+        session.add(u)
+    session.commit()
+    session.close()
+    return Session
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cached_identity_fields(session_factory):
+    """Test the cached identity exposes what templates and views use"""
+    cache = IdentityCache()
+    user = cache.get(1, session_factory)
+    assert user.id == 1
+    assert user.username == 'ada'
+    assert user.is_admin()
+    assert user.is_authenticated
+    assert user.get_id() == '1'
+    assert user.created_at is not None
+    assert cache.get(999, session_factory) is None
+
+
+def test_hits_misses_and_ttl(session_factory):
+    """Test repeat lookups hit the cache until the entry expires"""
+    clock = FakeClock()
+    cache = IdentityCache(ttl=30, clock=clock)
+    cache.get(2, session_factory)
+    cache.get(2, session_factory)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    clock.now = 31
+    cache.get(2, session_factory)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats()['hit_ratio'] == pytest.approx(1 / 3, abs=1e-4)
+
+
+def test_invalidate_reflects_role_change(session_factory):
+    """Test invalidation makes a role change visible on the next lookup"""
+    cache = IdentityCache()
+    assert not cache.get(2, session_factory).is_admin()
+
+    session = session_factory()
+    session.get(User, 2).role = 'admin'
+    session.commit()
+    session.close()
+
+    assert not cache.get(2, session_factory).is_admin()  # still cached
+    cache.invalidate(2)
+    assert cache.get(2, session_factory).is_admin()
+
+
+def test_bounded_size_evicts_least_recent(session_factory):
+    """Test the cache never grows beyond maxsize"""
+    cache = IdentityCache(maxsize=2)
+    cache.get(1, session_factory)
+    cache.get(2, session_factory)
+    cache.get(1, session_factory)  # 1 is now most recent
+    cache.get(3, session_factory)  # evicts 2
+
+    stats = cache.stats()
+    assert stats['size'] == 2
+    assert stats['evictions'] == 1
+    cache.get(1, session_factory)
+    assert cache.hits == 2
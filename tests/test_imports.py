@@ -0,0 +1,129 @@
+import csv
+import io
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, UserStats, Job
+import exports
+import imports
+from imports import import_screenings, ImportFileError
+from datetime import datetime
+
+HEADER = 'Username,Date,Score,Level,Stress,Anxiety,Sleep,Depression,Social,Notes\n'
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([User(username='Clinic1', password='x'), User(username='clinic2', password='x')])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_import_valid_rows(session):
+    """Test rows in export layout are imported and summaries rebuilt"""
+    data = HEADER + (
+        'clinic1,2025-01-02 09:30,12,Moderate,,,,,,"first, visit"\n'
+        'Clinic1,2025-02-02 10:00,4,Low,1,1,0,1,1,\n'
+        'clinic2,2025-03-01,20,High,,,,,,\n'
+    )
+    report = import_screenings(session, io.StringIO(data))
+    assert (report.rows, report.imported, report.error_count) == (3, 3, 0)
+    rows = session.query(Screening).order_by(Screening.created_at).all()
+    assert [(s.user_id, s.score, s.level) for s in rows] == [(1, 12, 'Moderate'), (1, 4, 'Low'), (2, 20, 'High')]
+    assert rows[0].notes == 'first, visit'
+    assert rows[1].stress_score == 1 and rows[0].stress_score is None
+    stats = session.get(UserStats, 1)
+    assert (stats.screening_count, stats.last_score, stats.last_screening_at) == (2, 4, datetime(2025, 2, 2, 10, 0))
+
+
+def test_import_reports_row_errors(session):
+    """Test invalid rows are skipped with line numbers, valid rows still land"""
+    data = HEADER + (
+        'clinic1,not a date,3,Low,,,,,,\n'
+        'clinic1,2025-01-01 08:00,-1,Low,,,,,,\n'
+        'clinic1,2025-01-01 08:00,3,Severe,,,,,,\n'
+        'nobody,2025-01-01 08:00,3,Low,,,,,,\n'
+        ',2025-01-01 08:00,3,Low,,,,,,\n'
+        'clinic1,2025-01-01 08:00,3,Low,x,,,,,\n'
+        'clinic2,2025-01-01 08:00,3,Low,,,,,,\n'
+    )
+    report = import_screenings(session, io.StringIO(data), chunk_size=3)
+    assert (report.rows, report.imported, report.error_count) == (7, 1, 6)
+    assert [line for line, _ in report.errors] == [2, 3, 4, 5, 6, 7]
+    assert 'Date' in report.errors[0][1]
+    assert "unknown user 'nobody'" in report.errors[3][1]
+    assert session.query(Screening).count() == 1
+
+
+def test_import_creates_users(session):
+    """Test unknown usernames become accounts that cannot log in"""
+    data = HEADER + 'newbie,2025-01-01 08:00,3,Low,,,,,,\nNEWBIE,2025-01-02 08:00,5,Low,,,,,,\n'
+    report = import_screenings(session, io.StringIO(data), create_users=True)
+    assert (report.imported, report.users_created) == (2, 1)
+    user = session.query(User).filter_by(username='newbie').one()
+    assert len(user.screenings) == 2
+    assert not user.check_password('')
+
+
+def test_import_missing_columns(session):
+    """Test a file without the required columns is rejected whole"""
+    with pytest.raises(ImportFileError):
+        import_screenings(session, io.StringIO('Date,Score\n2025-01-01,3\n'))
+
+
+def test_import_round_trips_export(session):
+    """Test an export plus a Username column imports back unchanged"""
+    session.add(Screening(user_id=2, score=9, level='Moderate', stress_score=2, notes='ok',
+                          created_at=datetime(2025, 4, 1, 7, 15)))
+    session.commit()
+    exported = b''.join(exports.stream_dataset(session, 2)).decode()
+    rows = list(csv.reader(io.StringIO(exported)))
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['Username'] + rows[0])
+    writer.writerows(['clinic1'] + row for row in rows[1:])
+    session.rollback()
+
+    report = import_screenings(session, io.StringIO(out.getvalue()))
+    assert report.imported == 1
+    imported = session.query(Screening).filter_by(user_id=1).one()
+    assert (imported.score, imported.level, imported.stress_score, imported.notes, imported.created_at) == (
+        9, 'Moderate', 2, 'ok', datetime(2025, 4, 1, 7, 15))
+
+
+def test_import_batches_inserts(session):
+    """Test each chunk is one executemany INSERT"""
+    data = HEADER + ''.join(f'clinic{1 + i % 2},2025-01-01 08:00,{i % 20},Low,,,,,,\n' for i in range(1000))
+    inserts = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO screenings'):
+            inserts.append(executemany)
+
+    report = import_screenings(session, io.StringIO(data), chunk_size=250)
+    event.remove(session.get_bind(), 'before_cursor_execute', count)
+    assert report.imported == 1000
+    assert inserts == [True] * 4
+
+
+def test_import_rebuilds_only_affected_users(session):
+    """Test summaries of users the file doesn't mention are left alone"""
+    session.add(UserStats(user_id=2, screening_count=7, score_sum=70))  # deliberately stale
+    session.commit()
+    report = import_screenings(session, io.StringIO(HEADER + 'clinic1,2025-01-02,12,Moderate,,,,,,\n'))
+    assert report.user_ids == {1}
+    assert session.get(UserStats, 1).screening_count == 1
+    assert session.get(UserStats, 2).screening_count == 7
+
+
+def test_import_queues_rollup_refresh(session):
+    """Test imported history is queued for the population trends, and an empty import queues nothing"""
+    import_screenings(session, io.StringIO(HEADER + 'nobody,2025-01-02,12,Moderate,,,,,,\n'))
+    assert session.query(Job).count() == 0
+    import_screenings(session, io.StringIO(HEADER + 'clinic1,2025-01-02,12,Moderate,,,,,,\n'))
+    assert [job.kind for job in session.query(Job)] == ['refresh_rollups']
@@ -0,0 +1,216 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import models
+from models import Base, User, Screening, Job, DailyRollup
+import jobs
+import rollups
+
+calls = []
+
+
+@jobs.handler('test_record')
+def record(session, value):
+    calls.append(value)
+
+
+@jobs.handler('test_flaky')
+def flaky(session, fail_times):
+    calls.append('try')
+    if calls.count('try') <= fail_times:
+        raise RuntimeError('boom')
+
+
+@pytest.fixture
+def session(tmp_path):
+    # Another test's request may have started the app's worker
+    jobs.worker.stop(timeout=5)
+    # A file database, so the worker's threads share it
+    engine = create_engine(f'sqlite:///{tmp_path}/jobs.db')
+    Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    calls.clear()
+    session = models.SessionLocal()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_enqueue_is_transactional(session):
+    """Test a job only exists if the enqueuing transaction commits"""
+    jobs.enqueue(session, 'test_record', {'value': 1})
+    session.rollback()
+    assert jobs.drain(session) == (0, 0)
+    jobs.enqueue(session, 'test_record', {'value': 2})
+    session.commit()
+    assert jobs.drain(session) == (1, 0)
+    assert calls == [2]
+    job = session.query(Job).one()
+    assert job.status == 'done' and job.attempts == 1 and job.finished_at is not None
+
+
+def test_idempotency_key_dedupes(session):
+    """Test a second job with the same key is dropped without aborting the transaction"""
+    assert jobs.enqueue(session, 'test_record', {'value': 1}, key='k1') is not None
+    assert jobs.enqueue(session, 'test_record', {'value': 2}, key='k1') is None
+    session.add(User(username='still-here', password='x'))
+    session.commit()
+    assert session.query(Job).count() == 1 and session.query(User).count() == 1
+    with pytest.raises(ValueError):
+        jobs.enqueue(session, 'unknown_kind')
+
+
+def test_failures_retry_with_backoff(session, monkeypatch):
+    """Test failed jobs are re-queued with growing delays, then marked failed"""
+    jobs.enqueue(session, 'test_flaky', {'fail_times': 5}, max_attempts=3)
+    session.commit()
+    delays = []
+    for attempt in range(1, 4):
+        before = datetime.utcnow()
+        assert jobs.drain(session) == (0, 1)
+        job = session.query(Job).one()
+        session.expire_all()
+        if attempt < 3:
+            assert job.status == 'queued' and job.last_error == 'RuntimeError: boom'
+            delays.append((job.run_at - before).total_seconds())
+            # Make it due again
+            session.query(Job).update({'run_at': datetime.utcnow()})
+            session.commit()
+    assert job.status == 'failed' and job.attempts == 3
+    assert jobs.JOB_BACKOFF_BASE <= delays[0] < delays[1]
+
+    assert jobs.retry_failed(session) == 1
+    session.commit()
+    assert jobs.drain(session) == (0, 1)
+    assert calls.count('try') == 4
+
+
+def test_delayed_and_lost_jobs(session):
+    """Test future jobs wait, and a running job past its lease is claimed again"""
+    jobs.enqueue(session, 'test_record', {'value': 1}, delay=60)
+    session.commit()
+    assert jobs.claim(session) is None
+    later = datetime.utcnow() + timedelta(seconds=61)
+    job_id, kind, payload = jobs.claim(session, now=later)
+    assert (kind, payload) == ('test_record', {'value': 1})
+    # The worker died; nobody finishes the job
+    assert jobs.claim(session, now=later) is None
+    assert jobs.claim(session, now=later + timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1))[0] == job_id
+    assert session.get(Job, job_id).attempts == 2
+
+
+def test_prune_removes_old_finished_jobs(session):
+    jobs.enqueue(session, 'test_record', {'value': 1})
+    session.commit()
+    jobs.drain(session)
+    session.query(Job).update({'finished_at': datetime.utcnow() - timedelta(days=30)})
+    jobs.enqueue(session, 'test_record', {'value': 2})
+    session.commit()
+    assert jobs.prune(session) == 1
+    assert session.query(Job).one().status == 'queued'
+
+
+def test_claim_skips_job_claimed_since_select(session, monkeypatch):
+    """Test the claiming UPDATE re-checks the job is due, so two processes can't both claim it"""
+    first = jobs.enqueue(session, 'test_record', {'value': 1})
+    second = jobs.enqueue(session, 'test_record', {'value': 2})
+    session.flush()
+    first_id, second_id = first.id, second.id
+    session.commit()
+
+    def claimed_elsewhere(conn, cursor, statement, parameters, context, executemany):
+        # Another process claims the first job between our SELECT and UPDATE
+        if statement.startswith('UPDATE jobs') and not claimed_elsewhere.done:
+            claimed_elsewhere.done = True
+            cursor.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (first_id,))
+    claimed_elsewhere.done = False
+
+    engine = session.get_bind()
+    event.listen(engine, 'before_cursor_execute', claimed_elsewhere)
+    try:
+        claimed = jobs.claim(session)
+    finally:
+        event.remove(engine, 'before_cursor_execute', claimed_elsewhere)
+    assert claimed[0] == second_id
+    assert session.get(Job, first_id).attempts == 0
+
+
+def test_worker_runs_jobs_after_commit(session):
+    """Test the thread-pool worker picks up jobs when woken by a commit"""
+    worker = jobs.Worker(threads=2, poll_interval=30)
+    previous, jobs.worker = jobs.worker, worker
+    worker.start()
+    try:
+        for value in range(5):
+            jobs.enqueue(session, 'test_record', {'value': value})
+        session.commit()
+        deadline = time.monotonic() + 5
+        while len(calls) < 5 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        worker.stop(timeout=5)
+        jobs.worker = previous
+    assert sorted(calls) == [0, 1, 2, 3, 4]
+    assert not worker.running
+
+
+def test_worker_runs_jobs_on_the_app_database(session, tmp_path):
+    """Test a worker started for an app with its own DATABASE_URL claims and runs jobs there"""
+    import database
+    from app import create_app
+    flask_app = create_app({'DATABASE_URL': f'sqlite:///{tmp_path}/app.db'})
+    Base.metadata.create_all(database.engine_for(flask_app))
+    app_session = database.sessionmaker_for(flask_app)()
+    worker = jobs.Worker(threads=1, poll_interval=0.05)
+    worker.start(flask_app)
+    try:
+        jobs.enqueue(app_session, 'test_record', {'value': 'app'})
+        app_session.commit()
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        worker.stop(timeout=5)
+    assert calls == ['app']
+    assert app_session.query(Job).one().status == 'done'
+    assert session.query(Job).count() == 0
+    app_session.close()
+
+
+def test_rollup_refresh_is_coalesced(session):
+    """Test screening submissions share one rollup refresh job per window"""
+    session.add(User(username='alice', password='x'))
+    session.flush()
+    for score in (3, 12):
+        session.add(Screening(user_id=1, score=score, level='Low', created_at=datetime(2026, 1, 5)))
+        rollups.schedule_refresh(session)
+    session.commit()
+    job = session.query(Job).one()
+    assert job.kind == 'refresh_rollups' and job.run_at > datetime.utcnow()
+    session.query(Job).update({'run_at': datetime.utcnow()})
+    session.commit()
+    assert jobs.drain(session) == (1, 0)
+    assert session.query(DailyRollup).one().screening_count == 2
+
+
+def test_rollup_refresh_requeues_rows_inside_lag(session, monkeypatch):
+    """Test a refresh with a lag window leaves recent rows and queues another pass"""
+    monkeypatch.setattr(rollups, '_lag', lambda session: 60)
+    session.add(User(username='alice', password='x'))
+    session.add(Screening(user_id=1, score=3, level='Low', created_at=datetime(2026, 1, 5)))
+    jobs.enqueue(session, 'refresh_rollups')
+    session.commit()
+    assert jobs.drain(session) == (1, 0)
+    assert session.query(DailyRollup).count() == 0
+    retry = session.query(Job).filter(Job.status == 'queued').one()
+    assert retry.run_at > datetime.utcnow() + timedelta(seconds=30)
+
+    # Once the lag has passed, the queued pass rolls the row up
+    session.query(Screening).update({'recorded_at': datetime.utcnow() - timedelta(seconds=120)})
+    retry.run_at = datetime.utcnow()
+    session.commit()
+    assert jobs.drain(session) == (1, 0)
+    assert session.query(DailyRollup).one().screening_count == 1
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from app import app
+import metrics
+import models
+from models import User
+from identity import identity_cache
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'metricsuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'metricsuser', 'password': 'pass123'})
+        client.engine = engine
+        yield client
+
+
+def make_admin(user_id=1):
+    session = models.SessionLocal()
+    session.get(User, user_id).role = 'admin'
+    session.commit()
+    session.close()
+    identity_cache.invalidate(user_id)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_protected(client, monkeypatch):
+    """Test /metrics is refused to users and anonymous scrapers without the token"""
+    assert client.get('/metrics').status_code == 403
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'scrape-secret')
+    with app.test_client() as anonymous:
+        assert anonymous.get('/metrics').status_code == 403
+        assert anonymous.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+        rv = anonymous.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+    assert rv.status_code == 200
+    assert rv.mimetype == 'text/plain'
+
+
+def test_request_and_sql_metrics(client):
+    """Test requests are counted per endpoint and status with their SQL statements"""
+    make_admin()
+    before = sample('http_requests_total', endpoint='main.api_stats', method='GET', status='200')
+    statements_before = sample('db_statements_per_request_sum', endpoint='main.api_stats')
+
+    executed = []
+
+    def count(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(client.engine, 'after_cursor_execute', count)
+    assert client.get('/api/stats').status_code == 200
+    event.remove(client.engine, 'after_cursor_execute', count)
+    assert executed
+
+    assert sample('http_requests_total', endpoint='main.api_stats', method='GET', status='200') == before + 1
+    assert sample('db_statements_per_request_sum', endpoint='main.api_stats') - statements_before == len(executed)
+    assert sample('http_request_duration_seconds_count', endpoint='main.api_stats', method='GET') >= 1
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="main.api_stats",method="GET",status="200"}' in body
+    assert 'db_time_per_request_seconds_bucket{endpoint="main.api_stats"' in body
+
+
+def test_unknown_paths_share_one_label(client):
+    """Test 404s are not labelled by path"""
+    before = sample('http_requests_total', endpoint='unmatched', method='GET', status='404')
+    client.get('/no-such-page-1')
+    client.get('/no-such-page-2')
+    assert sample('http_requests_total', endpoint='unmatched', method='GET', status='404') == before + 2
+
+
+def test_workers_aggregate(tmp_path):
+    """Test samples written by separate worker processes are summed"""
+    code = "import metrics; metrics.REQUESTS.labels('dashboard', 'GET', '200').inc(3)"
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+    labels = {'endpoint': 'dashboard', 'method': 'GET', 'status': '200'}
+    assert registry.get_sample_value('http_requests_total', labels) == 6
@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
 from models import Base, User, Screening, CopingLog, Recommendation
 from datetime import datetime
@@ -311,4 +311,15 @@ def test_unique_username_constraint(session):
     session.add(u2)
     
     with pytest.raises(Exception):  # Should raise IntegrityError
-        session.commit()
\ No newline at end of file
+        session.commit()
+
+def test_hot_query_indexes(session):
+    """Test per-user history queries are backed by composite indexes"""
+    inspector = inspect(session.get_bind())
+    screening_indexes = {ix['name']: ix['column_names'] for ix in inspector.get_indexes('screenings')}
+    coping_indexes = {ix['name']: ix['column_names'] for ix in inspector.get_indexes('coping_logs')}
+    recommendation_indexes = {ix['name']: ix['column_names'] for ix in inspector.get_indexes('recommendations')}
+
+    assert screening_indexes['ix_screenings_user_id_created_at'] == ['user_id', 'created_at']
+    assert coping_indexes['ix_coping_logs_user_id_created_at'] == ['user_id', 'created_at']
+    assert recommendation_indexes['ix_recommendations_screening_id'] == ['screening_id']
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+from flask import template_rendered
+from app import app
+import models
+from page_cache import PageCache, page_cache
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    page_cache.clear()
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        yield client
+    page_cache.clear()
+
+
+@pytest.fixture
+def renders():
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(template.name)
+
+    template_rendered.connect(record, app)
+    yield rendered
+    template_rendered.disconnect(record, app)
+
+
+def test_public_page_rendered_once(client, renders):
+    """Test repeat visits are served from memory"""
+    first = client.get('/awareness')
+    second = client.get('/awareness')
+    assert first.data == second.data
+    assert renders == ['awareness.html']
+
+
+def test_anonymous_headers_and_304(client):
+    """Test the anonymous variant is publicly cacheable and revalidates"""
+    rv = client.get('/')
+    assert rv.headers['Cache-Control'].startswith('public, max-age=')
+    etag, weak = rv.get_etag()
+    assert etag and not weak
+    assert client.get('/', headers={'If-None-Match': rv.headers['ETag']}).status_code == 304
+
+
+def test_logged_in_variant(client, renders):
+    """Test logged-in visitors get their own private variant"""
+    anonymous = client.get('/support')
+    client.post('/register', data={'username': 'pageuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+    client.post('/login', data={'username': 'pageuser', 'password': 'pass123'})
+    client.get('/dashboard')  # consume the login flash
+    renders.clear()
+    member = client.get('/support')
+    assert member.headers['Cache-Control'] == 'private, no-cache'
+    assert member.get_etag() != anonymous.get_etag()
+    assert b'Logout' in member.data and b'Logout' not in anonymous.data
+    client.get('/support')
+    assert renders == ['support.html']
+
+
+def test_flash_messages_bypass_cache(client):
+    """Test a pending flash message is shown and not cached"""
+    client.get('/')
+    client.post('/register', data={'username': 'flashuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+    client.post('/login', data={'username': 'flashuser', 'password': 'pass123'})
+    rv = client.get('/logout', follow_redirects=True)
+    assert b'You have been logged out' in rv.data
+    assert rv.headers['Cache-Control'] == 'private, no-store'
+    assert b'You have been logged out' not in client.get('/').data
+
+
+def test_template_change_invalidates(tmp_path):
+    """Test editing any template file drops cached pages"""
+    now = [0.0]
+    cache = PageCache(check_interval=2, clock=lambda: now[0])
+    page = tmp_path / 'page.html'
+    page.write_text('v1')
+    render = lambda: page.read_text()
+
+    assert cache.get('page', str(tmp_path), render)[0] == 'v1'
+    page.write_text('v2')
+    os.utime(page, (1e9, 1e9))
+    assert cache.get('page', str(tmp_path), render)[0] == 'v1'  # within the check interval
+    now[0] = 5
+    body, etag = cache.get('page', str(tmp_path), render)
+    assert body == 'v2'
+    assert etag != cache.get('other', str(tmp_path), lambda: 'v1')[1]
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening
+from pagination import keyset_page, encode_cursor, decode_cursor
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def history(session):
+    u = User(username='pager')
+    u.set_password('pw')
+    session.add(u)
+    session.commit()
+    start = datetime(2026, 1, 1)
+    # Two screenings share each timestamp so the id tie-breaker matters
+    for i in range(25):
+        session.add(Screening(user_id=u.id, score=i, level='Low', created_at=start + timedelta(days=i // 2)))
+    session.commit()
+    return u
+
+
+def test_cursor_round_trip():
+    """Test cursors decode to what was encoded and reject garbage"""
+    ts = datetime(2026, 3, 4, 5, 6, 7, 891011)
+    assert decode_cursor(encode_cursor(ts, 42)) == (ts, 42)
+    assert decode_cursor('not-a-cursor') is None
+    assert decode_cursor(None) is None
+
+
+def test_walk_older_pages(session, history):
+    """Test following older cursors visits every row exactly once, newest first"""
+    query = session.query(Screening).filter_by(user_id=history.id)
+    seen = []
+    page = keyset_page(query, Screening, 10)
+    assert not page.has_newer
+    while True:
+        seen.extend(s.id for s in page.items)
+        if not page.has_older:
+            break
+        page = keyset_page(query, Screening, 10, before=page.older_cursor)
+        assert page.has_newer
+
+    expected = [s.id for s in query.order_by(Screening.created_at.desc(), Screening.id.desc())]
+    assert seen == expected
+    assert len(seen) == 25
+
+
+def test_walk_back_to_newer_page(session, history):
+    """Test the newer cursor returns the previous page in the same order"""
+    query = session.query(Screening).filter_by(user_id=history.id)
+    first = keyset_page(query, Screening, 10)
+    second = keyset_page(query, Screening, 10, before=first.older_cursor)
+    back = keyset_page(query, Screening, 10, after=second.newer_cursor)
+
+    assert [s.id for s in back.items] == [s.id for s in first.items]
+    assert not back.has_newer
+    assert back.has_older
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import passwords
+from passwords import hash_password, verify_password, needs_rehash
+from models import Base, User
+from app import find_login_user
+
+def test_hash_uses_configured_method(monkeypatch):
+    """Test the policy method and cost are recorded in new hashes"""
+    monkeypatch.setattr(passwords, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    stored = hash_password('secret')
+    assert stored.startswith('pbkdf2:sha256:1000$')
+    assert verify_password(stored, 'secret')
+    assert not verify_password(stored, 'wrong')
+
+
+def test_needs_rehash(monkeypatch):
+    """Test hashes from another method or cost are flagged for upgrade"""
+    old = hash_password('secret', 'pbkdf2:sha256:1000')
+    assert not needs_rehash(old, 'pbkdf2:sha256:1000')
+    assert needs_rehash(old, 'pbkdf2:sha256:2000')
+    assert needs_rehash(old, 'scrypt:1024:8:1')
+    # Short method names are compared by their full parameters
+    assert not needs_rehash(hash_password('secret', 'scrypt'), 'scrypt')
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        User(username='Alice', email='alice@example.com', password='x'),
+        User(username='bob', email='Bob@Example.com', password='x'),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_find_login_user_ignores_case(session):
+    """Test the login identifier matches username or email in any case"""
+    assert find_login_user(session, 'alice').username == 'Alice'
+    assert find_login_user(session, ' ALICE@example.COM ').username == 'Alice'
+    assert find_login_user(session, 'bob@example.com').username == 'bob'
+    assert find_login_user(session, 'carol') is None
+    assert find_login_user(session, '') is None
+
+
+def test_find_login_user_single_indexed_query(session):
+    """Test the lookup is one statement using the expression indexes"""
+    engine = session.get_bind()
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def capture(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    find_login_user(session, 'alice')
+    event.remove(engine, 'before_cursor_execute', capture)
+    assert len(statements) == 1
+
+    statement, parameters = statements[0]
+    plan = ' '.join(str(row) for row in session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters))
+    assert 'ix_users_username_lower' in plan and 'ix_users_email_lower' in plan
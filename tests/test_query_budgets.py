@@ -0,0 +1,139 @@
+import logging
+
+import pytest
+from flask import g
+from app import app
+import models
+import metrics
+import query_budgets
+import trends
+from identity import identity_cache
+from models import Screening, CopingLog
+from query_budgets import QueryBudgetExceeded, budget_for
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from pagination import encode_cursor
+from recommendations import catalog, recommend_many
+from stats import rebuild_user_stats
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def client(tmp_path):
+    # A production-style engine: file database, explicit BEGIN (see models._configure_sqlite)
+    engine = models.create_db_engine(f'sqlite:///{tmp_path}/budgets.db')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'budgetuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'budgetuser', 'password': 'pass123'})
+        yield client
+    engine.dispose()
+
+
+def add_history(n):
+    session = models.SessionLocal()
+    start = datetime(2026, 1, 1)
+    for i in range(n):
+        session.add(Screening(user_id=1, score=i % 20, level='Low', created_at=start + timedelta(days=i)))
+        session.add(CopingLog(user_id=1, strategy='Walk', created_at=start + timedelta(days=i)))
+    rebuild_user_stats(session, 1)
+    session.commit()
+    session.close()
+
+
+def test_budget_sources():
+    """Test config entries win over decorators, which win over the default"""
+    assert budget_for(app, 'main.screening_history') == 6
+    assert budget_for(app, 'main.admin_import') == 0
+    assert budget_for(app, 'main.profile') == query_budgets.QUERY_BUDGET_DEFAULT
+    app.config['QUERY_BUDGETS']['main.screening_history'] = 9
+    try:
+        assert budget_for(app, 'main.screening_history') == 9
+    finally:
+        del app.config['QUERY_BUDGETS']['main.screening_history']
+
+
+def test_list_pages_stay_within_budget(client):
+    """Test long histories don't add queries per row, even when load_user misses the identity cache"""
+    add_history(60)
+    for url in ('/dashboard', '/history', f'/history?before={encode_cursor(datetime(2026, 2, 15), 46)}', '/history/series',
+                '/analytics', '/coping-strategies', '/api/screenings'):
+        identity_cache.clear()  # first request after login, TTL expiry, or another worker
+        assert client.get(url).status_code == 200
+
+
+def test_history_resolves_recommendations_within_budget(client):
+    """Test history shows each screening's recommendations, loading the catalog at most once"""
+    add_history(30)
+    catalog.invalidate()  # may hold another test database's templates
+    session = models.SessionLocal()
+    recommend_many(session, [(s.id, s.level) for s in session.query(Screening)])
+    session.commit()
+    session.close()
+    catalog.invalidate()  # a fresh process
+    identity_cache.clear()
+    body = client.get(f'/history?before={encode_cursor(datetime(2026, 1, 25), 25)}').get_data(as_text=True)
+    assert body.count('Maintain Healthy Habits') == 20
+
+
+def test_analytics_with_trends_and_cold_identity_cache(client, monkeypatch):
+    """Test /analytics fits its budget with load_user, the summary and the per-series trends"""
+    add_history(30)
+    session = models.SessionLocal()
+    trends.rebuild(session, 1)
+    session.commit()
+    session.close()
+    monkeypatch.setattr(query_budgets, 'tally', query_budgets.Tally())
+    identity_cache.clear()
+    body = client.get('/analytics').get_data(as_text=True)
+    assert 'No screening data available' not in body
+    [row] = query_budgets.tally.report()
+    assert (row['endpoint'], row['max'], row['budget']) == ('main.analytics', 4, 5)
+
+
+def test_transaction_control_is_not_counted():
+    """Test the explicit BEGIN on SQLite and savepoints don't count towards a budget"""
+    engine = models.create_db_engine('sqlite:///:memory:')
+    with app.test_request_context('/'):
+        metrics._start_timer()
+        with sessionmaker(bind=engine)() as session:
+            with session.begin_nested():
+                session.execute(text('SELECT 1'))
+        assert g.sql_count == 1
+
+
+def test_overrun_raises_when_testing(client, monkeypatch):
+    """Test a route over its budget fails the test that exercised it"""
+    monkeypatch.setattr(query_budgets, 'tally', query_budgets.Tally())  # keep the run's report clean
+    monkeypatch.setitem(app.config['QUERY_BUDGETS'], 'main.api_stats', 1)
+    with pytest.raises(QueryBudgetExceeded, match='api_stats ran'):
+        client.get('/api/stats')
+
+
+def test_overrun_logs_in_production(monkeypatch, caplog):
+    """Test outside tests an overrun is logged and the response still sent"""
+    monkeypatch.setitem(app.config, 'TESTING', False)
+    monkeypatch.setattr(query_budgets, 'tally', query_budgets.Tally())
+    with app.test_request_context('/history'), caplog.at_level(logging.WARNING, 'query_budgets'):
+        g.sql_count = 7
+        response = app.response_class('ok')
+        assert query_budgets._check(response) is response
+    assert 'screening_history ran 7 SQL statements (budget 6)' in caplog.text
+
+
+def test_report_tallies_each_endpoint(client):
+    """Test the report records worst and mean statement counts per endpoint"""
+    def dashboard_row():
+        return next((r for r in query_budgets.report() if r['endpoint'] == 'main.dashboard'), {'requests': 0})
+
+    before = dashboard_row()['requests']
+    client.get('/dashboard')
+    client.get('/dashboard')
+    row = dashboard_row()
+    assert row['requests'] == before + 2
+    assert row['budget'] == 5 and row['over'] == 0
+    assert 0 < row['max'] <= 5
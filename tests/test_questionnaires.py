@@ -0,0 +1,43 @@
+import pytest
+from app import app
+from questionnaires import Questionnaire, Question, QUICK, EXTENDED, get_questionnaire
+from forms import ScreeningForm, ExtendedScreeningForm
+from scoring import score_quick, score_extended
+
+
+def test_level_cutoffs_are_inclusive():
+    """Test a score equal to a cut-off gets that cut-off's level"""
+    assert [QUICK.level_for(s) for s in (0, 8, 9, 15, 16)] == ['Low', 'Low', 'Moderate', 'Moderate', 'High']
+    assert EXTENDED.levels == ['Low', 'Moderate', 'High']
+
+
+def test_forms_are_generated_from_registry():
+    """Test the WTForms classes carry one field per registered question"""
+    with app.test_request_context():
+        app.config['WTF_CSRF_ENABLED'] = False
+        quick = ScreeningForm()
+        extended = ExtendedScreeningForm()
+    assert [f.name for f in quick if f.type == 'RadioField'] == [q.name for q in QUICK.questions]
+    assert quick.q10.label.text == 'I have thoughts of harming myself'
+    assert len([f for f in extended if f.type == 'RadioField']) == 10
+    assert 'notes' in extended._fields and 'notes' not in quick._fields
+
+
+def test_weights_apply_to_points():
+    """Test question weights multiply the submitted answer"""
+    questionnaire = Questionnaire('custom', 1, 'Custom', [(3, 'Low')], questions=[
+        Question('a', 'A'), Question('b', 'B', weight=3),
+    ])
+    assert questionnaire.score({'a': '1', 'b': '2'}) == (7, 'High', {})
+
+
+def test_scoring_matches_registry():
+    """Test scoring helpers and the registry agree and stamp the version"""
+    assert score_quick({f'q{i}': '1' for i in range(1, 11)}) == (10, 'Moderate')
+    answers = {q.name: '2' for q in EXTENDED.questions}
+    dimensions, total, level = score_extended(answers)
+    assert dimensions['sleep_score'] == 4 and (total, level) == (20, 'Moderate')
+    assert EXTENDED.stamp() == {'questionnaire': 'extended', 'questionnaire_version': EXTENDED.version}
+    assert get_questionnaire('quick') is QUICK
+    with pytest.raises(KeyError):
+        get_questionnaire('missing')
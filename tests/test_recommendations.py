@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, RecommendationTemplate, ScreeningRecommendation
+from recommendations import DEFAULT_TEMPLATES, catalog, recommend, recommendations_for
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    catalog.invalidate()
+    yield engine
+    catalog.invalidate()
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine)()
+    u = User(username='rec')
+    u.set_password('pw')
+    session.add(u)
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_screening(session, level='Moderate'):
+    s = Screening(user_id=1, score=10, level=level)
+    session.add(s)
+    session.flush()
+    return s
+
+
+def test_empty_catalog_is_seeded(session):
+    """Test the default templates are seeded on first use"""
+    entries = catalog.for_level(session, 'High')
+    assert [e['title'] for e in entries] == [t['title'] for t in DEFAULT_TEMPLATES['High']]
+    total = sum(len(recs) for recs in DEFAULT_TEMPLATES.values())
+    assert session.query(RecommendationTemplate).count() == total
+
+
+def test_recommend_stores_links_only(session):
+    """Test a screening stores template ids and returns the catalog text"""
+    s = add_screening(session)
+    entries = recommend(session, s.id, 'Moderate')
+    session.commit()
+    assert [e['title'] for e in entries] == [t['title'] for t in DEFAULT_TEMPLATES['Moderate']]
+    links = session.query(ScreeningRecommendation).filter_by(screening_id=s.id).all()
+    assert sorted(link.template_id for link in links) == [e['id'] for e in entries]
+
+
+def test_recommend_single_insert(engine, session):
+    """Test links are written with one INSERT statement"""
+    catalog.load(session)
+    s = add_screening(session)
+    inserts = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, *args):
+        if statement.startswith('INSERT'):
+            inserts.append(statement)
+
+    recommend(session, s.id, 'High')
+    event.remove(engine, 'before_cursor_execute', count)
+    assert len(inserts) == 1
+
+
+def test_inactive_templates_resolve_for_history(session):
+    """Test retired templates are not offered but still resolve for old screenings"""
+    s = add_screening(session, 'Low')
+    recommend(session, s.id, 'Low')
+    session.query(RecommendationTemplate).filter_by(level='Low', position=0).update({'active': False})
+    session.commit()
+    catalog.invalidate()
+
+    assert [e['title'] for e in catalog.for_level(session, 'Low')] == ['Wellness Tips']
+    history = recommendations_for(session, [s.id])
+    assert [e['title'] for e in history[s.id]] == ['Maintain Healthy Habits', 'Wellness Tips']
+
+
+def test_rolled_back_seed_is_forgotten(session):
+    """Test a seed that never commits doesn't leave the cache pointing at missing templates"""
+    catalog.for_level(session, 'High')
+    session.rollback()
+    assert session.query(RecommendationTemplate).count() == 0
+    entries = catalog.for_level(session, 'High')
+    session.commit()
+    assert {e['id'] for e in entries} <= {t.id for t in session.query(RecommendationTemplate)}
+    assert len(entries) == len(DEFAULT_TEMPLATES['High'])
@@ -0,0 +1,96 @@
+import re
+
+import pytest
+from app import app
+import models
+import replicas
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """A primary and a replica SQLite file; replicas.copy_sqlite stands in for replication."""
+    primary_url = f'sqlite:///{tmp_path / "primary.db"}'
+    replica_url = f'sqlite:///{tmp_path / "replica.db"}'
+    engine = models.create_db_engine(primary_url)
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    replicas.configure([replica_url])
+    monkeypatch.setattr(replicas, 'REPLICA_CHECK_INTERVAL', 0)
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'replicauser', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'replicauser', 'password': 'pass123'})
+        client.replicate = lambda: replicas.copy_sqlite(primary_url, replica_url)
+        yield client
+
+    replicas.configure([])
+    engine.dispose()
+
+
+def forget_writes(client):
+    with client.session_transaction() as cookie:
+        cookie.pop(replicas.WROTE_AT_KEY, None)
+
+
+def screen(client):
+    client.post('/screening', data={f'q{i}': '1' for i in range(1, 11)})
+
+
+def dashboard_count(client):
+    body = client.get('/dashboard').get_data(as_text=True)
+    return int(re.search(r'<h2 class="text-primary">(\d+)</h2>', body).group(1))
+
+
+def test_reads_come_from_replica(client):
+    """Test a read-only view shows the replica's (lagging) data until it is copied again"""
+    screen(client)
+    client.replicate()
+    screen(client)
+    forget_writes(client)
+    assert dashboard_count(client) == 1
+    client.replicate()
+    assert dashboard_count(client) == 2
+
+
+def test_user_stays_on_primary_after_write(client):
+    """Test read-your-writes: a fresh write is visible even though the replica lags"""
+    client.replicate()
+    screen(client)
+    assert dashboard_count(client) == 1
+
+
+def test_stickiness_expires(client, monkeypatch):
+    monkeypatch.setattr(replicas, 'REPLICA_STICKY_SECONDS', 0)
+    client.replicate()
+    screen(client)
+    assert dashboard_count(client) == 0
+
+
+def test_unhealthy_replica_falls_back_to_primary(client, monkeypatch):
+    """Test an empty replica fails its health check; reads use the primary until it recovers"""
+    screen(client)
+    forget_writes(client)
+    replica = replicas.replicas[0]
+    assert dashboard_count(client) == 1
+    assert not replica.healthy
+
+    client.replicate()
+    monkeypatch.setattr(replicas, 'REPLICA_RETRY_INTERVAL', 3600)
+    replica.checked_at = None  # due for a check, as after REPLICA_RETRY_INTERVAL
+    assert replica.available()
+    screen(client)
+    forget_writes(client)
+    assert dashboard_count(client) == 1  # replica again, without the second screening
+
+
+def test_writes_go_to_primary(client):
+    """Test POST handlers ignore replicas, and undecorated views read the primary"""
+    client.replicate()
+    forget_writes(client)
+    screen(client)
+    forget_writes(client)
+    assert client.get('/api/stats').get_json()['screenings']['total'] == 1
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, UserStats
+from questionnaires import QUICK, EXTENDED
+from rescoring import levels_for, rescore_screenings
+from stats import rebuild_user_stats
+from etags import data_version
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(username='alice', password='x'))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def revised(monkeypatch):
+    """QUICK v2 with a lower Moderate cut-off"""
+    monkeypatch.setattr(QUICK, 'version', 2)
+    monkeypatch.setattr(QUICK, 'cutoffs', [(5, 'Low'), (15, 'Moderate')])
+    return QUICK
+
+
+def v1_level(score):
+    return 'Low' if score <= 8 else 'Moderate' if score <= 15 else 'High'
+
+
+def add_quick(session, *scores, version=1):
+    for score in scores:
+        session.add(Screening(user_id=1, score=score, level=v1_level(score),
+                              questionnaire='quick', questionnaire_version=version))
+    session.commit()
+
+
+def test_levels_for_matches_level_for():
+    """Test the vectorised levels agree with the scalar rule"""
+    scores = np.arange(0, 41)
+    assert list(levels_for(EXTENDED, scores)) == [EXTENDED.level_for(s) for s in range(41)]
+
+
+def test_rescore_applies_new_cutoffs(session, revised):
+    """Test outdated rows are re-levelled in chunks and stats rebuilt"""
+    add_quick(session, 2, 8, 12, 18, 6)
+    rebuild_user_stats(session)
+    session.commit()
+
+    report = rescore_screenings(session, 'quick', chunk_size=2)
+    assert (report.scanned, report.updated) == (5, 5)
+    assert report.transitions == {('Low', 'Moderate'): 2}
+    assert report.user_ids == {1}
+    rows = session.query(Screening.score, Screening.level, Screening.questionnaire_version).order_by(Screening.id).all()
+    assert rows == [(2, 'Low', 2), (8, 'Moderate', 2), (12, 'Moderate', 2), (18, 'High', 2), (6, 'Moderate', 2)]
+    assert session.get(UserStats, 1).last_level == 'Moderate'
+
+    # Nothing left on the old version
+    assert rescore_screenings(session, 'quick').scanned == 0
+
+
+def test_rescore_dry_run_writes_nothing(session, revised):
+    """Test a dry run reports transitions without updating rows"""
+    add_quick(session, 6, 7)
+    report = rescore_screenings(session, 'quick', dry_run=True)
+    assert report.transitions == {('Low', 'Moderate'): 2}
+    assert {s.level for s in session.query(Screening)} == {'Low'}
+    assert {s.questionnaire_version for s in session.query(Screening)} == {1}
+
+
+def test_rescore_extended_sums_subscales(session):
+    """Test extended totals come from the stored sub-scales; quick rows are untouched"""
+    add_quick(session, 3, version=None)
+    session.add(Screening(user_id=1, score=99, level='Low', questionnaire='extended', questionnaire_version=None,
+                          stress_score=4, anxiety_score=4, sleep_score=4, depression_score=4, social_score=4))
+    session.commit()
+
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    report = rescore_screenings(session, 'extended')
+    assert report.transitions == {('Low', 'Moderate'): 1}
+    extended = session.query(Screening).filter_by(questionnaire='extended').one()
+    assert (extended.score, extended.level, extended.questionnaire_version) == (20, 'Moderate', EXTENDED.version)
+    assert session.query(Screening).filter_by(questionnaire='quick').one().questionnaire_version is None
+    assert sum(s.lstrip().upper().startswith('UPDATE SCREENINGS') for s in statements) == 1
+
+
+def test_rescore_changes_data_version(session, revised):
+    """Test ETags of users whose rows were re-levelled change, so clients don't get a stale 304"""
+    add_quick(session, 6, 7)
+    session.add(User(username='bob', password='x'))
+    session.commit()
+    before = {uid: data_version(session, uid, Screening) for uid in (1, 2)}
+    rescore_screenings(session, 'quick')
+    assert data_version(session, 1, Screening) != before[1]
+    assert data_version(session, 2, Screening) == before[2]
@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, DailyRollup, RollupState
+import rollups
+from rollups import refresh_rollups, rebuild_rollups, forget_user, trend_report
+from datetime import date, datetime, timedelta
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([User(username='alice', password='x'), User(username='bob', password='x')])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add(session, user_id, when, score, level, dims=None):
+    values = dict(zip(['stress_score', 'anxiety_score', 'sleep_score', 'depression_score', 'social_score'], dims or []))
+    session.add(Screening(user_id=user_id, score=score, level=level, created_at=when, **values))
+    session.commit()
+
+
+def rollup_rows(session):
+    return {(r.day, r.level): (r.screening_count, r.score_sum, r.extended_count, r.stress_sum)
+            for r in session.query(DailyRollup)}
+
+
+def test_refresh_is_incremental(session):
+    """Test only screenings recorded after the high-water mark are aggregated"""
+    add(session, 1, datetime(2026, 1, 5, 9), 4, 'Low')
+    add(session, 2, datetime(2026, 1, 5, 18), 6, 'Low', [2, 1, 1, 1, 1])
+    assert refresh_rollups(session) == 2
+    session.commit()
+    assert rollup_rows(session) == {(date(2026, 1, 5), 'Low'): (2, 10, 1, 2)}
+
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert refresh_rollups(session) == 0
+    assert len(statements) == 2  # the mark and max(recorded_at), no aggregation
+
+    # A backdated screening (e.g. synced from a device) is still recorded now
+    add(session, 1, datetime(2026, 1, 5, 7), 20, 'High')
+    add(session, 1, datetime(2026, 1, 6, 7), 8, 'Low', [1, 1, 2, 2, 2])
+    assert refresh_rollups(session) == 2
+    session.commit()
+    assert rollup_rows(session) == {
+        (date(2026, 1, 5), 'Low'): (2, 10, 1, 2),
+        (date(2026, 1, 5), 'High'): (1, 20, 0, 0),
+        (date(2026, 1, 6), 'Low'): (1, 8, 1, 1),
+    }
+    newest = session.query(func.max(Screening.recorded_at)).scalar()
+    assert session.get(RollupState, rollups.STATE).last_recorded_at == newest
+    assert rebuild_rollups(session) == 4
+    assert len(rollup_rows(session)) == 3
+
+
+def test_refresh_leaves_rows_inside_lag_window(session):
+    """Test rows recorded after the cutoff (maybe not yet committed elsewhere) wait for a later refresh"""
+    add(session, 1, datetime(2026, 1, 5), 4, 'Low')
+    add(session, 2, datetime(2026, 1, 5), 6, 'Low')
+    late = session.get(Screening, 2)
+    late.recorded_at = datetime.utcnow() + timedelta(minutes=5)
+    session.commit()
+
+    assert refresh_rollups(session) == 1
+    assert refresh_rollups(session, cutoff=late.recorded_at) == 1
+    session.commit()
+    assert rollup_rows(session) == {(date(2026, 1, 5), 'Low'): (2, 10, 0, 0)}
+
+
+def test_forget_user_subtracts_their_screenings(session):
+    """Test deleting a user removes their screenings from the rollups"""
+    add(session, 1, datetime(2026, 1, 5), 4, 'Low')
+    add(session, 2, datetime(2026, 1, 5), 6, 'Low')
+    add(session, 2, datetime(2026, 1, 7), 18, 'High')
+    refresh_rollups(session)
+    # Not rolled up yet, so nothing to subtract
+    add(session, 2, datetime(2026, 1, 8), 2, 'Low')
+
+    forget_user(session, 2)
+    session.delete(session.get(User, 2))
+    session.commit()
+    assert rollup_rows(session) == {(date(2026, 1, 5), 'Low'): (1, 4, 0, 0)}
+    refresh_rollups(session)
+    assert rollup_rows(session) == {(date(2026, 1, 5), 'Low'): (1, 4, 0, 0)}
+
+
+def test_trend_report_groups_by_period(session):
+    """Test the report resamples daily rollups into periods"""
+    add(session, 1, datetime(2026, 1, 5), 4, 'Low', [1, 1, 1, 0, 1])
+    add(session, 1, datetime(2026, 1, 20), 20, 'High')
+    add(session, 2, datetime(2026, 2, 3), 10, 'Moderate', [3, 3, 2, 1, 1])
+    add(session, 2, datetime(2026, 4, 1), 16, 'High')
+    refresh_rollups(session)
+    session.commit()
+
+    monthly = trend_report(session, 'month')
+    assert [r['period'] for r in monthly] == ['2026-01', '2026-02', '2026-04']
+    january = monthly[0]
+    assert (january['total'], january['levels'], january['high_share'], january['avg_score']) == (
+        2, {'Low': 1, 'Moderate': 0, 'High': 1}, 50.0, 12.0)
+    assert january['dimension_averages']['stress_score'] == 1.0
+    assert monthly[2]['dimension_averages']['stress_score'] is None
+
+    quarterly = trend_report(session, 'quarter')
+    assert [(r['period'], r['total']) for r in quarterly] == [('2026Q1', 3), ('2026Q2', 1)]
+    assert trend_report(session, 'year')[0]['dimension_averages']['stress_score'] == 2.0
+
+
+def test_trend_report_reads_only_rollups(session):
+    """Test the report never touches the screenings table"""
+    add(session, 1, datetime(2026, 1, 5), 4, 'Low')
+    refresh_rollups(session)
+    session.commit()
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert trend_report(session, 'week')[0]['total'] == 1
+    assert statements and not any('screenings' in s for s in statements)
+
+
+def test_trend_report_empty(session):
+    assert trend_report(session) == []
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+from app import app
+import models
+import series
+from models import Screening
+from series import minmax_downsample, series_cache, SeriesCache
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    series_cache.clear()
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'seriesuser', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'seriesuser', 'password': 'pass123'})
+        yield client
+    series_cache.clear()
+
+
+def add_screenings(n, start=datetime(2026, 1, 1), extended_every=3):
+    session = models.SessionLocal()
+    for i in range(n):
+        extended = i % extended_every == 0
+        session.add(Screening(
+            user_id=1, score=i % 20, level='Low', created_at=start + timedelta(hours=i),
+            stress_score=i % 5 if extended else None,
+        ))
+    session.commit()
+    session.close()
+
+
+def test_downsample_keeps_extremes():
+    """Test spikes survive bucketing and the result is ordered and within budget"""
+    y = np.sin(np.linspace(0, 20, 10000))
+    y[1234], y[8765] = 5.0, -5.0
+    keep = minmax_downsample(y, 100)
+    assert len(keep) <= 100
+    assert np.all(np.diff(keep) > 0)
+    assert {1234, 8765} <= set(keep.tolist())
+
+
+def test_downsample_skips_missing_values():
+    """Test NaNs are dropped, and short series come back whole"""
+    y = np.array([1.0, np.nan, 3.0, np.nan, 2.0])
+    assert minmax_downsample(y, 10).tolist() == [0, 2, 4]
+    y = np.full(1000, np.nan)
+    y[::10] = np.arange(100)
+    keep = minmax_downsample(y, 20)
+    assert len(keep) <= 20 and np.all(keep % 10 == 0)
+    assert 990 in keep  # the maximum
+
+
+def test_series_endpoint(client):
+    """Test each series is capped at the requested number of points"""
+    add_screenings(1500)
+    payload = client.get('/history/series?points=100').get_json()
+    assert payload['total'] == 1500
+    assert set(payload['series']) == set(series.SERIES)
+    score = payload['series']['score']
+    assert len(score['t']) == len(score['v']) <= 100
+    assert max(score['v']) == 19 and min(score['v']) == 0
+    assert score['t'] == sorted(score['t'])
+    stress = payload['series']['stress_score']
+    assert 0 < len(stress['v']) <= 100
+
+
+def test_series_range_and_selection(client):
+    """Test the date range is inclusive and series can be picked"""
+    add_screenings(24 * 10)
+    payload = client.get('/history/series?start=2026-01-03&end=2026-01-04&series=score').get_json()
+    assert list(payload['series']) == ['score']
+    assert payload['total'] == 48
+    first = datetime.utcfromtimestamp(payload['series']['score']['t'][0] / 1000)
+    assert first == datetime(2026, 1, 3)
+
+
+def test_series_bad_parameters(client):
+    assert client.get('/history/series?start=yesterday').status_code == 400
+    assert client.get('/history/series?series=score,mood').status_code == 400
+
+
+def test_series_cached_until_new_screening(client, monkeypatch):
+    """Test repeat requests reuse the built series until the history changes"""
+    add_screenings(50)
+    builds = []
+    real_build = series.build
+    monkeypatch.setattr(series, 'build', lambda *args: builds.append(args) or real_build(*args))
+
+    first = client.get('/history/series?points=20')
+    second = client.get('/history/series?points=20')
+    assert first.get_json() == second.get_json()
+    assert len(builds) == 1
+    assert client.get('/history/series?points=20', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    add_screenings(1, start=datetime(2026, 6, 1))
+    assert client.get('/history/series?points=20').get_json()['total'] == 51
+    assert len(builds) == 2
+
+
+def test_cache_bounds():
+    """Test the cache keeps a bounded number of users and variants per user"""
+    cache = SeriesCache(maxsize=2, variants=2)
+    for user_id in (1, 2, 3):
+        cache.get(user_id, (1, 1), 'a', lambda: user_id)
+    assert cache.get(1, (1, 1), 'a', lambda: 'rebuilt') == 'rebuilt'
+    for params in ('a', 'b', 'c'):
+        cache.get(3, (1, 1), params, lambda: params)
+    assert cache.get(3, (1, 1), 'a', lambda: 'rebuilt') == 'rebuilt'
+    assert cache.get(3, (2, 2), 'c', lambda: 'new version') == 'new version'
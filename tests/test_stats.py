@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Screening, UserStats
+from sqlalchemy import event
+from stats import record_screening, get_user_stats, rebuild_user_stats, check_user_stats, analytics_summary
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(session):
+    u = User(username='statsuser')
+    u.set_password('pw')
+    session.add(u)
+    session.commit()
+    return u
+
+
+def add_screening(session, user, score, level, created_at=None):
+    s = Screening(user_id=user.id, score=score, level=level, created_at=created_at or datetime.utcnow())
+    session.add(s)
+    record_screening(session, s)
+    session.commit()
+    return s
+
+
+def test_empty_stats(session, user):
+    """Test a user without screenings reads as zero"""
+    stats = get_user_stats(session, user.id)
+    assert stats.screening_count == 0
+    assert stats.avg_score == 0
+
+
+def test_record_screening_updates_summary(session, user):
+    """Test each recorded screening updates count, sum, min, max and last"""
+    add_screening(session, user, 10, 'Moderate')
+    add_screening(session, user, 4, 'Low')
+    add_screening(session, user, 18, 'High')
+
+    stats = session.get(UserStats, user.id)
+    session.refresh(stats)
+    assert stats.screening_count == 3
+    assert stats.score_sum == 32
+    assert stats.score_min == 4
+    assert stats.score_max == 18
+    assert stats.last_score == 18
+    assert stats.last_level == 'High'
+    assert round(stats.avg_score, 2) == 10.67
+
+
+def test_out_of_order_screening_keeps_latest(session, user):
+    """Test an older screening does not replace the last score"""
+    now = datetime.utcnow()
+    add_screening(session, user, 6, 'Low', created_at=now)
+    add_screening(session, user, 20, 'High', created_at=now - timedelta(days=3))
+
+    stats = session.get(UserStats, user.id)
+    session.refresh(stats)
+    assert stats.screening_count == 2
+    assert stats.last_score == 6
+    assert stats.last_level == 'Low'
+
+
+def test_rebuild_matches_incremental(session, user):
+    """Test rebuilding from scratch reproduces the incremental summary"""
+    add_screening(session, user, 10, 'Moderate')
+    add_screening(session, user, 3, 'Low')
+    assert check_user_stats(session) == []
+
+    # Insert behind the summary's back, as a backfill would
+    session.add(Screening(user_id=user.id, score=16, level='High', created_at=datetime.utcnow() + timedelta(hours=1)))
+    session.commit()
+    assert check_user_stats(session) == [user.id]
+
+    assert rebuild_user_stats(session) == 1
+    session.commit()
+    assert check_user_stats(session) == []
+
+    stats = session.get(UserStats, user.id)
+    session.refresh(stats)
+    assert stats.screening_count == 3
+    assert stats.last_score == 16
+
+
+def test_analytics_summary_empty(session, user):
+    """Test analytics summary is None without screenings"""
+    assert analytics_summary(session, user.id) is None
+
+
+def test_analytics_summary(session, user):
+    """Test analytics totals, distribution and dimension averages"""
+    start = datetime(2026, 3, 1)
+    add_screening(session, user, 18, 'High', start)
+    add_screening(session, user, 9, 'Moderate', start + timedelta(days=1))
+    s = add_screening(session, user, 3, 'Low', start + timedelta(days=2))
+    s.stress_score, s.sleep_score = 2, 1
+    session.add(Screening(user_id=user.id, score=5, level='Low', stress_score=3,
+                          created_at=start + timedelta(days=3)))
+    session.commit()
+
+    stats = analytics_summary(session, user.id)
+    assert stats['total'] == 4
+    assert stats['avg_score'] == 8.75
+    assert (stats['min_score'], stats['max_score']) == (3, 18)
+    assert stats['last_screening'] == '2026-03-04'
+    assert stats['level_distribution'] == {'Low': 2, 'Moderate': 1, 'High': 1}
+    assert stats['dimension_averages'] == {
+        'stress_score': 2.5, 'anxiety_score': None, 'sleep_score': 1.0,
+        'depression_score': None, 'social_score': None,
+    }
+
+
+def test_analytics_summary_query_count(session, user):
+    """Test analytics summary runs a fixed number of queries"""
+    for i in range(50):
+        add_screening(session, user, i % 20, 'Low')
+    user_id = user.id
+    statements = []
+
+    @event.listens_for(session.get_bind(), 'before_cursor_execute')
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    analytics_summary(session, user_id)
+    event.remove(session.get_bind(), 'before_cursor_execute', count)
+    assert len(statements) == 2
@@ -0,0 +1,146 @@
+import gzip
+import json
+import uuid
+
+import pytest
+from app import app
+import models
+from models import Screening, CopingLog, ScreeningRecommendation, UserStats
+from recommendations import catalog
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import sync
+
+@pytest.fixture
+def client():
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    catalog.invalidate()
+
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'mobile', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'mobile', 'password': 'pass123'})
+        client.engine = engine
+        yield client
+    catalog.invalidate()
+
+
+def quick_item(answer='1', **extra):
+    item = {'type': 'screening', 'uuid': str(uuid.uuid4()),
+            'data': {f'q{i}': answer for i in range(1, 11)}}
+    item.update(extra)
+    return item
+
+
+def extended_item():
+    fields = ['stress', 'anxiety', 'sleep', 'depression', 'social']
+    data = {f'{f}_q{n}': '2' for f in fields for n in (1, 2)}
+    data['notes'] = 'on the train'
+    return {'type': 'extended_screening', 'uuid': str(uuid.uuid4()), 'created_at': '2026-05-01T08:30:00Z', 'data': data}
+
+
+def coping_item():
+    return {'type': 'coping_log', 'uuid': str(uuid.uuid4()), 'data': {'strategy': 'Walk outside', 'effectiveness': 4}}
+
+
+def post(client, items, compress=True):
+    body = json.dumps(items).encode()
+    headers = {'Content-Type': 'application/json'}
+    if compress:
+        body = gzip.compress(body)
+        headers['Content-Encoding'] = 'gzip'
+    return client.post('/api/sync', data=body, headers=headers)
+
+
+def query(model):
+    session = models.SessionLocal()
+    try:
+        return session.query(model).all()
+    finally:
+        session.close()
+
+
+def test_sync_requires_login():
+    """Test anonymous uploads get a JSON 401"""
+    app.config['TESTING'] = True
+    with app.test_client() as anonymous:
+        rv = post(anonymous, [quick_item()])
+    assert rv.status_code == 401
+    assert rv.get_json() == {'error': 'authentication required'}
+
+
+def test_sync_gzip_batch(client):
+    """Test a compressed batch is scored like the forms and stored"""
+    items = [quick_item('2'), extended_item(), coping_item()]
+    rv = post(client, items)
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert (body['created'], body['duplicates'], body['invalid']) == (3, 0, 0)
+
+    screenings = {s.client_uuid: s for s in query(Screening)}
+    quick = screenings[items[0]['uuid']]
+    assert (quick.score, quick.level) == (20, 'High')
+    extended = screenings[items[1]['uuid']]
+    assert (extended.score, extended.stress_score, extended.level, extended.notes) == (20, 4, 'Moderate', 'on the train')
+    assert extended.created_at.isoformat() == '2026-05-01T08:30:00'
+    assert [log.effectiveness for log in query(CopingLog)] == [4]
+    assert len(query(ScreeningRecommendation)) == 6
+    stats = query(UserStats)[0]
+    assert (stats.screening_count, stats.last_score) == (2, 20)
+
+
+def test_sync_dedupes_on_uuid(client):
+    """Test retried and repeated items are reported, not stored twice"""
+    first = quick_item()
+    post(client, [first])
+    rv = post(client, [first, coping_item(), dict(first)], compress=False)
+    body = rv.get_json()
+    assert [item['status'] for item in body['items']] == ['duplicate', 'created', 'duplicate']
+    assert len(query(Screening)) == 1
+
+
+def test_sync_reports_invalid_items(client):
+    """Test invalid items carry form errors while valid ones are stored"""
+    bad = quick_item()
+    del bad['data']['q3']
+    items = [bad, quick_item(uuid='not-a-uuid'), quick_item(created_at='2999-01-01T00:00:00'),
+             {'type': 'mood', 'uuid': str(uuid.uuid4())}, quick_item()]
+    body = post(client, items).get_json()
+    statuses = [item['status'] for item in body['items']]
+    assert statuses == ['invalid', 'invalid', 'invalid', 'invalid', 'created']
+    assert 'q3' in body['items'][0]['errors']
+    assert 'uuid' in body['items'][1]['errors']
+    assert 'created_at' in body['items'][2]['errors']
+    assert len(query(Screening)) == 1
+
+
+def test_sync_rejects_bad_payloads(client, monkeypatch):
+    """Test malformed, non-array and oversized bodies are rejected whole"""
+    assert client.post('/api/sync', data=b'{', headers={'Content-Type': 'application/json'}).status_code == 400
+    assert post(client, {'items': []}).status_code == 400
+    assert client.post('/api/sync', data=b'x', headers={'Content-Encoding': 'br'}).status_code == 415
+    monkeypatch.setattr(sync, 'MAX_BYTES', 1024)
+    bomb = gzip.compress(b'[' + b' ' * 100000 + b']')
+    assert client.post('/api/sync', data=bomb, headers={'Content-Encoding': 'gzip'}).status_code == 413
+    monkeypatch.setattr(sync, 'MAX_ITEMS', 2)
+    assert post(client, [quick_item() for _ in range(3)]).status_code == 413
+
+
+def test_sync_large_batch_is_bulk(client):
+    """Test hundreds of items are written with a handful of statements"""
+    items = [quick_item(str(i % 3)) for i in range(300)] + [coping_item() for _ in range(100)]
+    statements = []
+
+    @event.listens_for(client.engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    rv = post(client, items)
+    event.remove(client.engine, 'before_cursor_execute', count)
+    assert rv.get_json()['created'] == 400
+    assert len(query(Screening)) == 300
+    assert len(statements) < 30
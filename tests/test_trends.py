@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app import app
+import models
+import trends
+from models import Base, User, Screening, DimensionStats
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(username='trenduser', password='x'))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add(session, scores, start=datetime(2026, 1, 1), record=True, **dimensions):
+    for i, score in enumerate(scores):
+        s = Screening(user_id=1, score=score, level='Low', created_at=start + timedelta(days=i),
+                      **{dim: values[i] for dim, values in dimensions.items()})
+        session.add(s)
+        session.flush()
+        if record:
+            trends.record(session, s)
+    session.commit()
+
+
+def stats_for(session, dimension='score'):
+    return session.get(DimensionStats, (1, dimension))
+
+
+def test_running_statistics_match_batch(session):
+    """Test the O(1) updates agree with the same statistics computed over the whole series"""
+    rng = np.random.default_rng(7)
+    scores = rng.integers(0, 21, 200).tolist()
+    add(session, scores)
+    row = stats_for(session)
+
+    assert row.count == 200
+    assert row.mean == pytest.approx(np.mean(scores))
+    assert trends.std(row) == pytest.approx(np.std(scores, ddof=1))
+    ewma = pd.Series(scores, dtype=float).ewm(span=trends.TREND_WINDOW, adjust=False).mean().iloc[-1]
+    assert row.ewma == pytest.approx(ewma)
+    x = np.arange(1, 201)
+    weights = trends.DECAY ** (200 - x)
+    expected_slope = np.polyfit(x, scores, 1, w=np.sqrt(weights))[0]
+    assert trends.slope(row) == pytest.approx(expected_slope)
+
+
+@pytest.mark.parametrize('scores, expected', [
+    ([2, 4, 6, 8, 10, 12], 'Worsening'),
+    ([16, 14, 12, 9, 7, 5], 'Improving'),
+    ([8, 8, 8, 8, 8], 'Stable'),
+    ([8, 9, 7, 8, 9, 7, 8, 9, 7, 8, 9, 7, 8], 'Stable'),
+    ([5, 9], None),
+])
+def test_direction(session, scores, expected):
+    add(session, scores)
+    assert trends.direction(stats_for(session)) == expected
+
+
+def test_sub_scores_tracked_separately(session):
+    """Test only the series a screening has values for are updated"""
+    add(session, [10, 11, 12])
+    add(session, [9, 8], start=datetime(2026, 2, 1), stress_score=[3, 1], sleep_score=[2, 2])
+    assert stats_for(session).count == 5
+    assert stats_for(session, 'stress_score').count == 2
+    assert stats_for(session, 'sleep_score').mean == 2
+    assert stats_for(session, 'anxiety_score') is None
+    assert set(trends.user_trends(session, 1)) == {'score', 'stress_score', 'sleep_score'}
+
+
+def test_record_cost_is_constant(session):
+    """Test recording reads only the user's statistics rows, however long the history"""
+    add(session, list(range(300)))
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    add(session, [7], start=datetime(2027, 1, 1))
+    selects = [s for s in statements if s.startswith('SELECT')]
+    assert len(selects) == 1 and 'dimension_stats' in selects[0]
+
+
+def test_record_concurrent_first_insert(session, monkeypatch):
+    """Test a row created by another request between the lookup and the insert is folded into"""
+    add(session, [4])
+    locked = trends._locked_rows
+    calls = []
+
+    def stale_first_lookup(session, user_id, names):
+        calls.append(names)
+        return {} if len(calls) == 1 else locked(session, user_id, names)
+
+    monkeypatch.setattr(trends, '_locked_rows', stale_first_lookup)
+    add(session, [6], start=datetime(2026, 2, 1))
+    row = stats_for(session)
+    assert (row.count, row.mean) == (2, 5)
+    assert session.query(DimensionStats).count() == 1
+
+
+def test_rebuild_replays_in_time_order(session):
+    """Test a rebuild of out-of-order history equals recording it in order"""
+    scores = [3, 5, 4, 8, 12, 11, 15]
+    add(session, scores)
+    incremental = trends.user_trends(session, 1)
+
+    session.query(DimensionStats).delete()
+    session.query(Screening).delete()
+    session.commit()
+    # Inserted newest first, as an offline device might sync it
+    for i in reversed(range(len(scores))):
+        session.add(Screening(user_id=1, score=scores[i], level='Low', created_at=datetime(2026, 1, 1) + timedelta(days=i)))
+    session.commit()
+    assert trends.rebuild(session) == 1
+    session.commit()
+    assert trends.user_trends(session, 1) == incremental
+
+
+def test_rebuild_only_given_users(session):
+    """Test a rebuild for a set of users leaves everyone else's statistics alone"""
+    session.add(User(username='other', password='x'))
+    add(session, [3, 5, 4])
+    session.add(Screening(user_id=2, score=9, level='Moderate', created_at=datetime(2026, 1, 1)))
+    session.commit()
+    assert trends.rebuild(session, {2}) == 1
+    session.commit()
+    assert stats_for(session).count == 3
+    assert session.get(DimensionStats, (2, 'score')).count == 1
+    assert trends.rebuild(session, []) == 0
+
+
+def test_analytics_shows_trends():
+    """Test the analytics page reports per-area trends recorded on submission"""
+    engine = create_engine('sqlite:///:memory:')
+    models.Base.metadata.create_all(engine)
+    models.SessionLocal = sessionmaker(bind=engine)
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.test_client() as client:
+        client.post('/register', data={'username': 'trendpage', 'password': 'pass123', 'confirm_password': 'pass123'})
+        client.post('/login', data={'username': 'trendpage', 'password': 'pass123'})
+        for answer in '0012':
+            client.post('/screening', data={f'q{i}': answer for i in range(1, 11)})
+        client.post('/extended-screening', data={
+            f'{area}_q{n}': '1' for area in ('stress', 'anxiety', 'sleep', 'depression', 'social') for n in (1, 2)
+        })
+        body = client.get('/analytics').get_data(as_text=True)
+
+    assert 'Trends by Area' in body
+    assert 'Worsening ↑' in body  # overall score
+    assert 'Stress' in body and 'Not enough data' in body  # one extended screening so far
@@ -0,0 +1,195 @@
+"""Streaming per-user trend statistics for the score and each sub-score.
+
+For every user and series (the total score and the five extended sub-scores)
+`dimension_stats` holds running statistics, updated in O(1) as each
+screening is recorded, so analytics never re-reads the history:
+
+* Welford's running mean and variance; volatility is the standard deviation.
+* An exponentially weighted moving average with a span of TREND_WINDOW
+  screenings, i.e. the recent level.
+* An exponentially weighted least-squares slope, in points per screening.
+  It forgets older screenings at the same rate, giving a rolling trend over
+  roughly the last TREND_WINDOW screenings without storing them.
+
+The moving average and the slope assume screenings arrive in time order.
+Paths that insert history in bulk or out of order (offline sync, imports,
+re-scoring) rebuild the users they touched afterwards with `rebuild()`,
+which replays their screenings in time order. `flask rebuild-trends` does the
+same for everyone.
+"""
+
+import math
+import os
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+
+from models import Screening, DimensionStats
+from stats import DIMENSIONS, user_id_batches
+
+SERIES = ['score'] + DIMENSIONS
+TREND_WINDOW = int(os.environ.get('TREND_WINDOW', '10'))  # screenings
+ALPHA = 2 / (TREND_WINDOW + 1)
+DECAY = 1 - 1 / TREND_WINDOW
+
+# A slope whose change over TREND_WINDOW screenings is within this share of
+# the series' standard deviation reads as Stable
+STABLE_SHARE = 0.5
+MIN_TREND_COUNT = 3
+
+COLUMNS = [c.name for c in DimensionStats.__table__.columns]
+
+
+def _blank(user_id, dimension):
+    return DimensionStats(user_id=user_id, dimension=dimension, count=0, mean=0.0, m2=0.0, ewma=None,
+                          w=0.0, wx=0.0, wy=0.0, wxx=0.0, wxy=0.0, last_at=None)
+
+
+def observe(stats, value, at=None):
+    """Fold one value into a DimensionStats row, in place."""
+    stats.count += 1
+    delta = value - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (value - stats.mean)
+    stats.ewma = value if stats.ewma is None else stats.ewma + ALPHA * (value - stats.ewma)
+    x = stats.count
+    stats.w = DECAY * stats.w + 1
+    stats.wx = DECAY * stats.wx + x
+    stats.wy = DECAY * stats.wy + value
+    stats.wxx = DECAY * stats.wxx + x * x
+    stats.wxy = DECAY * stats.wxy + x * value
+    if at is not None and (stats.last_at is None or at > stats.last_at):
+        stats.last_at = at
+
+
+def slope(stats):
+    """Weighted least-squares slope in points per screening, or None below two points."""
+    denominator = stats.w * stats.wxx - stats.wx ** 2
+    if stats.count < 2 or denominator <= 0:
+        return None
+    return (stats.w * stats.wxy - stats.wx * stats.wy) / denominator
+
+
+def std(stats):
+    return math.sqrt(stats.m2 / (stats.count - 1)) if stats.count > 1 else 0.0
+
+
+def direction(stats):
+    """'Improving', 'Worsening' or 'Stable' (higher scores are worse); None without enough data."""
+    s = slope(stats)
+    if stats.count < MIN_TREND_COUNT or s is None:
+        return None
+    change = s * TREND_WINDOW
+    if abs(change) <= max(STABLE_SHARE * std(stats), 1e-9):
+        return 'Stable'
+    return 'Worsening' if change > 0 else 'Improving'
+
+
+def summarize(stats):
+    s = slope(stats)
+    return {
+        'count': stats.count,
+        'mean': round(stats.mean, 2),
+        'std': round(std(stats), 2),
+        'ewma': None if stats.ewma is None else round(stats.ewma, 2),
+        'slope': None if s is None else round(s, 3),
+        'direction': direction(stats),
+    }
+
+
+def _locked_rows(session, user_id, names):
+    """{series: DimensionStats} for the user's existing rows among `names`, locked for update."""
+    return {
+        row.dimension: row
+        for row in session.execute(
+            select(DimensionStats)
+            .where(DimensionStats.user_id == user_id, DimensionStats.dimension.in_(names))
+            .with_for_update()
+        ).scalars()
+    }
+
+
+def record(session, screening):
+    """Fold a newly added screening into its owner's running statistics.
+
+    Runs in the caller's (write) transaction; the caller commits.
+    """
+    values = {name: getattr(screening, name) for name in SERIES if getattr(screening, name) is not None}
+    if not values:
+        return
+    user_id, at = screening.user_id, screening.created_at
+    rows = _locked_rows(session, user_id, list(values))
+    for name, row in rows.items():
+        observe(row, values[name], at)
+    missing = [name for name in values if name not in rows]
+    if not missing:
+        return
+
+    # First values of these series. Another request may be creating the rows
+    # at the same time; if so lock theirs and fold into them.
+    created = {name: _blank(user_id, name) for name in missing}
+    for name, row in created.items():
+        observe(row, values[name], at)
+    try:
+        with session.begin_nested():
+            session.add_all(created.values())
+            session.flush()
+    except IntegrityError:
+        theirs = _locked_rows(session, user_id, missing)
+        for name in missing:
+            row = theirs.get(name)
+            if row is None:
+                session.add(created[name])
+            else:
+                observe(row, values[name], at)
+
+
+def rebuild(session, user_id=None, batch_size=5000):
+    """Recompute dimension_stats by replaying screenings in time order.
+
+    `user_id` is one id, a collection of ids, or None for all users. Returns
+    the number of users with statistics. The caller commits.
+    """
+    session.flush()
+    return sum(_replay(session, ids, batch_size) for ids in user_id_batches(user_id))
+
+
+def _replay(session, user_ids, batch_size):
+    clear = delete(DimensionStats)
+    query = (select(Screening.user_id, Screening.created_at, *[getattr(Screening, n) for n in SERIES])
+             .where(Screening.created_at.is_not(None))
+             .order_by(Screening.user_id, Screening.created_at, Screening.id)
+             .execution_options(yield_per=batch_size))
+    if user_ids is not None:
+        clear = clear.where(DimensionStats.user_id.in_(user_ids))
+        query = query.where(Screening.user_id.in_(user_ids))
+    session.execute(clear)
+
+    users, pending, current, running = 0, [], None, {}
+
+    def finish():
+        pending.extend({c: getattr(row, c) for c in COLUMNS} for row in running.values())
+
+    for owner, created_at, *values in session.execute(query):
+        if owner != current:
+            finish()
+            if len(pending) >= batch_size:
+                session.execute(insert(DimensionStats), pending)
+                pending.clear()
+            current, running = owner, {}
+            users += 1
+        for name, value in zip(SERIES, values):
+            if value is not None:
+                if name not in running:
+                    running[name] = _blank(owner, name)
+                observe(running[name], value, created_at)
+    finish()
+    if pending:
+        session.execute(insert(DimensionStats), pending)
+    return users
+
+
+def user_trends(session, user_id):
+    """{series: summary} for the series the user has values for, in one query."""
+    rows = session.execute(select(DimensionStats).where(DimensionStats.user_id == user_id)).scalars()
+    return {row.dimension: summarize(row) for row in rows}